@@ -1,19 +1,2116 @@
+import ctypes
+import contextlib
+import errno
+import functools
+import io
+import json
+import multiprocessing
 import os
+import platform
+import queue
 import sys  # 导入sys模块
 import shutil
+import sqlite3
+import string
+import tarfile
+import struct
+import threading
 import time
-from datetime import datetime
-from PIL import Image
+import uuid
+import zipfile
+import hashlib
+try:
+    import fcntl  # 仅Linux/macOS可用，用于FIEMAP查询文件物理位置
+except ImportError:
+    fcntl = None
+from array import array
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+from PIL import Image, ImageOps
 from PIL.ExifTags import TAGS
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QPushButton, QLabel, 
                             QFileDialog, QTextEdit, QProgressBar, QHBoxLayout, 
                             QVBoxLayout, QWidget, QComboBox, QLineEdit, QGroupBox,
                             QFormLayout, QFontComboBox, QTabWidget,
                             QMessageBox, QRadioButton, QButtonGroup, QGraphicsDropShadowEffect,
-                            QSplashScreen, QScrollArea, QAction, QSystemTrayIcon)  
-from PyQt5.QtCore import Qt, QThread, pyqtSignal, QSettings, QPoint, QTimer  # 新增QTimer
+                            QSplashScreen, QScrollArea, QAction, QSystemTrayIcon,
+                            QListWidget, QListWidgetItem, QTableView, QHeaderView,
+                            QAbstractItemView)  
+from PyQt5.QtCore import (Qt, QThread, pyqtSignal, QSettings, QPoint, QTimer, QSize,  # 新增QTimer
+                          QAbstractTableModel, QModelIndex, QObject)
 from PyQt5.QtGui import QFont, QIcon, QPixmap, QColor  # QColor移至此处导入
 
+# 支持的文件扩展名
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.bmp', '.tiff', '.webp', '.raw', '.heic', '.heif')
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv', '.webm', '.flv', '.wmv', '.mpeg', '.mpg', '.3gp')
+LRV_EXTENSION = '.lrv'
+HEIF_EXTENSIONS = ('.heic', '.heif')
+# 不包含可靠内嵌日期的格式，直接使用文件修改日期
+STAT_DATE_EXTENSIONS = ('.gif', '.bmp')
+
+# ================ 元数据解析 ================
+
+# 需要读取的EXIF标签
+EXIF_TAG_MODEL = 0x0110
+EXIF_TAG_ORIENTATION = 0x0112
+EXIF_TAG_THUMBNAIL_OFFSET = 0x0201
+EXIF_TAG_THUMBNAIL_LENGTH = 0x0202
+EXIF_TAG_DATETIME = 0x0132
+EXIF_TAG_EXIF_IFD = 0x8769
+EXIF_TAG_DATETIME_ORIGINAL = 0x9003
+EXIF_TAG_DATETIME_DIGITIZED = 0x9004
+
+def _normalize_exif_date(value):
+    """校验EXIF日期字符串，返回 'YYYY:MM:DD HH:MM:SS' 格式或None"""
+    if not isinstance(value, str):
+        return None
+    value = value.strip('\x00 ')
+    if len(value) < 10 or value[4] != ':' or value[7] != ':' or value.startswith('0000'):
+        return None
+    return value
+
+def _read_tiff_ifd(f, base, offset, endian, wanted):
+    """读取一个TIFF IFD中指定的标签，返回 {标签: 值}"""
+    f.seek(base + offset)
+    raw = f.read(2)
+    if len(raw) < 2:
+        return {}
+    count = min(struct.unpack(endian + 'H', raw)[0], 512)  # 限制条目数，防止损坏文件导致大量读取
+    entries = f.read(count * 12)
+    values = {}
+    for i in range(len(entries) // 12):
+        tag, value_type, value_count = struct.unpack(endian + 'HHI', entries[i * 12:i * 12 + 8])
+        if tag not in wanted:
+            continue
+        value_field = entries[i * 12 + 8:i * 12 + 12]
+        if value_type == 2:  # ASCII
+            if value_count <= 4:
+                data = value_field[:value_count]
+            else:
+                f.seek(base + struct.unpack(endian + 'I', value_field)[0])
+                data = f.read(min(value_count, 64))
+            values[tag] = data.decode('ascii', 'ignore')
+        elif value_type == 3:  # SHORT
+            values[tag] = struct.unpack(endian + 'H', value_field[:2])[0]
+        elif value_type in (4, 13):  # LONG / IFD
+            values[tag] = struct.unpack(endian + 'I', value_field)[0]
+    return values
+
+def _read_tiff_next_ifd(f, base, offset, endian):
+    """返回IFD之后下一个IFD的偏移，没有时返回0"""
+    f.seek(base + offset)
+    raw = f.read(2)
+    if len(raw) < 2:
+        return 0
+    f.seek(base + offset + 2 + struct.unpack(endian + 'H', raw)[0] * 12)
+    raw = f.read(4)
+    return struct.unpack(endian + 'I', raw)[0] if len(raw) == 4 else 0
+
+def read_tiff_exif_date(f, base=0, info=None):
+    """从TIFF结构(EXIF数据块)中读取拍摄日期，base为TIFF头在文件中的偏移，相机型号写入info"""
+    f.seek(base)
+    header = f.read(8)
+    if len(header) < 8:
+        return None
+    if header[:2] == b'II':
+        endian = '<'
+    elif header[:2] == b'MM':
+        endian = '>'
+    else:
+        return None
+    magic, ifd0_offset = struct.unpack(endian + 'HI', header[2:])
+    if magic != 42:
+        return None
+    
+    ifd0 = _read_tiff_ifd(f, base, ifd0_offset, endian, (EXIF_TAG_MODEL, EXIF_TAG_DATETIME, EXIF_TAG_EXIF_IFD))
+    if info is not None and ifd0.get(EXIF_TAG_MODEL):
+        info['camera_model'] = ifd0[EXIF_TAG_MODEL].strip('\x00 ')
+    exif_ifd = {}
+    if EXIF_TAG_EXIF_IFD in ifd0:
+        exif_ifd = _read_tiff_ifd(f, base, ifd0[EXIF_TAG_EXIF_IFD], endian,
+                                  (EXIF_TAG_DATETIME_ORIGINAL, EXIF_TAG_DATETIME_DIGITIZED))
+    
+    # 优先使用拍摄时间，其次数字化时间，最后修改时间
+    for value in (exif_ifd.get(EXIF_TAG_DATETIME_ORIGINAL), exif_ifd.get(EXIF_TAG_DATETIME_DIGITIZED),
+                  ifd0.get(EXIF_TAG_DATETIME)):
+        date = _normalize_exif_date(value)
+        if date:
+            return date
+    return None
+
+def _read_uint(data, pos, size):
+    """按大端序读取size字节(0/4/8)的无符号整数"""
+    if size == 0:
+        return 0
+    return int.from_bytes(data[pos:pos + size], 'big')
+
+def _iter_bmff_boxes(f, start, end):
+    """遍历[start, end)范围内的ISO-BMFF盒子，返回(类型, 数据起始偏移, 盒子结束偏移)"""
+    pos = start
+    while pos + 8 <= end:
+        f.seek(pos)
+        header = f.read(8)
+        if len(header) < 8:
+            return
+        size, box_type = struct.unpack('>I4s', header)
+        header_size = 8
+        if size == 1:  # 64位长度
+            large_size = f.read(8)
+            if len(large_size) < 8:
+                return
+            size = struct.unpack('>Q', large_size)[0]
+            header_size = 16
+        elif size == 0:  # 延伸到末尾
+            size = end - pos
+        if size < header_size:
+            return
+        yield box_type, pos + header_size, min(pos + size, end)
+        pos += size
+
+def _find_heif_exif_item(f, start, end):
+    """在iinf盒子中查找类型为Exif的条目ID"""
+    f.seek(start)
+    version = f.read(4)[:1]
+    if not version:
+        return None
+    entry_start = start + 4 + (2 if version[0] == 0 else 4)
+    for box_type, data_start, box_end in _iter_bmff_boxes(f, entry_start, end):
+        if box_type != b'infe':
+            continue
+        f.seek(data_start)
+        data = f.read(min(box_end - data_start, 16))
+        if len(data) < 4 or data[0] < 2:  # 只有version>=2的infe才带item_type
+            continue
+        id_size = 2 if data[0] == 2 else 4
+        item_id = _read_uint(data, 4, id_size)
+        item_type = data[4 + id_size + 2:4 + id_size + 6]
+        if item_type == b'Exif':
+            return item_id
+    return None
+
+def _find_heif_item_extent(f, start, end, item_id):
+    """在iloc盒子中查找指定条目的(文件偏移, 长度)"""
+    f.seek(start)
+    data = f.read(min(end - start, 1024 * 1024))
+    if len(data) < 8:
+        return None
+    version = data[0]
+    offset_size, length_size = data[4] >> 4, data[4] & 0x0F
+    base_offset_size = data[5] >> 4
+    index_size = data[5] & 0x0F if version in (1, 2) else 0
+    id_size = 2 if version < 2 else 4
+    item_count = _read_uint(data, 6, id_size)
+    pos = 6 + id_size
+    
+    for _ in range(item_count):
+        current_id = _read_uint(data, pos, id_size)
+        pos += id_size
+        construction_method = 0
+        if version in (1, 2):
+            construction_method = _read_uint(data, pos, 2) & 0x0F
+            pos += 2
+        pos += 2  # data_reference_index
+        base_offset = _read_uint(data, pos, base_offset_size)
+        pos += base_offset_size
+        extent_count = _read_uint(data, pos, 2)
+        pos += 2
+        extents = []
+        for _ in range(extent_count):
+            pos += index_size
+            extent_offset = _read_uint(data, pos, offset_size)
+            pos += offset_size
+            extent_length = _read_uint(data, pos, length_size)
+            pos += length_size
+            extents.append((base_offset + extent_offset, extent_length))
+        if pos > len(data):
+            return None
+        if current_id == item_id:
+            # 只支持直接引用文件偏移的条目(construction_method 0)
+            if construction_method != 0 or not extents:
+                return None
+            return extents[0]
+    return None
+
+def read_heic_date(file_path, info=None):
+    """解析HEIC/HEIF的meta/iinf/iloc盒子定位Exif条目，只读取其引用的字节获取拍摄日期"""
+    with open(file_path, 'rb') as f:
+        file_size = os.fstat(f.fileno()).st_size
+        meta_range = None
+        for box_type, data_start, box_end in _iter_bmff_boxes(f, 0, file_size):
+            if box_type == b'meta':
+                meta_range = (data_start + 4, box_end)  # meta是FullBox，跳过version/flags
+                break
+        if not meta_range:
+            return None
+        
+        exif_item_id = None
+        iloc_range = None
+        for box_type, data_start, box_end in _iter_bmff_boxes(f, *meta_range):
+            if box_type == b'iinf':
+                exif_item_id = _find_heif_exif_item(f, data_start, box_end)
+            elif box_type == b'iloc':
+                iloc_range = (data_start, box_end)
+        if exif_item_id is None or iloc_range is None:
+            return None
+        
+        extent = _find_heif_item_extent(f, iloc_range[0], iloc_range[1], exif_item_id)
+        if not extent:
+            return None
+        # Exif条目以4字节的TIFF头偏移开始
+        f.seek(extent[0])
+        raw = f.read(4)
+        if len(raw) < 4:
+            return None
+        tiff_header_offset = struct.unpack('>I', raw)[0]
+        return read_tiff_exif_date(f, extent[0] + 4 + tiff_header_offset, info)
+
+def _parse_text_date(text):
+    """解析文本块中的日期(EXIF、ISO 8601或RFC 1123格式)，返回EXIF格式字符串或None"""
+    text = text.strip('\x00 ')
+    date = _normalize_exif_date(text)
+    if date:
+        return date
+    for parse in (datetime.fromisoformat, parsedate_to_datetime, _parse_ctime_date, _parse_slash_date):
+        try:
+            return parse(text).strftime('%Y:%m:%d %H:%M:%S')
+        except (TypeError, ValueError, IndexError):
+            continue
+    return None
+
+def _parse_ctime_date(text):
+    """解析ctime格式日期，例如 'MON JAN 10 12:34:56 2005'"""
+    return datetime.strptime(' '.join(text.split()), '%a %b %d %H:%M:%S %Y')
+
+def _parse_slash_date(text):
+    """解析 '2005/01/10 12:34:56' 格式日期"""
+    return datetime.strptime(text, '%Y/%m/%d %H:%M:%S')
+
+def _format_png_time(data):
+    """将PNG tIME数据块转换为EXIF格式日期"""
+    year, month, day, hour, minute, second = struct.unpack('>HBBBBB', data)
+    if not year:
+        return None
+    return f"{year:04d}:{month:02d}:{day:02d} {hour:02d}:{minute:02d}:{second:02d}"
+
+# PNG文本块中表示创建时间的关键字
+PNG_DATE_KEYWORDS = (b'Creation Time', b'date:create')
+
+def read_png_date(file_path, info=None):
+    """遍历PNG数据块读取eXIf/tEXt/tIME中的日期，跳过图像数据，不解码像素"""
+    with open(file_path, 'rb') as f:
+        if f.read(8) != b'\x89PNG\r\n\x1a\n':
+            return None
+        file_size = os.fstat(f.fileno()).st_size
+        pos = 8
+        while pos + 8 <= file_size:
+            f.seek(pos)
+            length, chunk_type = struct.unpack('>I4s', f.read(8))
+            data_start = pos + 8
+            if chunk_type == b'eXIf':
+                date = read_tiff_exif_date(f, data_start, info)
+                if date:
+                    return date
+            elif chunk_type == b'tIME' and length == 7:
+                f.seek(data_start)
+                date = _format_png_time(f.read(7))
+                if date:
+                    return date
+            elif chunk_type == b'tEXt' and length <= 1024:
+                f.seek(data_start)
+                keyword, _, text = f.read(length).partition(b'\x00')
+                if keyword in PNG_DATE_KEYWORDS:
+                    date = _parse_text_date(text.decode('latin-1'))
+                    if date:
+                        return date
+            elif chunk_type in (b'IDAT', b'IEND'):
+                break
+            pos = data_start + length + 4  # 跳过数据和CRC
+        
+        # 图像数据之后的块只检查文件末尾，tIME通常写在IEND之前
+        tail_start = max(pos, file_size - 1024)
+        f.seek(tail_start)
+        tail = f.read()
+        index = tail.rfind(b'tIME')
+        if index >= 4 and tail[index - 4:index] == b'\x00\x00\x00\x07' and len(tail) >= index + 11:
+            return _format_png_time(tail[index + 4:index + 11])
+    return None
+
+def _iter_riff_chunks(f, start, end):
+    """遍历[start, end)范围内的RIFF块，返回(块ID, 数据起始偏移, 数据长度)"""
+    pos = start
+    while pos + 8 <= end:
+        f.seek(pos)
+        header = f.read(8)
+        if len(header) < 8:
+            return
+        chunk_id, size = struct.unpack('<4sI', header)
+        yield chunk_id, pos + 8, size
+        pos += 8 + size + (size & 1)  # 块数据按2字节对齐
+
+def read_webp_date(file_path, info=None):
+    """读取WebP扩展格式中的EXIF块获取拍摄日期"""
+    with open(file_path, 'rb') as f:
+        header = f.read(12)
+        if len(header) < 12 or header[:4] != b'RIFF' or header[8:] != b'WEBP':
+            return None
+        riff_end = min(8 + struct.unpack('<I', header[4:8])[0], os.fstat(f.fileno()).st_size)
+        for chunk_id, data_start, size in _iter_riff_chunks(f, 12, riff_end):
+            if chunk_id == b'VP8X':
+                f.seek(data_start)
+                flags = f.read(1)
+                if not flags or not flags[0] & 0x08:  # VP8X标志位表明没有EXIF
+                    return None
+            elif chunk_id == b'EXIF':
+                f.seek(data_start)
+                base = data_start + 6 if f.read(6) == b'Exif\x00\x00' else data_start
+                return read_tiff_exif_date(f, base, info)
+            elif chunk_id in (b'VP8 ', b'VP8L'):
+                if data_start == 20:  # 简单格式，没有扩展块
+                    return None
+    return None
+
+def _find_tiff_exif_date(data, info=None):
+    """在一段数据中查找TIFF头并读取其中的EXIF日期"""
+    for marker in (b'II*\x00', b'MM\x00*'):
+        index = data.find(marker)
+        if index >= 0:
+            return read_tiff_exif_date(io.BytesIO(data), index, info)
+    return None
+
+def read_avi_date(file_path, info=None):
+    """读取AVI头部hdrl列表中的IDIT块或strd块(EXIF)获取拍摄日期，遇到movi列表即停止"""
+    with open(file_path, 'rb') as f:
+        header = f.read(12)
+        if len(header) < 12 or header[:4] != b'RIFF' or header[8:] != b'AVI ':
+            return None
+        riff_end = min(8 + struct.unpack('<I', header[4:8])[0], os.fstat(f.fileno()).st_size)
+        lists = [(12, riff_end)]
+        strd_date = None
+        while lists:
+            start, end = lists.pop(0)
+            for chunk_id, data_start, size in _iter_riff_chunks(f, start, end):
+                if chunk_id == b'LIST':
+                    f.seek(data_start)
+                    list_type = f.read(4)
+                    if list_type == b'movi':  # 后面是音视频数据
+                        break
+                    if list_type in (b'hdrl', b'strl', b'INFO'):
+                        lists.append((data_start + 4, min(data_start + size, end)))
+                elif chunk_id in (b'IDIT', b'ICRD') and size <= 64:
+                    f.seek(data_start)
+                    date = _parse_text_date(f.read(size).decode('latin-1'))
+                    if date:
+                        return date
+                elif chunk_id == b'strd' and strd_date is None and size <= 64 * 1024:
+                    f.seek(data_start)
+                    strd_date = _find_tiff_exif_date(f.read(size), info)
+        return strd_date
+
+def _read_ebml_vint(f, keep_marker=False):
+    """读取EBML变长整数，返回(值, 字节数)，长度为全1时值为-1(未知大小)"""
+    first = f.read(1)
+    if not first:
+        return None, 0
+    length = 1
+    mask = 0x80
+    while length <= 8 and not first[0] & mask:
+        mask >>= 1
+        length += 1
+    if length > 8:
+        return None, 0
+    rest = f.read(length - 1)
+    if len(rest) < length - 1:
+        return None, 0
+    value = first[0] if keep_marker else first[0] & (mask - 1)
+    for byte in rest:
+        value = (value << 8) | byte
+    if not keep_marker and value == (1 << (7 * length)) - 1:
+        return -1, length
+    return value, length
+
+# Matroska元素ID
+EBML_ID_HEADER = 0x1A45DFA3
+EBML_ID_SEGMENT = 0x18538067
+EBML_ID_INFO = 0x1549A966
+EBML_ID_DATE_UTC = 0x4461
+EBML_ID_CLUSTER = 0x1F43B675
+MATROSKA_EPOCH = datetime(2001, 1, 1, tzinfo=timezone.utc)
+
+def _iter_ebml_elements(f, start, end, limit=64):
+    """遍历[start, end)范围内的EBML元素，返回(ID, 数据起始偏移, 数据长度)，最多limit个"""
+    pos = start
+    for _ in range(limit):
+        if pos >= end:
+            return
+        f.seek(pos)
+        element_id, id_length = _read_ebml_vint(f, keep_marker=True)
+        size, size_length = _read_ebml_vint(f)
+        if element_id is None or size is None:
+            return
+        data_start = pos + id_length + size_length
+        if size < 0:  # 未知大小，延伸到父元素末尾
+            size = end - data_start
+        yield element_id, data_start, size
+        pos = data_start + size
+
+def read_matroska_date(file_path, info=None):
+    """读取MKV/WebM中Segment/Info下的DateUTC元素，遇到Cluster即停止"""
+    with open(file_path, 'rb') as f:
+        file_size = os.fstat(f.fileno()).st_size
+        for element_id, data_start, size in _iter_ebml_elements(f, 0, file_size, limit=4):
+            if element_id != EBML_ID_SEGMENT:
+                continue
+            segment_end = min(data_start + size, file_size)
+            for child_id, child_start, child_size in _iter_ebml_elements(f, data_start, segment_end):
+                if child_id == EBML_ID_CLUSTER:
+                    return None
+                if child_id != EBML_ID_INFO:
+                    continue
+                info_end = min(child_start + child_size, segment_end)
+                for info_id, info_start, info_size in _iter_ebml_elements(f, child_start, info_end):
+                    if info_id == EBML_ID_DATE_UTC and info_size == 8:
+                        f.seek(info_start)
+                        nanoseconds = struct.unpack('>q', f.read(8))[0]
+                        date = MATROSKA_EPOCH + timedelta(microseconds=nanoseconds // 1000)
+                        return date.astimezone().strftime('%Y:%m:%d %H:%M:%S')
+                return None
+    return None
+
+# ASF对象GUID
+ASF_HEADER_GUID = uuid.UUID('75B22630-668E-11CF-A6D9-00AA0062CE6C').bytes_le
+ASF_FILE_PROPERTIES_GUID = uuid.UUID('8CABDCA1-A947-11CF-8EE4-00C00C205365').bytes_le
+FILETIME_EPOCH = datetime(1601, 1, 1, tzinfo=timezone.utc)
+
+def read_asf_date(file_path, info=None):
+    """读取WMV/ASF头部File Properties对象中的创建日期"""
+    with open(file_path, 'rb') as f:
+        header = f.read(30)
+        if len(header) < 30 or header[:16] != ASF_HEADER_GUID:
+            return None
+        header_size, object_count = struct.unpack('<QI', header[16:28])
+        header_end = min(header_size, os.fstat(f.fileno()).st_size)
+        pos = 30
+        for _ in range(min(object_count, 256)):
+            if pos + 24 > header_end:
+                break
+            f.seek(pos)
+            object_header = f.read(24)
+            object_size = struct.unpack('<Q', object_header[16:])[0]
+            if object_header[:16] == ASF_FILE_PROPERTIES_GUID:
+                f.seek(pos + 24 + 24)  # 跳过File ID和File Size
+                raw = f.read(8)
+                if len(raw) < 8:
+                    return None
+                filetime = struct.unpack('<Q', raw)[0]
+                if not filetime:  # 广播流没有创建日期
+                    return None
+                date = FILETIME_EPOCH + timedelta(microseconds=filetime // 10)
+                return date.astimezone().strftime('%Y:%m:%d %H:%M:%S')
+            if object_size < 24:
+                break
+            pos += object_size
+    return None
+
+def read_flv_date(file_path, info=None):
+    """读取FLV首个脚本标签(onMetaData)中的creationdate字符串"""
+    with open(file_path, 'rb') as f:
+        header = f.read(9)
+        if len(header) < 9 or header[:3] != b'FLV':
+            return None
+        f.seek(struct.unpack('>I', header[5:9])[0] + 4)  # 跳过PreviousTagSize0
+        tag_header = f.read(11)
+        if len(tag_header) < 11 or tag_header[0] != 18:  # 18为脚本数据标签
+            return None
+        data_size = int.from_bytes(tag_header[1:4], 'big')
+        data = f.read(min(data_size, 64 * 1024))
+        index = data.find(b'creationdate')
+        if index < 0 or data[index + 12:index + 13] != b'\x02':  # AMF0字符串
+            return None
+        length = struct.unpack('>H', data[index + 13:index + 15])[0]
+        return _parse_text_date(data[index + 15:index + 15 + length].decode('utf-8', 'ignore'))
+
+def read_pil_exif_date(file_path, info=None):
+    """通过PIL读取图片的EXIF日期"""
+    with Image.open(file_path) as image:
+        exif_data = image._getexif()
+        if exif_data:
+            if info is not None and exif_data.get(EXIF_TAG_MODEL):
+                info['camera_model'] = str(exif_data[EXIF_TAG_MODEL]).strip('\x00 ')
+            for tag, value in exif_data.items():
+                decoded = TAGS.get(tag, tag)
+                if decoded in ['DateTimeOriginal', 'DateTimeDigitized', 'DateTime']:
+                    return value
+    return None
+
+# 按扩展名选择的日期解析器
+DATE_READERS = {
+    '.heic': read_heic_date,
+    '.heif': read_heic_date,
+    '.png': read_png_date,
+    '.webp': read_webp_date,
+    '.avi': read_avi_date,
+    '.mkv': read_matroska_date,
+    '.webm': read_matroska_date,
+    '.wmv': read_asf_date,
+    '.flv': read_flv_date,
+    # MPEG-PS(.mpeg/.mpg)容器没有记录时间字段，使用文件修改日期
+}
+
+def read_media_date(file_path, info=None):
+    """读取文件内嵌的拍摄日期，没有内嵌日期时返回None，由调用方回退到文件修改日期
+    
+    info为可选字典，解析EXIF时顺带读取的相机型号等字段会写入其中。
+    """
+    ext = os.path.splitext(file_path)[1].lower()
+    reader = DATE_READERS.get(ext)
+    if reader:
+        return reader(file_path, info)
+    if ext in STAT_DATE_EXTENSIONS:
+        return None
+    if ext in IMAGE_EXTENSIONS:
+        return read_pil_exif_date(file_path, info)
+    return None
+
+def resolve_file_date(file_path, info=None, mtime=None):
+    """获取文件日期，没有内嵌日期时使用文件修改日期，返回(日期, 警告信息)
+    
+    mtime为已读取的修改时间，传入时不再重复stat。
+    """
+    warning = None
+    try:
+        date = read_media_date(file_path, info)
+        if date:
+            if info is not None:
+                info['date_source'] = 'metadata'
+            return date, None
+    except Exception as e:
+        warning = f"读取 {os.path.basename(file_path)} 元数据时出错: {str(e)}，使用文件修改日期"
+    
+    try:
+        if mtime is None:
+            mtime = os.path.getmtime(file_path)
+        if info is not None:
+            info['date_source'] = 'mtime'
+        return datetime.fromtimestamp(mtime).strftime('%Y:%m:%d %H:%M:%S'), warning
+    except Exception as e:
+        return None, f"获取 {os.path.basename(file_path)} 日期时出错: {str(e)}！"
+
+def read_file_metadata_batch(items):
+    """批量读取文件日期，items为[(文件路径, stat)]，stat为已读取的(大小, 修改时间, inode号)或None
+    
+    返回[(stat, 日期, 警告信息, 附加信息)]；未读取过的stat在这里读取一次并返回，供主进程缓存。
+    stat为None表示文件无法访问，此时警告信息为错误原因。
+    作为进程池任务使用，必须定义在模块顶层以便子进程导入。
+    """
+    results = []
+    for file_path, stat in items:
+        if stat is None:
+            try:
+                st = os.stat(file_path)
+            except OSError as e:
+                results.append((None, None, str(e), None))
+                continue
+            stat = (st.st_size, st.st_mtime, st.st_ino)
+        info = {}
+        date, warning = resolve_file_date(file_path, info, stat[1])
+        results.append((stat, date, warning, info))
+    return results
+
+# ================ 缩略图 ================
+
+# EXIF方向值对应的图像变换
+ORIENTATION_TRANSPOSE = {
+    2: Image.Transpose.FLIP_LEFT_RIGHT,
+    3: Image.Transpose.ROTATE_180,
+    4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE,
+    6: Image.Transpose.ROTATE_270,
+    7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_90,
+}
+THUMBNAIL_SIZE = 160
+THUMBNAIL_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.webp')
+
+def read_exif_thumbnail(file_path):
+    """读取JPEG文件EXIF(IFD1)中内嵌的缩略图，返回(缩略图数据, 方向)，没有时返回(None, 1)"""
+    with open(file_path, 'rb') as f:
+        if f.read(2) != b'\xff\xd8':
+            return None, 1
+        # 遍历JPEG段直到APP1(Exif)，遇到图像数据(SOS)即停止
+        while True:
+            marker = f.read(4)
+            if len(marker) < 4 or marker[0] != 0xFF or marker[1] == 0xDA:
+                return None, 1
+            length = struct.unpack('>H', marker[2:])[0]
+            segment_start = f.tell()
+            if marker[1] == 0xE1 and f.read(6) == b'Exif\x00\x00':
+                break
+            f.seek(segment_start + length - 2)
+        
+        base = segment_start + 6
+        f.seek(base)
+        header = f.read(8)
+        if header[:2] not in (b'II', b'MM'):
+            return None, 1
+        endian = '<' if header[:2] == b'II' else '>'
+        ifd0_offset = struct.unpack(endian + 'I', header[4:8])[0]
+        orientation = _read_tiff_ifd(f, base, ifd0_offset, endian, (EXIF_TAG_ORIENTATION,)).get(EXIF_TAG_ORIENTATION, 1)
+        ifd1_offset = _read_tiff_next_ifd(f, base, ifd0_offset, endian)
+        if not ifd1_offset:
+            return None, orientation
+        ifd1 = _read_tiff_ifd(f, base, ifd1_offset, endian, (EXIF_TAG_THUMBNAIL_OFFSET, EXIF_TAG_THUMBNAIL_LENGTH))
+        offset = ifd1.get(EXIF_TAG_THUMBNAIL_OFFSET)
+        length = ifd1.get(EXIF_TAG_THUMBNAIL_LENGTH)
+        if not offset or not length or length > 256 * 1024:
+            return None, orientation
+        f.seek(base + offset)
+        return f.read(length), orientation
+
+def make_thumbnail(file_path, size=THUMBNAIL_SIZE):
+    """生成JPEG格式的缩略图数据：优先使用EXIF内嵌缩略图，否则以draft模式降分辨率解码"""
+    thumbnail_data, orientation = (None, 1)
+    if file_path.lower().endswith(('.jpg', '.jpeg')):
+        thumbnail_data, orientation = read_exif_thumbnail(file_path)
+    
+    if thumbnail_data:
+        image = Image.open(io.BytesIO(thumbnail_data))
+        if orientation in ORIENTATION_TRANSPOSE:
+            image = image.transpose(ORIENTATION_TRANSPOSE[orientation])
+    else:
+        image = Image.open(file_path)
+        # JPEG在解码时直接缩小1/2~1/8，不需要解码全分辨率像素
+        image.draft('RGB', (size, size))
+        image = ImageOps.exif_transpose(image)
+    
+    with image:
+        image.thumbnail((size, size))
+        output = io.BytesIO()
+        image.convert('RGB').save(output, 'JPEG', quality=80)
+        return output.getvalue()
+
+def make_thumbnail_batch(file_paths):
+    """批量生成缩略图，返回与file_paths对应的JPEG数据列表，无法解码的文件为None
+    
+    作为进程池任务使用，必须定义在模块顶层以便子进程导入。
+    """
+    results = []
+    for file_path in file_paths:
+        try:
+            results.append(make_thumbnail(file_path))
+        except Exception:
+            results.append(None)
+    return results
+
+def compute_content_signature(file_path, sample_size=64 * 1024):
+    """根据文件大小和首尾各64KB内容计算签名，文件内容变化时签名随之变化"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(file_path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        digest.update(str(size).encode())
+        digest.update(f.read(sample_size))
+        if size > sample_size * 2:
+            f.seek(size - sample_size)
+            digest.update(f.read(sample_size))
+    return digest.hexdigest()
+
+def get_app_data_dir(*parts):
+    """程序数据目录（缓存、日志等），不存在时自动创建"""
+    base = os.environ.get('LOCALAPPDATA') or os.path.join(os.path.expanduser('~'), '.local', 'share')
+    path = os.path.join(base, 'CA-2025', *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+class ThumbnailCache:
+    """按内容签名存储缩略图的磁盘缓存，总大小超过上限时按最近使用时间淘汰"""
+    def __init__(self, cache_dir, max_bytes=512 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.total_bytes = None  # 第一次写入时再统计，避免在界面线程中遍历缓存目录
+    
+    def _path(self, signature):
+        return os.path.join(self.cache_dir, signature[:2], signature + '.jpg')
+    
+    def get(self, signature):
+        """读取缓存的缩略图，命中时更新其使用时间"""
+        path = self._path(signature)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)
+            return data
+        except OSError:
+            return None
+    
+    def put(self, signature, data):
+        """写入缩略图，超过上限时淘汰最久未使用的条目"""
+        path = self._path(signature)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+        with self.lock:
+            if self.total_bytes is None:
+                self.total_bytes = sum(os.path.getsize(os.path.join(root, name))
+                                       for root, _, files in os.walk(self.cache_dir) for name in files)
+            else:
+                self.total_bytes += len(data)
+            if self.total_bytes > self.max_bytes:
+                self.evict()
+    
+    def evict(self):
+        """删除最久未使用的缩略图，直到总大小降到上限的90%"""
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                stat = os.stat(path)
+                entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+        self.total_bytes = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if self.total_bytes <= self.max_bytes * 0.9:
+                break
+            try:
+                os.remove(path)
+                self.total_bytes -= size
+            except OSError:
+                pass
+
+class ThumbnailThread(QThread):
+    """后台生成源文件夹中图片的缩略图，缓存命中时直接读取
+    
+    use_processes为True时缓存未命中的图片按批交给进程池解码（EXIF缩略图的查找是纯Python代码），
+    否则在线程池中解码。
+    """
+    thumbnail_ready = pyqtSignal(str, bytes)
+    finished_loading = pyqtSignal(int, int)  # 缩略图数量, 缓存命中数量
+    
+    BATCH_SIZE = 16  # 进程池后端每批提交的图片数
+    
+    def __init__(self, file_paths, cache, max_workers=None, use_processes=False):
+        super().__init__()
+        self.file_paths = file_paths
+        self.cache = cache
+        self.max_workers = max_workers or min(8, os.cpu_count() or 1)
+        self.offload = ProcessOffload() if use_processes else None
+        self.stopped = False
+        self.cache_hits = 0
+        self.hits_lock = threading.Lock()
+    
+    def load_thumbnail(self, file_path):
+        """读取或生成单个文件的缩略图"""
+        if self.stopped:
+            return
+        try:
+            signature = compute_content_signature(file_path)
+            data = self.cache.get(signature)
+            if data:
+                with self.hits_lock:
+                    self.cache_hits += 1
+            else:
+                data = make_thumbnail(file_path)
+                self.cache.put(signature, data)
+            self.thumbnail_ready.emit(file_path, data)
+        except Exception:
+            pass  # 无法解码的文件不显示缩略图
+    
+    def load_thumbnail_batch(self, file_paths):
+        """读取一批文件的缓存缩略图，未命中的在子进程中批量生成"""
+        misses = []
+        for file_path in file_paths:
+            if self.stopped:
+                return
+            try:
+                signature = compute_content_signature(file_path)
+            except OSError:
+                continue
+            data = self.cache.get(signature)
+            if data:
+                with self.hits_lock:
+                    self.cache_hits += 1
+                self.thumbnail_ready.emit(file_path, data)
+            else:
+                misses.append((file_path, signature))
+        if not misses or self.stopped:
+            return
+        results = self.offload.run_batch(make_thumbnail_batch, [file_path for file_path, _ in misses])
+        for (file_path, signature), data in zip(misses, results):
+            if data is None:
+                continue  # 无法解码的文件不显示缩略图
+            try:
+                self.cache.put(signature, data)
+            except OSError:
+                pass
+            self.thumbnail_ready.emit(file_path, data)
+    
+    def run(self):
+        if self.offload is None:
+            # PIL解码时会释放GIL，线程池即可并行解码
+            with ThreadPoolExecutor(self.max_workers) as executor:
+                list(executor.map(self.load_thumbnail, self.file_paths))
+        else:
+            batches = [self.file_paths[i:i + self.BATCH_SIZE]
+                       for i in range(0, len(self.file_paths), self.BATCH_SIZE)]
+            try:
+                # 每个线程持有一批等待子进程返回，线程数与进程数一致才能占满进程池
+                with ThreadPoolExecutor(self.offload.max_workers) as executor:
+                    list(executor.map(self.load_thumbnail_batch, batches))
+            finally:
+                self.offload.shutdown()
+        self.finished_loading.emit(len(self.file_paths), self.cache_hits)
+    
+    def stop(self):
+        self.stopped = True
+
+# ================ 处理流水线 ================
+
+class PipelineTask:
+    """流水线中单个文件的处理状态
+    
+    百万级文件的任务会同时存在，使用__slots__不为每个任务创建属性字典；源文件夹和目标文件夹
+    字符串在任务之间共享（驻留），完整源路径按需拼接而不逐个保存。stat结果只读取一次并缓存。
+    """
+    __slots__ = ('folder', 'filename', 'size', 'mtime', 'inode', 'date', 'camera_model',
+                 'target_folder', 'dest_path', 'action', 'disk_key', 'duplicate_of', 'digest',
+                 'date_source', 'durations', 'outcome', 'mode', 'error_stage', 'error', 'backup_paths')
+    
+    def __init__(self, folder, filename):
+        self.folder = folder  # 源文件所在文件夹，同一文件夹的任务共享同一个字符串
+        self.filename = filename
+        self.size = 0
+        self.mtime = None  # 缓存的修改时间，None表示尚未读取stat
+        self.inode = 0
+        self.date = None
+        self.camera_model = None
+        self.target_folder = None  # 相对目标根目录的文件夹
+        self.dest_path = None
+        self.action = None
+        self.disk_key = 0  # 文件在磁盘上的顺序（物理顺序中的序号或压缩包内偏移），用于排序
+        self.duplicate_of = None  # 库中内容相同的文件（相对路径）
+        self.digest = None  # 文件内容的BLAKE2b摘要（十六进制）
+        self.date_source = None  # 日期来源: metadata(内嵌元数据)/mtime(文件修改时间)
+        self.durations = None  # 按经过的阶段顺序记录的耗时（秒），array('f')，阶段名由流水线提供
+        self.outcome = None  # 结束状态: organized/skipped/duplicate/error，None表示被过滤，不记录事件
+        self.mode = None  # 实际使用的整理方式: move/copy/hardlink/symlink/reflink
+        self.error_stage = None
+        self.error = None
+        self.backup_paths = None  # 同时写入的备份目标路径列表，没有备份目标时为None
+    
+    @property
+    def file_path(self):
+        return os.path.join(self.folder, self.filename)
+    
+    def load_stat(self):
+        """读取并缓存文件的大小、修改时间和inode号，已读取过时直接返回"""
+        if self.mtime is None:
+            stat = os.stat(self.file_path)
+            self.size = stat.st_size
+            self.mtime = stat.st_mtime
+            self.inode = stat.st_ino
+    
+    def add_duration(self, seconds):
+        """记录刚完成的阶段的耗时；用单精度数组而不是按阶段名的字典，每个任务只多几十字节"""
+        if self.durations is None:
+            self.durations = array('f')
+        self.durations.append(seconds)
+    
+    def duration_map(self, stage_names):
+        """按阶段名返回各阶段耗时，stage_names为流水线的阶段名列表"""
+        return {name: round(seconds, 6) for name, seconds in zip(stage_names, self.durations or ())}
+    
+    def fail(self, stage, error):
+        """标记任务在某个阶段出错"""
+        self.outcome = "error"
+        self.error_stage = stage
+        self.error = str(error)
+
+class StagedPipeline:
+    """由有界队列连接的分阶段流水线
+    
+    每个阶段有独立的工作线程数，阶段之间通过有界队列传递任务。下游阶段变慢时，
+    上游向队列放入任务会阻塞（背压），未处理的任务不会在内存中无限堆积。
+    阶段处理函数返回任务则交给下一阶段，返回None表示该任务提前结束（被过滤、跳过或出错）。
+    任务对象需提供add_duration(秒)和fail(阶段, 错误)方法，用于按阶段顺序记录耗时和异常。
+    
+    一个阶段可以分成多条通道，每条通道有自己的队列和线程，由route(task)决定任务进入哪条通道，
+    一条通道处理慢不会阻塞其他通道。
+    """
+    _SENTINEL = object()
+    
+    def __init__(self, queue_size=64, initializer=None):
+        self.queue_size = queue_size
+        self.initializer = initializer  # 每个工作线程启动时调用一次
+        self.stages = []  # (名称, 处理函数, {通道: (线程数, 队列长度)}, 通道路由, 是否可停止, 批大小)
+    
+    def add_stage(self, name, handler, workers=1, stoppable=True, batch_size=1, lanes=None, route=None):
+        """添加一个阶段，按添加顺序串联
+        
+        stoppable为False的阶段在停止后仍会处理已到达的任务。batch_size大于1时，
+        处理函数每次接收一批任务的列表，返回要交给下一阶段的任务列表（可以重新排序），
+        没有返回的任务视为已结束。lanes为{通道名: (线程数, 队列长度)}时按route分通道处理，
+        队列长度为0表示不限制，此时忽略workers；handler也可以是{通道名: 处理函数}，各通道分别处理。
+        """
+        if lanes is None:
+            lanes = {None: (workers, self.queue_size)}
+            route = lambda task: None
+        lanes = {lane: (max(1, lane_workers), size) for lane, (lane_workers, size) in lanes.items()}
+        self.stages.append((name, handler, lanes, route, stoppable, max(1, batch_size)))
+    
+    @property
+    def stage_names(self):
+        """按顺序排列的阶段名，任务的durations与之一一对应"""
+        return [stage[0] for stage in self.stages]
+    
+    def run(self, tasks, on_done, should_stop=lambda: False, wait_if_paused=lambda: None, on_error=None):
+        """运行流水线直到所有任务结束，每个任务结束时调用on_done(task)
+        
+        on_done或交给下一阶段出错时任务标记为失败，并调用on_error(task, 错误)记录，工作线程不会因此退出，
+        下一阶段照常收到结束通知。
+        """
+        on_error = on_error or (lambda task, error: None)
+        queues = [{lane: queue.Queue(size) for lane, (_, size) in stage[2].items()} for stage in self.stages]
+        remaining_workers = [sum(workers for workers, _ in stage[2].values()) for stage in self.stages]
+        lock = threading.Lock()
+        last_index = len(self.stages) - 1
+        
+        def put(index, task):
+            queues[index][self.stages[index][3](task)].put(task)
+        
+        def close_stage(index):
+            for lane, (workers, _) in self.stages[index][2].items():
+                for _ in range(workers):
+                    queues[index][lane].put(self._SENTINEL)
+        
+        def deliver(index, task, forward):
+            """把任务交给下一阶段（forward为True）或结束任务"""
+            try:
+                if forward:
+                    put(index + 1, task)
+                else:
+                    on_done(task)
+                return
+            except Exception as e:
+                task.fail(self.stages[index][0], e)
+                error = e
+            try:
+                if forward:
+                    on_done(task)  # 没能进入下一阶段，任务在本阶段结束
+                    return
+                on_error(task, error)
+            except Exception:
+                pass  # 记录也失败时只能放弃这个任务，不能让工作线程退出
+        
+        def worker(index, lane):
+            name, handler, _, _, stoppable, batch_size = self.stages[index]
+            if isinstance(handler, dict):
+                handler = handler[lane]
+            lane_queue = queues[index][lane]
+            try:
+                if self.initializer:
+                    self.initializer()
+                finished = False
+                while not finished:
+                    task = lane_queue.get()
+                    if task is self._SENTINEL:
+                        break
+                    # 批处理阶段：不等待，只取队列中已有的任务凑成一批
+                    batch = [task]
+                    while len(batch) < batch_size:
+                        try:
+                            task = lane_queue.get_nowait()
+                        except queue.Empty:
+                            break
+                        if task is self._SENTINEL:
+                            finished = True
+                            break
+                        batch.append(task)
+                    
+                    wait_if_paused()
+                    # 停止后不再处理，只把队列中剩余的任务排空
+                    if stoppable and should_stop():
+                        continue
+                    started = time.perf_counter()
+                    try:
+                        if batch_size > 1:
+                            results = handler(batch)
+                        else:
+                            results = [handler(batch[0])]
+                    except Exception as e:
+                        results = []
+                        for task in batch:
+                            task.fail(name, e)
+                    # 批处理阶段的耗时平均分摊到批内每个任务
+                    elapsed = (time.perf_counter() - started) / len(batch)
+                    for task in batch:
+                        task.add_duration(elapsed)
+                    results = [result for result in results if result is not None]
+                    forwarded = {id(result) for result in results}
+                    for task in batch:
+                        if id(task) not in forwarded:
+                            deliver(index, task, False)
+                    for result in results:
+                        deliver(index, result, index != last_index)
+            finally:
+                # 本阶段最后一个线程退出时，通知下一阶段结束
+                with lock:
+                    remaining_workers[index] -= 1
+                    is_last = remaining_workers[index] == 0
+                if is_last and index < last_index:
+                    close_stage(index + 1)
+        
+        threads = []
+        for index, (name, _, lanes, _, _, _) in enumerate(self.stages):
+            for lane, (workers, _) in lanes.items():
+                prefix = f"{name}-{lane}" if lane else name
+                for i in range(workers):
+                    thread = threading.Thread(target=worker, args=(index, lane),
+                                              name=f"{prefix}-{i}", daemon=True)
+                    thread.start()
+                    threads.append(thread)
+        
+        # 扫描阶段：在当前线程中产生任务；扫描出错时也要结束各阶段，等待已进入流水线的任务处理完
+        try:
+            for task in tasks:
+                if should_stop():
+                    break
+                wait_if_paused()
+                put(0, task)
+        finally:
+            close_stage(0)
+            for thread in threads:
+                thread.join()
+
+class SizeLaneRouter:
+    """按文件大小把传输任务分到大文件通道和小文件通道
+    
+    大文件通道单线程顺序传输，保持连续读写；小文件通道并行处理照片、LRV等小文件，
+    不会被几GB的视频阻塞。分界阈值按实测吞吐量调整：预计传输时间超过LARGE_FILE_SECONDS
+    的文件才算大文件。同一设备内的移动只是重命名，实测吞吐很高，文件基本都会走小文件通道。
+    """
+    LARGE_FILE_SECONDS = 1.0
+    INITIAL_THRESHOLD = 64 * 1024 * 1024
+    MIN_THRESHOLD = 8 * 1024 * 1024
+    # 只用足够大的文件估算吞吐量，小文件的耗时主要是单个文件的固定开销
+    MIN_SAMPLE_SIZE = 1024 * 1024
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.threshold = self.INITIAL_THRESHOLD
+        self.throughput = None  # 字节/秒，指数加权平均
+        self.lane_counts = {"large": 0, "small": 0}
+        self.lane_bytes = {"large": 0, "small": 0}
+    
+    def route(self, task):
+        lane = "large" if task.size >= self.threshold else "small"
+        with self.lock:
+            self.lane_counts[lane] += 1
+            self.lane_bytes[lane] += task.size
+        return lane
+    
+    def record(self, size, elapsed):
+        """记录一次传输的大小和耗时，更新吞吐量和阈值"""
+        if size < self.MIN_SAMPLE_SIZE or elapsed <= 0:
+            return
+        with self.lock:
+            rate = size / elapsed
+            self.throughput = rate if self.throughput is None else self.throughput * 0.8 + rate * 0.2
+            self.threshold = max(self.MIN_THRESHOLD, int(self.throughput * self.LARGE_FILE_SECONDS))
+
+# 网络文件系统延迟高，需要较多并发才能跑满带宽
+NETWORK_FILESYSTEMS = frozenset({"nfs", "nfs4", "cifs", "smb3", "smbfs", "9p", "ceph", "glusterfs",
+                                 "fuse.sshfs", "fuse.rclone", "fuse.glusterfs", "davfs", "afs"})
+# 设备类型在统计中的显示文字
+STORAGE_KIND_TEXT = {"hdd": "机械盘", "ssd": "固态盘", "removable": "存储卡/移动盘", "network": "网络"}
+
+def read_sys_flag(path):
+    """读取/sys下的0/1标志，读取失败返回None"""
+    try:
+        with open(path) as f:
+            return f.read().strip() == '1'
+    except OSError:
+        return None
+
+def probe_storage(path):
+    """探测路径所在的存储，返回(设备类型, 文件系统类型)，无法判断的项为None
+    
+    文件系统类型取自/proc/mounts中最长匹配的挂载点；设备类型按st_dev找到/sys/dev/block下的设备，
+    读取queue/rotational和removable（分区的这两项在上一级整盘目录中）。仅Linux有效。
+    """
+    fs_type = None
+    real_path = os.path.realpath(path)
+    try:
+        best = ''
+        with open('/proc/mounts') as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) < 3:
+                    continue
+                mount_point = fields[1].replace('\\040', ' ')
+                prefix = mount_point.rstrip('/') + '/'
+                if (real_path == mount_point or real_path.startswith(prefix)) and len(mount_point) >= len(best):
+                    best, fs_type = mount_point, fields[2]
+    except OSError:
+        pass
+    if fs_type in NETWORK_FILESYSTEMS:
+        return "network", fs_type
+    
+    kind = None
+    try:
+        st_dev = os.stat(path).st_dev
+        block = os.path.realpath(f'/sys/dev/block/{os.major(st_dev)}:{os.minor(st_dev)}')
+        for device in (block, os.path.dirname(block)):
+            rotational = read_sys_flag(os.path.join(device, 'queue', 'rotational'))
+            if rotational is None:
+                continue
+            removable = read_sys_flag(os.path.join(device, 'removable'))
+            if removable or os.path.basename(device).startswith('mmcblk'):
+                kind = "removable"
+            else:
+                kind = "hdd" if rotational else "ssd"
+            break
+    except (OSError, AttributeError):
+        pass
+    return kind, fs_type
+
+def initial_concurrency(*paths):
+    """按源和目标的设备类型决定起始传输并发数，返回(并发数, 设备说明)
+    
+    机械盘和存储卡随机读写代价高，从1开始；网络挂载延迟高，从8开始；固态盘从4开始；无法判断时为2。
+    """
+    probes = [probe_storage(path) for path in paths]
+    kinds = {kind for kind, _ in probes}
+    if kinds & {"hdd", "removable"}:
+        level = 1
+    elif "network" in kinds:
+        level = 8
+    elif kinds == {"ssd"}:
+        level = 4
+    else:
+        level = 2
+    description = " → ".join(f"{STORAGE_KIND_TEXT.get(kind, '未知')}({fs_type or '?'})"
+                             for kind, fs_type in probes)
+    return level, description
+
+class AdaptiveConcurrency:
+    """按实测吞吐量调整同时进行的传输数（加性增、乘性减）
+    
+    每个统计窗口结束时与上一个窗口比较：吞吐量提高则并发数加一；刚加过一而吞吐量没有提高则退回；
+    吞吐量明显下降或单次操作的平均延迟翻倍则并发数减半；其他情况保持。
+    传输前acquire()，结束后release()并record()。
+    """
+    WINDOW_SECONDS = 1.0
+    INCREASE_RATIO = 1.05
+    DECREASE_RATIO = 0.8
+    MAX_LEVEL = 16
+    
+    def __init__(self, initial, maximum=MAX_LEVEL):
+        self.condition = threading.Condition()
+        self.maximum = maximum
+        self.limit = max(1, min(initial, maximum))
+        self.active = 0
+        self.levels = [self.limit]  # 每次调整后的并发数
+        self.operations = 0
+        self.last_throughput = None
+        self.last_latency = None
+        self._reset_window()
+    
+    def _reset_window(self):
+        self.window_start = time.monotonic()
+        self.window_bytes = 0
+        self.window_ops = 0
+        self.window_latency = 0.0
+    
+    def acquire(self, should_stop=lambda: False):
+        """等待空闲的并发名额；停止后直接返回，由调用方自行结束"""
+        with self.condition:
+            while self.active >= self.limit and not should_stop():
+                self.condition.wait(0.1)
+            self.active += 1
+    
+    def release(self):
+        with self.condition:
+            self.active -= 1
+            self.condition.notify()
+    
+    def record(self, size, elapsed):
+        """记录一次传输，窗口结束时调整并发数"""
+        with self.condition:
+            self.operations += 1
+            self.window_bytes += size
+            self.window_ops += 1
+            self.window_latency += elapsed
+            duration = time.monotonic() - self.window_start
+            # 窗口内至少完成与并发数相同的操作，样本才有代表性
+            if duration < self.WINDOW_SECONDS or self.window_ops < self.limit:
+                return
+            throughput = self.window_bytes / duration
+            latency = self.window_latency / self.window_ops
+            limit = self.limit
+            if self.last_throughput is None or throughput >= self.last_throughput * self.INCREASE_RATIO:
+                limit = min(limit + 1, self.maximum)
+            elif throughput < self.last_throughput * self.DECREASE_RATIO or latency > self.last_latency * 2:
+                limit = max(limit // 2, 1)
+            elif len(self.levels) > 1 and self.levels[-1] > self.levels[-2]:
+                limit -= 1  # 上次增加并发没有带来收益
+            if limit != self.limit:
+                self.limit = limit
+                self.levels.append(limit)
+                self.condition.notify_all()
+            self.last_throughput = throughput
+            self.last_latency = latency
+            self._reset_window()
+    
+    def format_summary(self):
+        return (f"起始 {self.levels[0]}，范围 {min(self.levels)}~{max(self.levels)}，"
+                f"最终 {self.limit}，调整 {len(self.levels) - 1} 次")
+
+def should_process_file(filename, file_type_filter, custom_extensions=None):
+    """根据选择的文件类型判断是否处理该文件"""
+    filename_lower = filename.lower()
+    
+    # 处理自定义格式
+    if file_type_filter == "custom" and custom_extensions:
+        return any(filename_lower.endswith(ext.lower()) for ext in custom_extensions)
+            
+    if file_type_filter == "all" or file_type_filter == "images":
+        if filename_lower.endswith(IMAGE_EXTENSIONS):
+            return True
+            
+    if file_type_filter == "all" or file_type_filter == "videos":
+        if filename_lower.endswith(VIDEO_EXTENSIONS):
+            return True
+            
+    if file_type_filter == "all" or file_type_filter == "lrv":
+        if filename_lower.endswith(LRV_EXTENSION):
+            return True
+            
+    return False
+
+def list_source_files(source_folder, file_type_filter, custom_extensions=None):
+    """列出源文件夹中符合文件类型筛选的文件名"""
+    return [entry.name for entry in os.scandir(source_folder)
+            if entry.is_file() and should_process_file(entry.name, file_type_filter, custom_extensions)]
+
+def get_file_kind(filename):
+    """返回文件类别：images/videos/lrv/other"""
+    filename_lower = filename.lower()
+    if filename_lower.endswith(IMAGE_EXTENSIONS):
+        return "images"
+    if filename_lower.endswith(VIDEO_EXTENSIONS):
+        return "videos"
+    if filename_lower.endswith(LRV_EXTENSION):
+        return "lrv"
+    return "other"
+
+def sanitize_folder_name(name):
+    """去掉文件夹名中不允许的字符"""
+    name = ''.join('_' if c in '<>:"/\\|?*' or ord(c) < 32 else c for c in name)
+    return name.strip(' .')
+
+class DestinationLayout:
+    """目标目录结构模板，例如 '{year}/{month}/{day}'，每次运行只编译一次
+    
+    shard_limit大于0时，目录中的条目数达到上限后依次改用 '目录_002'、'目录_003' 等分片目录，
+    避免单个目录无限增长。各目录的条目数只在第一次用到时统计一次，之后在内存中累加：
+    规划时先计入，文件最终没有写入（跳过、重复、传输失败）时用release_shard归还。
+    模板必须是相对路径，固定文本中不能有 '.'、'..' 目录或盘符，生成的目录总在目标根目录之内。
+    """
+    FIELDS = ('year', 'month', 'day', 'camera_model', 'kind', 'ext')
+    DEFAULT_TEMPLATE = "{year}-{month}"
+    # 字段缺失时使用的值
+    FALLBACKS = {'camera_model': "unknown_camera"}
+    
+    def __init__(self, template=DEFAULT_TEMPLATE, shard_limit=0):
+        template = template.strip().replace('\\', '/')
+        if template.startswith('/'):
+            raise ValueError("目录模板必须是相对路径")
+        self.template = template.strip('/')
+        if not self.template:
+            raise ValueError("目录模板不能为空")
+        self.shard_limit = shard_limit
+        self.parts = []  # 每级目录的[(固定文本, 字段名)]
+        for component in self.template.split('/'):
+            pieces = []
+            for literal, field, _, _ in string.Formatter().parse(component):
+                if field is not None and field not in self.FIELDS:
+                    raise ValueError(f"目录模板中的字段 {{{field}}} 不受支持，可用字段: "
+                                     + ", ".join(f"{{{name}}}" for name in self.FIELDS))
+                if sanitize_folder_name(literal) != literal.strip(' .'):
+                    raise ValueError(f"目录模板中的 '{literal}' 含有文件夹名不允许的字符或盘符")
+                pieces.append((literal, field))
+            if all(field is None for _, field in pieces) and component.strip() in ('.', '..'):
+                raise ValueError(f"目录模板不能包含 '{component.strip()}' 目录")
+            self.parts.append(pieces)
+        self.folder_counts = {}
+        self.shard_count = 0  # 本次运行新启用的分片目录数
+        self.lock = threading.Lock()
+    
+    @staticmethod
+    def split_date(date, file_path, mtime=None):
+        """将日期字符串拆分为年、月、日；mtime为已读取的修改时间，传入时不再重复stat"""
+        # 处理不同格式的日期字符串
+        if ':' in date and date.count(':') < 2:
+            #  fallback 到文件修改时间
+            if mtime is None:
+                mtime = os.path.getmtime(file_path)
+            date = datetime.fromtimestamp(mtime).strftime('%Y:%m:%d %H:%M:%S')
+        if ':' in date:
+            year, month, rest = date.split(':', 2)
+            return {'year': year, 'month': month, 'day': rest[:2]}
+        # 处理其他日期格式，例如 2024-05-03
+        return {'year': date[:4], 'month': date[5:7], 'day': date[8:10]}
+    
+    def folder_for(self, file_path, date, camera_model=None, mtime=None):
+        """确定文件的目标文件夹（相对目标根目录，未分片），mtime为已读取的修改时间"""
+        # 无法获取日期的文件放到"unknown_date"文件夹
+        if not date:
+            return "unknown_date"
+        filename = os.path.basename(file_path)
+        fields = self.split_date(date, file_path, mtime)
+        fields['camera_model'] = camera_model
+        fields['kind'] = get_file_kind(filename)
+        fields['ext'] = os.path.splitext(filename)[1].lstrip('.').lower()
+        return self.render(fields)
+    
+    def render(self, fields):
+        """按字段值生成相对目录路径"""
+        components = []
+        for pieces in self.parts:
+            text = ''
+            for literal, field in pieces:
+                text += literal
+                if field:
+                    value = sanitize_folder_name(str(fields.get(field) or ''))
+                    text += value or self.FALLBACKS.get(field, "unknown")
+            components.append(text or "unknown")
+        return os.path.join(*components)
+    
+    def resolve_shard(self, dest_folder, relative_folder):
+        """返回实际写入的目录并为其计入一个条目，目录已满时切换到下一个分片"""
+        if self.shard_limit <= 0:
+            return relative_folder
+        with self.lock:
+            shard = 1
+            folder = relative_folder
+            while True:
+                count = self.folder_counts.get(folder)
+                if count is None:
+                    folder_path = os.path.join(dest_folder, folder)
+                    count = len(os.listdir(folder_path)) if os.path.isdir(folder_path) else 0
+                    if shard > 1 and count == 0:
+                        self.shard_count += 1
+                if count < self.shard_limit:
+                    break
+                self.folder_counts[folder] = count
+                shard += 1
+                folder = f"{relative_folder}_{shard:03d}"
+            self.folder_counts[folder] = count + 1
+            return folder
+    
+    def release_shard(self, folder):
+        """归还resolve_shard为最终没有写入的文件计入的条目"""
+        if self.shard_limit <= 0:
+            return
+        with self.lock:
+            if self.folder_counts.get(folder, 0) > 0:
+                self.folder_counts[folder] -= 1
+
+# FIEMAP ioctl：查询文件数据块的物理位置
+FS_IOC_FIEMAP = 0xC020660B
+FIEMAP_HEADER = struct.Struct('=QQIIII')
+FIEMAP_EXTENT = struct.Struct('=QQQQQIIII')
+FIEMAP_EXTENT_UNKNOWN = 0x00000002
+FIEMAP_PROBE_LIMIT = 16  # 开头这么多个文件都取不到物理偏移时，认为文件系统不支持FIEMAP
+
+def get_fiemap_offset(file_path):
+    """通过FIEMAP获取文件首个数据块的物理偏移，不支持时返回None"""
+    if fcntl is None or not sys.platform.startswith('linux'):
+        return None
+    buffer = bytearray(FIEMAP_HEADER.pack(0, 0xFFFFFFFFFFFFFFFF, 0, 0, 1, 0) + bytes(FIEMAP_EXTENT.size))
+    try:
+        with open(file_path, 'rb') as f:
+            fcntl.ioctl(f.fileno(), FS_IOC_FIEMAP, buffer, True)
+    except OSError:
+        return None
+    if FIEMAP_HEADER.unpack_from(buffer)[3] == 0:  # 空文件，没有extent
+        return None
+    extent = FIEMAP_EXTENT.unpack_from(buffer, FIEMAP_HEADER.size)
+    if extent[5] & FIEMAP_EXTENT_UNKNOWN:  # 尚未分配物理位置（延迟分配等）
+        return None
+    return extent[1]
+
+class PhysicalOrderScheduler:
+    """按文件在磁盘上的物理位置安排处理顺序，减少机械硬盘和SD卡上的随机寻道
+    
+    Linux上优先使用FIEMAP获取首个数据块的物理偏移，不支持时使用inode号近似物理位置。
+    排序前后的寻道距离（相邻文件位置差之和）用于估算本次调度的收益，只是按排序键推算，不是实测；
+    inode号与物理位置只是大致相关，目录顺序常常已接近inode顺序，此时估算值接近0。
+    """
+    def __init__(self):
+        self.method = "目录顺序"
+        self.seek_reduction = 0.0  # 估算的寻道距离减少比例
+    
+    @staticmethod
+    def seek_distance(keys):
+        """按给定顺序访问时相邻位置差的总和"""
+        return sum(abs(b - a) for a, b in zip(keys, keys[1:]))
+    
+    def order(self, tasks):
+        """为任务确定磁盘顺序并返回排序后的列表
+        
+        物理偏移与inode号不能放在一起比较：取不到物理偏移的文件（空文件、尚未分配物理位置）
+        单独按inode号排在最后。排序后disk_key改为文件在物理顺序中的序号。
+        """
+        located = []  # (物理偏移, 任务)
+        unlocated = []  # (inode号, 任务)
+        use_fiemap = True
+        for task in tasks:
+            offset = get_fiemap_offset(task.file_path) if use_fiemap else None
+            if offset is not None:
+                located.append((offset, task))
+                continue
+            if not located and len(unlocated) + 1 >= FIEMAP_PROBE_LIMIT:
+                use_fiemap = False  # 一直取不到物理偏移，后面的文件也不再尝试
+            try:
+                task.load_stat()
+                inode = task.inode
+            except OSError:
+                inode = 0  # 文件已不存在，由元数据阶段报告错误
+            unlocated.append((inode, task))
+        if not located:
+            self.method = "inode号"
+        elif unlocated:
+            self.method = f"物理偏移(FIEMAP，{len(unlocated)}个文件无物理位置按inode号排在最后)"
+        else:
+            self.method = "物理偏移(FIEMAP)"
+        
+        keyed = located or unlocated  # 寻道距离按主要的排序依据估算
+        before = self.seek_distance([key for key, _ in keyed])
+        after = self.seek_distance(sorted(key for key, _ in keyed))
+        self.seek_reduction = 1 - after / before if before else 0.0
+        
+        by_key = lambda item: item[0]
+        ordered = [task for _, task in sorted(located, key=by_key) + sorted(unlocated, key=by_key)]
+        for position, task in enumerate(ordered):
+            task.disk_key = position
+        return ordered
+
+class ProcessOffload:
+    """可选的进程池后端，用于CPU密集的纯Python解析工作
+    
+    线程受GIL限制只能用到一个核心，进程池可以用满多核。任务按批提交，每批只产生一次
+    进程间通信；子进程以spawn方式启动，打包后依赖入口处的multiprocessing.freeze_support()，
+    提交的函数必须定义在模块顶层。
+    """
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.executor = None
+        self.lock = threading.Lock()  # 多个线程同时提交第一批时只创建一个进程池
+    
+    def run_batch(self, func, items):
+        """在子进程中对一批数据执行批量函数func，阻塞直到返回结果列表"""
+        with self.lock:
+            if self.executor is None:
+                self.executor = ProcessPoolExecutor(self.max_workers,
+                                                    mp_context=multiprocessing.get_context("spawn"))
+            future = self.executor.submit(func, items)
+        return future.result()
+    
+    def shutdown(self):
+        """关闭进程池，未开始的批次直接取消"""
+        with self.lock:
+            executor, self.executor = self.executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+class TokenBucket:
+    """令牌桶限速器，rate为每秒补充的令牌数，0表示不限制
+    
+    桶容量等于一秒的令牌数，允许短时突发。一次消耗超过剩余令牌时记为欠账，
+    后续调用等待欠账还清，因此大块数据也能按平均速率限流。可在运行中调整速率。
+    """
+    def __init__(self, rate=0):
+        self.lock = threading.Lock()
+        self.rate = rate
+        self.tokens = rate
+        self.last = time.monotonic()
+    
+    def set_rate(self, rate):
+        """调整速率，立即对后续消耗生效"""
+        with self.lock:
+            self.rate = rate
+            self.tokens = min(self.tokens, rate)
+            self.last = time.monotonic()
+    
+    def consume(self, amount, should_stop=lambda: False):
+        """消耗amount个令牌，令牌不足时阻塞等待；停止后立即返回"""
+        while not should_stop():
+            with self.lock:
+                if self.rate <= 0:
+                    return
+                now = time.monotonic()
+                self.tokens = min(self.rate, self.tokens + (now - self.last) * self.rate)
+                self.last = now
+                if self.tokens > 0:
+                    self.tokens -= amount
+                    return
+                wait = -self.tokens / self.rate
+            # 分段等待，以便及时响应速率调整和停止
+            time.sleep(min(max(wait, 0.001), 0.1))
+
+# Linux下ioprio_set的系统调用号，按CPU架构区分
+IOPRIO_SET_SYSCALLS = {'x86_64': 251, 'amd64': 251, 'i386': 289, 'i686': 289,
+                       'aarch64': 30, 'arm64': 30, 'armv7l': 314}
+IOPRIO_WHO_PROCESS = 1
+IOPRIO_CLASS_IDLE = 3
+IOPRIO_CLASS_SHIFT = 13
+
+def lower_thread_priority():
+    """后台模式：把当前线程的CPU优先级降到最低(nice 19)，I/O调度类设为idle
+    
+    Linux下nice值和I/O优先级都按线程生效，只对工作线程调用，界面线程不受影响。
+    其他系统不支持时返回False。
+    """
+    if not sys.platform.startswith('linux'):
+        return False
+    try:
+        # Linux下who为0时setpriority只作用于调用线程
+        os.setpriority(os.PRIO_PROCESS, 0, 19)
+        syscall_number = IOPRIO_SET_SYSCALLS.get(platform.machine().lower())
+        if syscall_number is None:
+            return False
+        libc = ctypes.CDLL(None, use_errno=True)
+        return libc.syscall(syscall_number, IOPRIO_WHO_PROCESS, 0,
+                            IOPRIO_CLASS_IDLE << IOPRIO_CLASS_SHIFT) == 0
+    except (OSError, AttributeError):
+        return False
+
+# ================ 页缓存提示 ================
+
+# 预读的文件头长度，覆盖各格式解析日期时读取的范围
+HEADER_PREFETCH_SIZE = 256 * 1024
+# 只对大文件做读写后释放页缓存，小文件留在缓存中代价很小
+DROP_BEHIND_MIN_SIZE = 32 * 1024 * 1024
+# 每读写这么多数据释放一次已处理部分的页缓存
+DROP_BEHIND_WINDOW = 16 * 1024 * 1024
+
+def fadvise(fd, offset, length, advice):
+    """向内核提示文件的访问方式（posix_fadvise），不支持的系统上忽略"""
+    if hasattr(os, 'posix_fadvise'):
+        try:
+            os.posix_fadvise(fd, offset, length, advice)
+        except OSError:
+            pass
+
+def prefetch_header(file_path, length=HEADER_PREFETCH_SIZE):
+    """让内核在后台预读文件头（WILLNEED），稍后的元数据读取不必等待磁盘"""
+    if not hasattr(os, 'posix_fadvise'):
+        return
+    try:
+        fd = os.open(file_path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        fadvise(fd, 0, length, os.POSIX_FADV_WILLNEED)
+    finally:
+        os.close(fd)
+
+class DropBehind:
+    """大文件顺序读写时分段释放已处理部分的页缓存（DONTNEED）
+    
+    干净的页（读取的源文件）提示后立即释放；脏页（写入的目标文件）第一次提示只会启动回写，
+    所以每段提示两次：上一段回写完成后在下一个窗口再次提示时释放。长时间传输的内存占用因此保持平稳。
+    """
+    def __init__(self, file, size):
+        self.fd = None
+        if hasattr(os, 'posix_fadvise') and size >= DROP_BEHIND_MIN_SIZE:
+            try:
+                self.fd = file.fileno()
+            except (AttributeError, OSError, ValueError):
+                pass  # 压缩包成员等没有独立文件描述符的流
+        self.written = 0  # 已提示过一次（已启动回写）的位置
+        self.released = 0  # 已再次提示（已释放）的位置
+    
+    def advance(self, position):
+        """读写到position后调用"""
+        if self.fd is None or position - self.written < DROP_BEHIND_WINDOW:
+            return
+        if self.written > self.released:  # 长度0表示到文件末尾，不能传入
+            fadvise(self.fd, self.released, self.written - self.released, os.POSIX_FADV_DONTNEED)
+        fadvise(self.fd, self.written, position - self.written, os.POSIX_FADV_DONTNEED)
+        self.released, self.written = self.written, position
+    
+    def finish(self):
+        """处理完整个文件后释放剩余部分"""
+        if self.fd is not None:
+            fadvise(self.fd, 0, 0, os.POSIX_FADV_DONTNEED)
+
+# ================ 落盘策略 ================
+
+DURABILITY_MODES = ("none", "batched", "strict")
+
+def fsync_path(path):
+    """fsync一个文件或目录
+    
+    Windows上fsync（FlushFileBuffers）要求可写的句柄，只读打开会返回EBADF，所以文件以读写方式打开；
+    Windows不支持打开目录，目录跳过。只读文件在POSIX上退回只读打开。
+    """
+    if os.path.isdir(path):
+        if sys.platform == 'win32':
+            return
+        fd = os.open(path, os.O_RDONLY)
+    else:
+        try:
+            fd = os.open(path, os.O_RDWR)
+        except PermissionError:
+            if sys.platform == 'win32':
+                raise
+            fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+class DurabilityPolicy:
+    """目标文件的落盘策略，决定何时fsync以及何时可以删除源文件
+    
+    none: 不主动fsync，由操作系统回写，写完即删除源文件；
+    batched: 每batch_size个文件一起fsync文件和所在目录，之后才删除这一批的源文件；
+    strict: 每个文件写完立即fsync文件和目录，再删除源文件。
+    断电时已删除源文件的目标文件都已落盘；批量模式下尚未落盘的一批源文件仍然保留。
+    复制的数据为了回读校验在关闭目标文件前已经fsync（见copy_stream），提交时只需同步目录。
+    """
+    def __init__(self, mode="none", batch_size=32, on_error=None):
+        self.mode = mode
+        self.batch_size = batch_size
+        self.on_error = on_error or (lambda message: None)
+        self.lock = threading.Lock()
+        self.pending = []  # [(目标文件元组, 源文件或None, 是否需要同步数据)]
+        self.synced_files = 0
+        self.sync_time = 0.0
+    
+    def commit(self, dst, src=None, sync_data=True):
+        """目标文件写入完成后调用；src不为None时在目标落盘后删除源文件
+        
+        dst也可以是多个目标文件的列表（同时写入多个目标时），全部落盘后才删除源文件。
+        sync_data为False时（同一设备重命名、硬链接等没有写入新数据）只同步目录项。
+        """
+        dsts = (dst,) if isinstance(dst, str) else tuple(dst)
+        if self.mode == "none":
+            if src:
+                os.unlink(src)
+            return
+        if self.mode == "strict":
+            self.sync([(dsts, src, sync_data)])
+            return
+        with self.lock:
+            self.pending.append((dsts, src, sync_data))
+            if len(self.pending) < self.batch_size:
+                return
+            batch, self.pending = self.pending, []
+        self.sync(batch)
+    
+    def commit_copy(self, dst, src=None):
+        """提交复制写入的目标文件，数据在回读校验前已经fsync过，只需同步目录项"""
+        self.commit(dst, src, sync_data=False)
+    
+    def flush(self):
+        """同步剩余未满一批的文件，运行结束（包括停止）时调用"""
+        with self.lock:
+            batch, self.pending = self.pending, []
+        if batch:
+            self.sync(batch)
+    
+    def sync(self, batch):
+        """fsync一批文件和它们所在的目录，然后删除对应的源文件
+        
+        文件或其所在目录同步失败时保留源文件：目录项没有落盘时，断电后目标文件可能不存在。
+        """
+        started = time.perf_counter()
+        synced = []
+        for dsts, src, sync_data in batch:
+            try:
+                if sync_data:
+                    for dst in dsts:
+                        fsync_path(dst)
+                synced.append((dsts, src))
+            except OSError as e:
+                self.on_error(f"同步 {os.path.basename(dsts[0])} 失败: {str(e)}，已保留源文件")
+        failed_folders = set()
+        for folder in {os.path.dirname(dst) for dsts, _, _ in batch for dst in dsts}:
+            try:
+                fsync_path(folder)
+            except OSError as e:
+                failed_folders.add(folder)
+                self.on_error(f"同步目录 {folder} 失败: {str(e)}，已保留其中文件的源文件")
+        if failed_folders:
+            synced = [(dsts, src) for dsts, src in synced
+                      if not any(os.path.dirname(dst) in failed_folders for dst in dsts)]
+        with self.lock:
+            self.synced_files += sum(len(dsts) for dsts, _ in synced)
+            self.sync_time += time.perf_counter() - started
+        for _, src in synced:
+            if src:
+                try:
+                    os.unlink(src)
+                except OSError as e:
+                    self.on_error(f"删除源文件 {os.path.basename(src)} 失败: {str(e)}")
+
+# 每个目标文件夹中的校验清单，格式与b2sum一致，可用 b2sum -c 校验
+MANIFEST_NAME = '.ca2025.b2sum'
+
+def hash_file(file_path, chunk_size=1024 * 1024):
+    """计算文件的BLAKE2b-512摘要（与b2sum默认算法相同），返回十六进制字符串"""
+    hasher = hashlib.blake2b()
+    with open(file_path, 'rb') as f:
+        drop_behind = DropBehind(f, os.fstat(f.fileno()).st_size)
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            hasher.update(chunk)
+            drop_behind.advance(f.tell())
+        drop_behind.finish()
+    return hasher.hexdigest()
+
+def format_manifest_line(digest, filename):
+    """生成b2sum格式的一行，文件名含反斜杠或换行时按b2sum的规则转义"""
+    if '\\' in filename or '\n' in filename:
+        filename = filename.replace('\\', '\\\\').replace('\n', '\\n')
+        return f"\\{digest}  {filename}\n"
+    return f"{digest}  {filename}\n"
+
+def compact_manifest(manifest_path):
+    """同一文件名在清单中有多行时（覆盖写入的文件会追加新摘要）只保留最后一行"""
+    with open(manifest_path, encoding='utf-8') as f:
+        lines = f.readlines()
+    entries = {}
+    for line in lines:
+        filename = line.partition('  ')[2]  # 转义后的文件名，同一文件名转义结果相同
+        entries.pop(filename, None)
+        entries[filename] = line
+    if len(entries) == len(lines):
+        return
+    temp_path = manifest_path + '.part'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        f.writelines(entries.values())
+    os.replace(temp_path, manifest_path)
+
+# ================ 库索引 ================
+
+# 程序在目标文件夹中写入的文件（校验清单、库索引）都以此为前缀，扫描目标文件夹时跳过
+LIBRARY_FILE_PREFIX = '.ca2025.'
+LIBRARY_INDEX_NAME = '.ca2025.db'
+
+class LibraryIndex:
+    """目标文件夹的持久化库索引（SQLite），记录每个文件的名称、大小、拍摄日期和内容摘要
+    
+    大小和摘要上建有B树索引，查找为O(log n)。同一个连接在多个线程间共享，由锁串行化；
+    写入攒批提交，close()时提交剩余的修改。
+    """
+    COMMIT_EVERY = 200
+    
+    def __init__(self, dest_folder):
+        self.dest_folder = dest_folder
+        self.lock = threading.Lock()
+        self.pending = 0
+        self.conn = sqlite3.connect(os.path.join(dest_folder, LIBRARY_INDEX_NAME), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,  -- 相对目标根目录的路径
+                name TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                date TEXT,
+                digest TEXT,
+                mtime REAL
+            );
+            CREATE INDEX IF NOT EXISTS files_size ON files(size);
+            CREATE INDEX IF NOT EXISTS files_digest ON files(digest);
+        """)
+    
+    def relative_path(self, file_path):
+        return os.path.relpath(file_path, self.dest_folder)
+    
+    def add(self, file_path, size, date=None, digest=None, mtime=None):
+        """新增或更新一个文件的记录"""
+        with self.lock:
+            self.conn.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?)",
+                              (self.relative_path(file_path), os.path.basename(file_path),
+                               size, date, digest, mtime))
+            self._changed()
+    
+    def set_digest(self, path, digest):
+        """补充已有记录的摘要，path为相对路径"""
+        with self.lock:
+            self.conn.execute("UPDATE files SET digest = ? WHERE path = ?", (digest, path))
+            self._changed()
+    
+    def remove(self, paths):
+        """删除一批记录，paths为相对路径"""
+        with self.lock:
+            self.conn.executemany("DELETE FROM files WHERE path = ?", [(path,) for path in paths])
+            self._changed()
+    
+    def find_by_size(self, size):
+        """返回大小相同的[(相对路径, 摘要)]"""
+        with self.lock:
+            return self.conn.execute("SELECT path, digest FROM files WHERE size = ?", (size,)).fetchall()
+    
+    def find_by_digest(self, digest):
+        """返回摘要相同的相对路径列表"""
+        with self.lock:
+            rows = self.conn.execute("SELECT path FROM files WHERE digest = ?", (digest,)).fetchall()
+        return [row[0] for row in rows]
+    
+    def entries(self):
+        """返回全部记录 {相对路径: (大小, 修改时间, 摘要)}，用于增量重建"""
+        with self.lock:
+            rows = self.conn.execute("SELECT path, size, mtime, digest FROM files").fetchall()
+        return {path: (size, mtime, digest) for path, size, mtime, digest in rows}
+    
+    def count(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+    
+    def _changed(self):
+        self.pending += 1
+        if self.pending >= self.COMMIT_EVERY:
+            self.conn.commit()
+            self.pending = 0
+    
+    def close(self):
+        with self.lock:
+            self.conn.commit()
+            self.conn.close()
+
+# ================ 增量导入 ================
+
+IMPORT_WATERMARK_NAME = 'imports.db'
+
+def volume_identity(path):
+    """返回(卷标识, 文件夹在卷内的相对路径)，存储卡重新插入或挂载点变化后仍然相同
+    
+    Linux取文件系统UUID（/dev/disk/by-uuid），Windows取卷序列号，都取不到时退回设备号和挂载点。
+    """
+    mount_point = os.path.realpath(path)
+    while not os.path.ismount(mount_point):
+        parent = os.path.dirname(mount_point)
+        if parent == mount_point:
+            break
+        mount_point = parent
+    relative = os.path.relpath(os.path.realpath(path), mount_point).replace(os.sep, '/')
+    
+    if sys.platform == 'win32':
+        serial = ctypes.c_uint32()
+        root = os.path.join(mount_point, '')
+        if ctypes.windll.kernel32.GetVolumeInformationW(ctypes.c_wchar_p(root), None, 0, ctypes.byref(serial),
+                                                         None, None, None, 0):
+            return f"vol:{serial.value:08X}", relative
+    else:
+        try:
+            st_dev = os.stat(mount_point).st_dev
+            device = os.path.basename(os.path.realpath(f'/sys/dev/block/{os.major(st_dev)}:{os.minor(st_dev)}'))
+            for fs_uuid in os.listdir('/dev/disk/by-uuid'):
+                if os.path.basename(os.path.realpath(os.path.join('/dev/disk/by-uuid', fs_uuid))) == device:
+                    return f"uuid:{fs_uuid}", relative
+        except (OSError, AttributeError):
+            pass
+    return f"dev:{os.stat(mount_point).st_dev}:{mount_point}", relative
+
+class ImportWatermark:
+    """源文件夹的增量导入记录（SQLite，保存在程序数据目录），按卷标识和卷内路径区分不同的源
+    
+    记录已导入文件的(名称, 大小, 修改时间)和见过的最新修改时间。再次导入同一张卡时，扫描阶段
+    只需stat就能跳过导入过的文件，不读取元数据。同一个连接在多个线程间共享，由锁串行化。
+    """
+    COMMIT_EVERY = 500
+    
+    def __init__(self, source_folder, db_path=None):
+        identity, relative = volume_identity(source_folder)
+        self.source_key = f"{identity}|{relative}"
+        self.lock = threading.Lock()
+        self.pending = 0
+        self.recorded = 0
+        db_path = db_path or os.path.join(get_app_data_dir(), IMPORT_WATERMARK_NAME)
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS sources (
+                source_key TEXT PRIMARY KEY,  -- 卷标识|卷内路径
+                last_path TEXT,               -- 最近一次导入时的文件夹路径
+                highest_mtime REAL,
+                last_import TEXT
+            );
+            CREATE TABLE IF NOT EXISTS imported (
+                source_key TEXT NOT NULL,
+                name TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime REAL NOT NULL,
+                PRIMARY KEY (source_key, name, size, mtime)
+            ) WITHOUT ROWID;
+        """)
+        row = self.conn.execute("SELECT highest_mtime FROM sources WHERE source_key = ?",
+                                (self.source_key,)).fetchone()
+        self.previous_highest = row[0] if row else None
+        self.highest_mtime = self.previous_highest or 0.0
+        # 一个源的记录数与卡上的文件数相当，全部读入内存后扫描时不必逐个查询
+        self.known = set(self.conn.execute("SELECT name, size, mtime FROM imported WHERE source_key = ?",
+                                           (self.source_key,)))
+        self.source_folder = source_folder
+    
+    def is_imported(self, name, size, mtime):
+        return (name, size, mtime) in self.known
+    
+    def record(self, name, size, mtime):
+        """记录一个已导入（或确认已在库中）的文件"""
+        with self.lock:
+            self.conn.execute("INSERT OR IGNORE INTO imported VALUES (?, ?, ?, ?)",
+                              (self.source_key, name, size, mtime))
+            self.highest_mtime = max(self.highest_mtime, mtime)
+            self.recorded += 1
+            self.pending += 1
+            if self.pending >= self.COMMIT_EVERY:
+                self.conn.commit()
+                self.pending = 0
+    
+    def clear(self):
+        """删除这个源的全部记录，下次重新导入所有文件"""
+        with self.lock:
+            self.conn.execute("DELETE FROM imported WHERE source_key = ?", (self.source_key,))
+            self.conn.execute("DELETE FROM sources WHERE source_key = ?", (self.source_key,))
+            self.known.clear()
+            self.highest_mtime = 0.0
+            self.recorded = 0
+    
+    def close(self):
+        with self.lock:
+            if self.recorded:
+                self.conn.execute("INSERT OR REPLACE INTO sources VALUES (?, ?, ?, ?)",
+                                  (self.source_key, self.source_folder, self.highest_mtime,
+                                   datetime.now().isoformat(timespec='seconds')))
+            self.conn.commit()
+            self.conn.close()
+
+# ================ 结构化事件日志 ================
+
+EVENT_LOG_NAME = 'events.jsonl'
+
+class EventLogWriter:
+    """JSON Lines格式的事件日志，由专用后台线程写入
+    
+    write()只把事件放入队列，调用方不会因磁盘I/O或序列化而阻塞。后台线程每次取空队列，
+    经缓冲写入后刷新一次；文件超过max_bytes时轮转为events.jsonl.1、.2……，保留backup_count个。
+    """
+    _SENTINEL = object()
+    
+    def __init__(self, file_path, max_bytes=10 * 1024 * 1024, backup_count=5):
+        self.file_path = file_path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.queue = queue.SimpleQueue()
+        self.thread = threading.Thread(target=self._run, name="事件日志", daemon=True)
+        self.thread.start()
+    
+    def write(self, event):
+        """提交一条事件（字典），提交后不应再修改"""
+        self.queue.put(event)
+    
+    def close(self):
+        """写完队列中剩余的事件后关闭"""
+        if self.thread.is_alive():
+            self.queue.put(self._SENTINEL)
+            self.thread.join()
+    
+    def _open(self):
+        return open(self.file_path, 'a', encoding='utf-8', newline='\n', buffering=64 * 1024)
+    
+    def _rotate(self, f):
+        f.close()
+        for index in range(self.backup_count - 1, 0, -1):
+            older = f"{self.file_path}.{index}"
+            if os.path.exists(older):
+                os.replace(older, f"{self.file_path}.{index + 1}")
+        os.replace(self.file_path, f"{self.file_path}.1")
+        return self._open()
+    
+    def _run(self):
+        f = self._open()
+        event = None
+        while event is not self._SENTINEL:
+            event = self.queue.get()
+            while event is not self._SENTINEL:
+                try:
+                    f.write(json.dumps(event, ensure_ascii=False, default=str) + '\n')
+                    if f.tell() >= self.max_bytes:
+                        f = self._rotate(f)
+                except (OSError, ValueError):
+                    pass  # 日志写入失败不影响文件整理
+                try:
+                    event = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+            f.flush()
+        f.close()
+
+# 移动方式和出错阶段在界面日志中的显示文字
+ACTION_TEXT = {"moved": "已移动~", "renamed": "重命名并移动", "overwritten": "覆盖并移动"}
+MODE_ACTION_PREFIX = {"moved": "已", "renamed": "重命名并", "overwritten": "覆盖并"}
+MODE_TEXT = {"copy": "复制", "hardlink": "硬链接", "symlink": "符号链接", "reflink": "克隆",
+             "extract": "解压"}
+ERROR_STAGE_TEXT = {"元数据": "读取", "传输": "移动", "校验": "校验"}
+
+def render_event(event):
+    """把结构化事件渲染为界面日志文本，不需要显示的事件返回None"""
+    kind = event["event"]
+    if kind == "organized":
+        mode = event.get("mode", "move")
+        if mode == "move":
+            text = ACTION_TEXT[event['action']]
+        else:
+            text = MODE_ACTION_PREFIX[event['action']] + MODE_TEXT[mode]
+        return f"{text}: {event['file']} -> {event['folder']}"
+    if kind == "duplicate":
+        return f"库中已有相同文件，已跳过: {event['file']} (= {event['existing']})"
+    if kind == "skipped":
+        suffix = "" if event.get("date") else " (unknown_date)"
+        return f"已跳过同名文件: {event['file']}{suffix}"
+    if kind == "error":
+        verb = ERROR_STAGE_TEXT.get(event["stage"])
+        if verb:
+            return f"{verb} {event['file']} 失败: {event['error']}！"
+        return f"处理 {event['file']} 时出错({event['stage']}): {event['error']}！"
+    if kind == "warning":
+        return event["message"]
+    if kind == "summary":
+        return f"[统计] {event['message']}"
+    if kind == "run_end" and event.get("stopped"):
+        return "操作已停止！"
+    return None
+
+# 整理方式：移动源文件，或在目标目录中创建副本、链接而保留源文件
+ORGANIZE_MODES = ("move", "copy", "hardlink", "symlink", "reflink")
+FICLONE = 0x40049409
+
+def reflink_file(src, dst):
+    """用FICLONE创建与源文件共享数据块的写时复制克隆（btrfs、XFS等），不支持时抛出OSError"""
+    if fcntl is None or not sys.platform.startswith('linux'):
+        raise OSError(errno.EOPNOTSUPP, "当前系统不支持reflink")
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+    shutil.copystat(src, dst)
+
+def create_link(mode, src, dst):
+    """按整理方式创建硬链接、符号链接或reflink克隆"""
+    if mode == "hardlink":
+        os.link(src, dst)
+    elif mode == "symlink":
+        os.symlink(os.path.abspath(src), dst)
+    else:
+        reflink_file(src, dst)
+
 class FileTransferThread(QThread):
     """文件传输线程，用于在后台处理文件移动，避免UI卡顿"""
     progress_updated = pyqtSignal(int)
@@ -21,205 +2118,1333 @@ class FileTransferThread(QThread):
     transfer_complete = pyqtSignal()
     speed_updated = pyqtSignal(str)
     file_count_updated = pyqtSignal(int, int)  # 当前数量, 总数量
+    destinations_updated = pyqtSignal(str)  # 同时写入多个目标时各目标的进度
+    
+    # 各阶段默认并发数：规划阶段需单线程以保证同名文件检测的一致性，库内查重需要读取文件计算摘要，
+    # 放在规划之前的多线程阶段；传输阶段分为大文件通道(transfer)和小文件通道(transfer_small)，
+    # 大文件通道的并发数就是其线程数，小文件通道同时进行的传输数由AdaptiveConcurrency按实测吞吐量限制
+    DEFAULT_STAGE_WORKERS = {"classify": 1, "metadata": 2, "dedupe": 4, "plan": 1, "transfer": 1,
+                             "transfer_small": AdaptiveConcurrency.MAX_LEVEL, "verify": 1}
+    
+    # 进程池后端的每批文件数，降低每个文件的进程间通信开销
+    PROCESS_BATCH_SIZE = 32
+    # 规划阶段每批最多取出的任务数，同一批内按目标文件夹分组（只在批内分组，见plan_destination_batch）
+    PLAN_BATCH_SIZE = 64
+    # 跨设备复制时每次读写的块大小，也是带宽限速的粒度
+    COPY_CHUNK_SIZE = 1024 * 1024
+    
+    def __init__(self, source_folder, dest_folder, file_list, file_type_filter, 
+                 custom_extensions=None, duplicate_handling=1, stage_workers=None,
+                 metadata_backend="thread", physical_order=True, dest_layout=None,
+                 bandwidth_limit=0, ops_limit=0, background=False, write_manifest=False,
+                 event_log=None, library_mode=0, organize_mode="move", durability="none",
+                 bandwidth_bucket=None, ops_bucket=None, incremental=False, backup_folders=()):
+        super().__init__()
+        self.source_folder = source_folder
+        self.dest_folder = dest_folder
+        self.file_list = file_list
+        self.file_type_filter = file_type_filter  # 过滤的文件类型
+        self.custom_extensions = custom_extensions if custom_extensions else []  # 自定义扩展名
+        self.duplicate_handling = duplicate_handling  # 1:重命名, 2:覆盖, 3:跳过
+        self.stage_workers = dict(self.DEFAULT_STAGE_WORKERS, **(stage_workers or {}))
+        self.metadata_backend = metadata_backend  # "thread":线程, "process":进程池
+        self.offload = None
+        self.physical_order = physical_order  # 按磁盘物理位置排序传输
+        self.scheduler = PhysicalOrderScheduler()
+        self.lane_router = SizeLaneRouter()
+        self.concurrency = None  # 运行开始时按设备类型创建
+        self.summary_lines = []  # 运行结束时输出的统计信息
+        self.dest_layout = dest_layout or DestinationLayout()
+        # 传入共享的令牌桶时，多个同时运行的任务分摊同一份带宽和操作数额度
+        self.bandwidth_bucket = bandwidth_bucket or TokenBucket(bandwidth_limit)  # 字节/秒
+        self.ops_bucket = ops_bucket or TokenBucket(ops_limit)  # 文件/秒
+        self.background = background  # 后台模式：降低工作线程的CPU和I/O优先级
+        self.write_manifest = write_manifest  # 在每个目标文件夹写入b2sum校验清单
+        self.manifest_lock = threading.Lock()
+        self.manifest_folders = set()
+        self.overwritten_manifests = set()  # 有文件被覆盖、清单中可能有旧摘要的文件夹
+        self.verified_copies = 0  # 复制并回读校验通过的文件数
+        self.organize_mode = organize_mode
+        self.mode_counts = {}  # 各整理方式实际处理的文件数
+        self.fallback_reported = False
+        self.durability = DurabilityPolicy(
+            durability, on_error=lambda message: self.emit_event("warning", message=message))
+        self.bytes_transferred = 0
+        self.event_log = event_log  # 结构化事件日志，None时只显示在界面上
+        self.stage_names = []  # 本次运行的阶段名，与任务的durations按顺序对应
+        self.run_id = uuid.uuid4().hex[:12]
+        self.library_mode = library_mode  # 0:不使用库索引, 1:记录到库索引, 2:记录并跳过库中已有的文件
+        self.library_index = None
+        self.library_added = 0
+        self.library_duplicates = 0
+        self.incremental = incremental  # 跳过上次从同一个源导入过的文件
+        self.import_watermark = None
+        self.known_skipped = 0
+        # 备份目标：每个文件读取一次，同时写入主目标和所有备份目标，保持相同的目录结构
+        self.backup_folders = list(backup_folders)
+        # 各目标根目录 -> [文件数, 字节数, 写入耗时]，只在有备份目标时统计
+        self.destination_stats = ({root: [0, 0, 0.0] for root in [dest_folder] + self.backup_folders}
+                                  if self.backup_folders else {})
+        self.running = True
+        self.paused = False
+        self.stopped = False
+        self.planned_paths = set()  # 本次运行中已分配的目标路径
+        self.progress_lock = threading.Lock()
+        
+    def run(self):
+        self.total_files = self.count_files()
+        self.processed_files = 0
+        self.start_time = time.time()
+        self.last_time = self.start_time
+        self.last_processed = 0
+        self.emit_event("run_start", source=self.source_folder, dest=self.dest_folder,
+                        files=self.total_files)
+        
+        initializer = None
+        if self.background:
+            if lower_thread_priority():
+                initializer = lower_thread_priority
+                self.summary_lines.append("后台模式: 已降低CPU和I/O优先级")
+            else:
+                self.summary_lines.append("后台模式: 当前系统不支持调整I/O优先级")
+        
+        level, storage = initial_concurrency(self.source_folder, self.dest_folder)
+        self.concurrency = AdaptiveConcurrency(level, self.stage_workers["transfer_small"])
+        self.storage_description = storage
+        
+        if self.library_mode:
+            try:
+                self.library_index = LibraryIndex(self.dest_folder)
+            except sqlite3.Error as e:
+                self.emit_event("warning", message=f"打开库索引失败: {str(e)}，本次不更新库索引")
+        
+        # 移动后源文件夹中不再有这些文件，只有保留源文件的整理方式需要增量记录
+        if self.incremental and self.organize_mode != "move" and os.path.isdir(self.source_folder):
+            try:
+                self.import_watermark = ImportWatermark(self.source_folder)
+            except (sqlite3.Error, OSError) as e:
+                self.emit_event("warning", message=f"打开增量导入记录失败: {str(e)}，本次处理全部文件")
+        
+        try:
+            self.process_files(initializer)
+        finally:
+            # 停止时也要让已写入的文件落盘，再删除对应的源文件
+            self.durability.flush()
+            self.compact_manifests()
+            if self.offload:
+                self.offload.shutdown()
+            if self.library_index:
+                try:
+                    self.library_index.close()
+                except sqlite3.Error as e:
+                    self.emit_event("warning", message=f"保存库索引失败: {str(e)}，可稍后重建库索引")
+            if self.import_watermark:
+                self.import_watermark.close()
+        
+        if self.destination_stats:
+            self.destinations_updated.emit(self.format_destinations())
+        self.emit_run_summary()
+        self.emit_event("run_end", stopped=self.stopped, processed=self.processed_files,
+                        elapsed=round(time.time() - self.start_time, 3))
+        self.transfer_complete.emit()
+    
+    def count_files(self):
+        """待处理的文件总数，用于计算进度"""
+        return len(self.file_list)
+    
+    def progress_fraction(self):
+        """当前进度（0~1）"""
+        return self.processed_files / self.total_files if self.total_files else 0.0
+    
+    def process_files(self, initializer=None):
+        """按分阶段流水线处理源文件夹中的文件"""
+        pipeline = StagedPipeline(initializer=initializer)
+        pipeline.add_stage("分类", self.classify_file, self.stage_workers["classify"])
+        if self.metadata_backend == "process":
+            # 每个元数据线程持有一批任务等待子进程返回，线程数与进程数一致才能占满进程池
+            self.offload = ProcessOffload()
+            pipeline.add_stage("元数据", self.read_metadata_batch, self.offload.max_workers,
+                               batch_size=self.PROCESS_BATCH_SIZE)
+        else:
+            pipeline.add_stage("元数据", self.read_file_metadata, self.stage_workers["metadata"])
+        if self.library_mode == 2:
+            pipeline.add_stage("查重", self.check_library_duplicate, self.stage_workers["dedupe"])
+        pipeline.add_stage("规划", self.plan_destination_batch, self.stage_workers["plan"],
+                           batch_size=self.PLAN_BATCH_SIZE)
+        # 大文件通道的队列不限长度，大视频排队时规划阶段不会阻塞，后面的小文件照常进入小文件通道
+        pipeline.add_stage("传输", {"large": self.transfer_large_file, "small": self.transfer_file},
+                           route=self.lane_router.route,
+                           lanes={"large": (self.stage_workers["transfer"], 0),
+                                  "small": (self.stage_workers["transfer_small"], pipeline.queue_size)})
+        # 已传输的文件在停止后仍需校验并记录日志
+        pipeline.add_stage("校验", self.verify_transfer, self.stage_workers["verify"], stoppable=False)
+        self.stage_names = pipeline.stage_names
+        pipeline.run(self.scan_files(), self.on_task_done, should_stop=lambda: self.stopped,
+                     wait_if_paused=self.wait_if_paused, on_error=self.on_task_error)
+    
+    def emit_run_summary(self):
+        """输出本次运行的统计信息"""
+        elapsed = time.time() - self.start_time
+        self.summary_lines.insert(0, f"耗时 {elapsed:.1f} 秒，处理 {self.processed_files} 个文件")
+        elapsed = max(elapsed, 0.001)
+        mode_text = {"none": "不主动落盘", "batched": f"批量落盘(每{self.durability.batch_size}个)",
+                     "strict": "逐个落盘"}[self.durability.mode]
+        line = (f"落盘策略: {mode_text}，吞吐 {self.bytes_transferred / elapsed / 1024 / 1024:.1f} MB/s，"
+                f"{self.processed_files / elapsed:.1f} 个文件/秒")
+        if self.durability.mode != "none":
+            line += (f"，fsync {self.durability.synced_files} 个文件"
+                     f"耗时 {self.durability.sync_time:.2f} 秒")
+        self.summary_lines.append(line)
+        if self.concurrency.operations:
+            self.summary_lines.append(f"传输并发: {self.storage_description}，"
+                                      f"小文件通道{self.concurrency.format_summary()}")
+        router = self.lane_router
+        if router.lane_counts["large"]:
+            throughput = f"{router.throughput / 1024 / 1024:.1f} MB/s" if router.throughput else "--"
+            self.summary_lines.append(
+                f"传输通道: 大文件 {router.lane_counts['large']} 个({format_size(router.lane_bytes['large'])})，"
+                f"小文件 {router.lane_counts['small']} 个({format_size(router.lane_bytes['small'])})，"
+                f"分界 {format_size(router.threshold)}，实测吞吐 {throughput}")
+        if self.organize_mode != "move":
+            counts = "，".join(f"{MODE_TEXT[mode]} {count} 个" for mode, count in self.mode_counts.items())
+            self.summary_lines.append(f"整理方式: {counts or '无'}，源文件保留")
+        if self.verified_copies:
+            self.summary_lines.append(f"完整性校验: {self.verified_copies} 个复制的文件摘要一致")
+        if self.manifest_folders:
+            self.summary_lines.append(f"校验清单: 写入 {len(self.manifest_folders)} 个文件夹的 {MANIFEST_NAME}")
+        if self.library_index:
+            self.summary_lines.append(f"库索引: 新增 {self.library_added} 条记录，"
+                                      f"跳过库中已有的文件 {self.library_duplicates} 个")
+        for index, (root, (files, size, write_time)) in enumerate(self.destination_stats.items()):
+            rate = f"，写入 {size / write_time / 1024 / 1024:.1f} MB/s" if write_time > 0 else ""
+            self.summary_lines.append(f"{'主目标' if index == 0 else f'备份{index}'} {root}: "
+                                      f"{files} 个文件({format_size(size)}){rate}")
+        if self.import_watermark:
+            previous = (datetime.fromtimestamp(self.import_watermark.previous_highest).strftime('%Y-%m-%d %H:%M:%S')
+                        if self.import_watermark.previous_highest else "无")
+            self.summary_lines.append(f"增量导入: 跳过已导入的 {self.known_skipped} 个文件"
+                                      f"（上次导入的最新文件时间 {previous}），"
+                                      f"本次记录 {self.import_watermark.recorded} 个")
+        elif self.incremental and self.organize_mode == "move":
+            self.summary_lines.append("增量导入: 移动后源文件不再保留，无需记录")
+        if self.dest_layout.shard_count:
+            self.summary_lines.append(f"目录分片: 新建 {self.dest_layout.shard_count} 个分片目录"
+                                      f"（每个目录上限 {self.dest_layout.shard_limit} 个条目）")
+        for line in self.summary_lines:
+            self.emit_event("summary", message=line)
+    
+    def emit_event(self, kind, **fields):
+        """记录一条结构化事件：写入事件日志，并渲染为文本显示在界面日志中"""
+        event = {"time": datetime.now().isoformat(timespec='milliseconds'),
+                 "run": self.run_id, "event": kind}
+        event.update(fields)
+        if self.event_log:
+            self.event_log.write(event)
+        text = render_event(event)
+        if text:
+            self.log_updated.emit(text)
+    
+    def emit_task_event(self, task):
+        """把结束的任务记录为事件，被过滤的任务不记录"""
+        if task.outcome is None:
+            return
+        fields = {"file": task.filename, "size": task.size, "source": task.file_path,
+                  "date": task.date, "date_source": task.date_source,
+                  "durations": task.duration_map(self.stage_names)}
+        if task.outcome == "organized":
+            fields.update(dest=task.dest_path, folder=task.target_folder, action=task.action,
+                          mode=task.mode, digest=task.digest)
+        elif task.outcome == "error":
+            fields.update(stage=task.error_stage, error=task.error)
+        elif task.outcome == "duplicate":
+            fields.update(existing=task.duplicate_of, digest=task.digest)
+        self.emit_event(task.outcome, **fields)
+    
+    def wait_if_paused(self):
+        """暂停时阻塞当前线程，直到继续或停止"""
+        while self.paused and not self.stopped:
+            time.sleep(0.1)
+    
+    def on_task_error(self, task, error):
+        """记录任务结果时出错（例如增量导入记录写入失败），记为警告"""
+        self.emit_event("warning", file=task.filename, message=f"记录 {task.filename} 的结果失败: {str(error)}")
+    
+    def on_task_done(self, task):
+        """任务结束（完成、跳过或出错）时更新日志、进度和速度"""
+        with self.progress_lock:
+            self.emit_task_event(task)
+            if self.import_watermark and task.outcome in ("organized", "duplicate", "skipped"):
+                self.import_watermark.record(task.filename, task.size, task.mtime)
+            
+            self.processed_files += 1
+            progress = int(self.progress_fraction() * 100)
+            self.progress_updated.emit(progress)
+            self.file_count_updated.emit(self.processed_files, self.total_files)
+            
+            # 计算传输速度
+            current_time = time.time()
+            if current_time - self.last_time >= 1:  # 每秒更新一次速度
+                files_per_sec = (self.processed_files - self.last_processed) / (current_time - self.last_time)
+                self.speed_updated.emit(f"{files_per_sec:.1f} 个文件/秒")
+                self.last_time = current_time
+                self.last_processed = self.processed_files
+                if self.destination_stats:
+                    self.destinations_updated.emit(self.format_destinations())
+    
+    def format_destinations(self):
+        """各目标已写入的文件数和大小"""
+        return " | ".join(f"{'主目标' if index == 0 else f'备份{index}'}: {files} 个，{format_size(size)}"
+                          for index, (files, size, _) in enumerate(self.destination_stats.values()))
+    
+    def scan_files(self):
+        """扫描阶段：为待处理的文件生成任务，按磁盘物理位置排序"""
+        tasks = [PipelineTask(self.source_folder, filename) for filename in self.file_list]
+        if self.import_watermark:
+            tasks = self.skip_imported(tasks)
+        if self.physical_order:
+            tasks = self.scheduler.order(tasks)
+            # 只是按排序键推算的寻道距离，不是实测；实际吞吐见落盘策略一行
+            self.summary_lines.append(f"传输顺序: 按{self.scheduler.method}排序，"
+                                      f"估算寻道距离减少 {self.scheduler.seek_reduction * 100:.1f}%")
+        else:
+            self.summary_lines.append("传输顺序: 目录顺序")
+        # 逐个从列表中取出，已处理完的任务随即释放，内存中只保留尚未完成的任务
+        tasks.reverse()
+        while tasks:
+            yield tasks.pop()
+    
+    def skip_imported(self, tasks):
+        """去掉上次已从这个源导入过的文件，只需stat，不读取元数据"""
+        new_tasks = []
+        for task in tasks:
+            try:
+                task.load_stat()
+            except OSError:
+                new_tasks.append(task)  # 文件已不存在，由元数据阶段报告错误
+                continue
+            if not self.import_watermark.is_imported(task.filename, task.size, task.mtime):
+                new_tasks.append(task)
+        skipped = len(tasks) - len(new_tasks)
+        if skipped:
+            with self.progress_lock:
+                self.known_skipped = skipped
+                self.total_files -= skipped
+                self.file_count_updated.emit(self.processed_files, self.total_files)
+        return new_tasks
+    
+    def classify_file(self, task):
+        """分类阶段：根据选择的文件类型进行过滤，并预读通过筛选的文件头"""
+        if not self.should_process_file(task.filename):
+            return None
+        # 分类阶段领先元数据阶段一个队列的长度，文件头在轮到读取日期前已进入页缓存
+        prefetch_header(task.file_path)
+        return task
+    
+    def read_file_metadata(self, task):
+        """元数据阶段：读取文件大小和日期"""
+        task.load_stat()
+        info = {}
+        task.date = self.get_file_date(task.file_path, info, task.mtime)
+        task.camera_model = info.get('camera_model')
+        task.date_source = info.get('date_source')
+        return task
+    
+    def read_metadata_batch(self, tasks):
+        """元数据阶段（进程池后端）：一批文件交给子进程解析"""
+        # 已读取过stat的任务（增量导入时）把结果一起传过去，子进程不再重复stat
+        items = [(task.file_path, None if task.mtime is None else (task.size, task.mtime, task.inode))
+                 for task in tasks]
+        results = self.offload.run_batch(read_file_metadata_batch, items)
+        for task, (stat, date, warning, info) in zip(tasks, results):
+            if stat is None:
+                task.fail("元数据", warning)
+                continue
+            if warning:
+                self.emit_event("warning", file=task.filename, message=warning)
+            task.size, task.mtime, task.inode = stat
+            task.date = date
+            task.camera_model = info.get('camera_model')
+            task.date_source = info.get('date_source')
+        return [task for task in tasks if task.outcome is None]
+    
+    def should_process_file(self, filename):
+        """根据选择的文件类型判断是否处理该文件"""
+        return should_process_file(filename, self.file_type_filter, self.custom_extensions)
+    
+    def pause(self):
+        self.paused = True
+        self.running = False
+    
+    def resume(self):
+        self.paused = False
+        self.running = True
+    
+    def stop(self):
+        self.stopped = True
+        self.running = False
+        self.paused = False
+    
+    def set_throttle(self, bandwidth_limit, ops_limit):
+        """运行中调整带宽(字节/秒)和文件操作数(个/秒)限制，0表示不限制"""
+        self.bandwidth_bucket.set_rate(bandwidth_limit)
+        self.ops_bucket.set_rate(ops_limit)
+    
+    def get_file_date(self, file_path, info=None, mtime=None):
+        """获取文件的日期信息，支持图片、视频和LRV文件"""
+        date, warning = resolve_file_date(file_path, info, mtime)
+        if warning:
+            self.emit_event("warning", file=os.path.basename(file_path), message=warning)
+        return date
+    
+    def get_target_folder(self, task):
+        """按目录模板确定文件的目标文件夹（相对目标根目录）"""
+        return self.dest_layout.folder_for(task.file_path, task.date, task.camera_model, task.mtime)
+    
+    def is_dest_taken(self, dest_path):
+        """目标路径已存在或已分配给本次运行中的其他文件"""
+        return dest_path in self.planned_paths or os.path.exists(dest_path)
+    
+    def plan_destination_batch(self, tasks):
+        """规划阶段：一批任务按目标文件夹分组，组内保持磁盘顺序，使写入集中在同一目录
+        
+        分组只在一批之内（最多PLAN_BATCH_SIZE个、队列中已有的任务），不跨批：目标文件夹取决于
+        元数据中的日期，扫描时还不知道，整次运行仍大体按磁盘顺序传输。
+        """
+        for task in tasks:
+            # 同一目标文件夹的任务共享一个字符串
+            task.target_folder = sys.intern(self.get_target_folder(task))
+        if self.physical_order:
+            tasks = sorted(tasks, key=lambda task: (task.target_folder, task.disk_key))
+        return [task for task in tasks if self.plan_destination(task) is not None]
+    
+    def plan_destination(self, task):
+        """确定目标路径，处理同名文件"""
+        filename = os.path.basename(task.file_path)
+        # 目录已满时写入分片目录
+        task.target_folder = sys.intern(self.dest_layout.resolve_shard(self.dest_folder, task.target_folder))
+        
+        folder_path = os.path.join(self.dest_folder, task.target_folder)
+        os.makedirs(folder_path, exist_ok=True)
+        dest_path = os.path.join(folder_path, filename)
+        
+        # 处理同名文件
+        if self.is_dest_taken(dest_path):
+            if self.duplicate_handling == 1:  # 重命名
+                counter = 1
+                name, ext = os.path.splitext(filename)
+                while self.is_dest_taken(dest_path):
+                    dest_path = os.path.join(folder_path, f"{name}_{counter}{ext}")
+                    counter += 1
+                action = "renamed"
+            elif self.duplicate_handling == 2:  # 覆盖
+                action = "overwritten"
+            else:  # 跳过
+                self.dest_layout.release_shard(task.target_folder)
+                task.outcome = "skipped"
+                return None
+        else:
+            action = "moved"
+        
+        self.planned_paths.add(dest_path)
+        task.dest_path = dest_path
+        task.action = action
+        if self.backup_folders:
+            task.backup_paths = [self.plan_backup_path(root, dest_path) for root in self.backup_folders]
+        return task
+    
+    def plan_backup_path(self, backup_root, dest_path):
+        """备份目标中与主目标相同的相对路径
+        
+        备份中已有同名文件时，覆盖模式下覆盖，其他情况重命名，保证每个备份都得到这份文件。
+        """
+        backup_path = os.path.join(backup_root, os.path.relpath(dest_path, self.dest_folder))
+        folder_path, filename = os.path.split(backup_path)
+        os.makedirs(folder_path, exist_ok=True)
+        if self.duplicate_handling != 2:
+            counter = 1
+            name, ext = os.path.splitext(filename)
+            while self.is_dest_taken(backup_path):
+                backup_path = os.path.join(folder_path, f"{name}_{counter}{ext}")
+                counter += 1
+        self.planned_paths.add(backup_path)
+        return backup_path
+    
+    def check_library_duplicate(self, task):
+        """查重阶段：库中已有内容相同的文件时结束任务，计算摘要的读取在多个线程中并行进行"""
+        return None if self.skip_library_duplicate(task) else task
+    
+    def skip_library_duplicate(self, task):
+        """开启库内查重且库中已有内容相同的文件时，把任务标记为重复并返回True"""
+        if self.library_mode != 2 or not self.library_index:
+            return False
+        task.duplicate_of = self.find_library_duplicate(task)
+        if not task.duplicate_of:
+            return False
+        task.outcome = "duplicate"
+        with self.progress_lock:
+            self.library_duplicates += 1
+        return True
+    
+    def find_library_duplicate(self, task):
+        """在库索引中查找内容相同的文件，返回其相对路径，没有时返回None
+        
+        先按大小查找候选，只有存在同样大小的文件时才读取源文件计算摘要；
+        候选记录缺少摘要时从库中的文件补算并写回索引。
+        """
+        candidates = self.library_index.find_by_size(task.size)
+        if not candidates:
+            return None
+        if task.digest is None:
+            task.digest = hash_file(task.file_path, self.COPY_CHUNK_SIZE)
+        for path, digest in candidates:
+            if digest is None:
+                library_path = os.path.join(self.dest_folder, path)
+                if not os.path.isfile(library_path):
+                    continue
+                digest = hash_file(library_path, self.COPY_CHUNK_SIZE)
+                self.library_index.set_digest(path, digest)
+            if digest == task.digest:
+                return path
+        return None
+    
+    def transfer_file(self, task):
+        """传输阶段小文件通道：同时进行的传输数由AdaptiveConcurrency按实测吞吐量限制"""
+        self.concurrency.acquire(lambda: self.stopped)
+        try:
+            return self.transfer_task(task, self.concurrency)
+        finally:
+            self.concurrency.release()
+    
+    def transfer_large_file(self, task):
+        """传输阶段大文件通道：并发数就是通道的线程数，不占用小文件通道的名额，
+        机械盘和存储卡上并发数为1时大视频也不会阻塞小文件"""
+        return self.transfer_task(task)
+    
+    def transfer_task(self, task, concurrency=None):
+        """移动文件到目标路径；concurrency不为None时把耗时计入并发数调整"""
+        try:
+            self.ops_bucket.consume(1, lambda: self.stopped)
+            started = time.perf_counter()
+            if task.backup_paths:
+                task.mode, digest = self.fan_out_file(task)
+                task.digest = digest or task.digest
+            elif self.organize_mode == "move":
+                task.mode = "move"
+                task.digest = self.move_file(task.file_path, task.dest_path) or task.digest
+            else:
+                task.mode, digest = self.place_file(task.file_path, task.dest_path)
+                task.digest = digest or task.digest
+            elapsed = time.perf_counter() - started
+            self.lane_router.record(task.size, elapsed)
+            if concurrency is not None:
+                concurrency.record(task.size, elapsed)
+        except Exception as e:
+            self.dest_layout.release_shard(task.target_folder)
+            task.fail("传输", e)
+            return None
+        task.outcome = "organized"
+        with self.progress_lock:
+            self.bytes_transferred += task.size
+            for stats in self.destination_stats.values():
+                stats[0] += 1
+                stats[1] += task.size
+        return task
+    
+    def fan_out_file(self, task):
+        """把文件写入主目标和所有备份目标，源文件只读取一次，返回(实际使用的方式, 摘要)
+        
+        移动时源文件与主目标在同一设备上，先从源文件写好备份，再把源文件重命名为主目标：
+        备份失败时源文件仍在原处，任务失败后可以重试，不会出现源文件已移走而任务记为失败的情况。
+        跨设备时边读源文件边写入所有目标，所有目标都落盘后才删除源文件。链接和克隆只用于主目标，
+        备份总是完整的副本；主目标无法链接时与备份一起复制，源文件仍只读取一次。
+        """
+        src, dst, backups = task.file_path, task.dest_path, task.backup_paths
+        if self.organize_mode == "move":
+            if os.stat(src).st_dev == os.stat(os.path.dirname(dst)).st_dev:
+                digest = self.write_copies(src, backups)
+                self.durability.commit_copy(backups)
+                try:
+                    os.replace(src, dst)
+                except OSError as e:
+                    if e.errno != errno.EXDEV:
+                        raise
+                    # 同一设备的不同挂载点（bind mount）之间也不能重命名，只能再读一次源文件复制主目标
+                    self.write_copies(src, [dst])
+                    self.durability.commit_copy(dst, src)
+                else:
+                    self.durability.commit(dst, sync_data=False)
+                return "move", digest
+            digest = self.write_copies(src, [dst] + backups)
+            self.durability.commit_copy([dst] + backups, src)
+            return "move", digest
+        if self.organize_mode != "copy" and self.link_file(src, dst):
+            digest = self.write_copies(src, backups)
+            self.durability.commit_copy(backups)
+            return self.organize_mode, digest
+        digest = self.write_copies(src, [dst] + backups)
+        self.durability.commit_copy([dst] + backups)
+        with self.progress_lock:
+            self.mode_counts["copy"] = self.mode_counts.get("copy", 0) + 1
+        return "copy", digest
+    
+    def write_copies(self, src, dsts):
+        """读取一次src同时写入多个目标，都先写临时文件，回读校验后再替换为目标路径，返回摘要"""
+        temp_paths = [os.path.join(os.path.dirname(dst), f"{LIBRARY_FILE_PREFIX}{os.path.basename(dst)}.part")
+                      for dst in dsts]
+        digest = self.copy_verified(src, *temp_paths)
+        for temp_path, dst in zip(temp_paths, dsts):
+            os.replace(temp_path, dst)
+        return digest
+    
+    def record_writes(self, dsts, size, write_times):
+        """累计各目标根目录的写入耗时，用于比较各目标的写入速度"""
+        with self.progress_lock:
+            for dst, write_time in zip(dsts, write_times):
+                for root, stats in self.destination_stats.items():
+                    if dst.startswith(os.path.join(root, '')):
+                        stats[2] += write_time
+                        break
+    
+    def move_file(self, src, dst):
+        """同一设备直接重命名；跨设备时分块复制（受带宽限制）后删除源文件
+        
+        跨设备时返回复制过程中计算的摘要，重命名时返回None。源文件按落盘策略在目标落盘后删除。
+        """
+        try:
+            os.replace(src, dst)
+            self.durability.commit(dst, sync_data=False)
+            return None
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+        digest = self.copy_verified(src, dst)
+        self.durability.commit_copy(dst, src)
+        return digest
+    
+    def copy_verified(self, src, *dsts):
+        """复制文件（可同时写入多个目标）并回读目标文件核对摘要，返回摘要
+        
+        确认写入无误后才算复制成功，不再读取源文件；任一目标摘要不一致时删除全部目标文件并抛出OSError。
+        """
+        digest = self.copy_file_chunks(src, *dsts)
+        for dst in dsts:
+            if hash_file(dst, self.COPY_CHUNK_SIZE) != digest:
+                for path in dsts:
+                    os.unlink(path)
+                raise OSError(f"{os.path.basename(dst)} 摘要与复制时不一致，已保留源文件")
+        for dst in dsts:
+            shutil.copystat(src, dst)
+        with self.progress_lock:
+            self.verified_copies += len(dsts)
+        return digest
+    
+    def place_file(self, src, dst):
+        """在目标位置创建链接、克隆或副本并保留源文件，返回(实际使用的方式, 摘要)
+        
+        链接或克隆不可用（跨设备、文件系统不支持、没有权限）时回退为复制。先写入临时文件名，
+        完成后原子地替换为目标路径，覆盖同名文件时也不会留下不完整的文件。
+        """
+        if self.organize_mode != "copy" and self.link_file(src, dst):
+            return self.organize_mode, None
+        digest = self.write_copies(src, [dst])
+        self.durability.commit_copy(dst)
+        with self.progress_lock:
+            self.mode_counts["copy"] = self.mode_counts.get("copy", 0) + 1
+        return "copy", digest
+    
+    def link_file(self, src, dst):
+        """按整理方式在目标位置创建链接或克隆，不可用时返回False，由调用方改为复制"""
+        folder_path, filename = os.path.split(dst)
+        temp_path = os.path.join(folder_path, f"{LIBRARY_FILE_PREFIX}{filename}.part")
+        mode = self.organize_mode
+        try:
+            create_link(mode, src, temp_path)
+        except OSError as e:
+            if os.path.lexists(temp_path):
+                os.unlink(temp_path)
+            with self.progress_lock:
+                report = not self.fallback_reported
+                self.fallback_reported = True
+            if report:
+                self.emit_event("warning", file=os.path.basename(src), mode=mode,
+                                message=f"{MODE_TEXT[mode]}不可用({str(e)})，改为复制")
+            return False
+        os.replace(temp_path, dst)
+        # 硬链接和符号链接没有写入新数据，只需同步目录项
+        self.durability.commit(dst, sync_data=mode == "reflink")
+        with self.progress_lock:
+            self.mode_counts[mode] = self.mode_counts.get(mode, 0) + 1
+        return True
+    
+    def copy_file_chunks(self, src, *dsts):
+        """分块复制文件，每块按带宽限制取令牌，同时计算摘要，返回十六进制摘要"""
+        with open(src, 'rb') as fsrc:
+            return self.copy_stream(fsrc, *dsts)
+    
+    def copy_stream(self, fsrc, *dsts):
+        """把可读的二进制流分块写入一个或多个目标，同时计算摘要，返回十六进制摘要
+        
+        每块读取一次后依次写入各目标。复制失败时删除所有不完整的目标文件。
+        大文件边复制边释放源和目标已处理部分的页缓存。目标文件随后要回读校验，关闭前先fsync
+        并丢弃全部页缓存，回读从存储介质读取，校验的是实际写入的数据而不是内存中的副本；
+        不支持posix_fadvise的系统（Windows）上无法丢弃缓存，回读可能来自缓存。
+        """
+        buffer = bytearray(self.COPY_CHUNK_SIZE)
+        view = memoryview(buffer)
+        hasher = hashlib.blake2b()
+        try:
+            size = os.fstat(fsrc.fileno()).st_size
+        except (AttributeError, OSError, ValueError):
+            size = 0
+        position = 0
+        write_times = [0.0] * len(dsts)
+        try:
+            with contextlib.ExitStack() as stack:
+                fdsts = [stack.enter_context(open(dst, 'wb')) for dst in dsts]
+                src_drop = DropBehind(fsrc, size)
+                dst_drops = [DropBehind(fdst, size) for fdst in fdsts]
+                while True:
+                    chunk_size = fsrc.readinto(buffer)
+                    if not chunk_size:
+                        break
+                    # 限速针对写入量，同时写入多个目标时按总写入量取令牌
+                    self.bandwidth_bucket.consume(chunk_size * len(dsts), lambda: self.stopped)
+                    self.wait_if_paused()
+                    hasher.update(view[:chunk_size])
+                    position += chunk_size
+                    for index, (fdst, dst_drop) in enumerate(zip(fdsts, dst_drops)):
+                        started = time.perf_counter()
+                        fdst.write(view[:chunk_size])
+                        if dst_drop.fd is not None:
+                            fdst.flush()  # 提示前把缓冲区写入内核
+                            dst_drop.advance(position)
+                        write_times[index] += time.perf_counter() - started
+                    src_drop.advance(position)
+                for fdst in fdsts:
+                    fdst.flush()
+                    os.fsync(fdst.fileno())
+                    if hasattr(os, 'POSIX_FADV_DONTNEED'):
+                        # 数据已落盘，页都是干净的，提示后立即释放
+                        fadvise(fdst.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+                src_drop.finish()
+        except BaseException:
+            for dst in dsts:
+                try:
+                    os.unlink(dst)
+                except OSError:
+                    pass
+            raise
+        if self.destination_stats:
+            self.record_writes(dsts, position, write_times)
+        return hasher.hexdigest()
+    
+    def verify_transfer(self, task):
+        """校验阶段：确认目标文件大小与源文件一致，写入校验清单和库索引"""
+        stat = os.stat(task.dest_path)
+        if stat.st_size != task.size:
+            task.fail("校验", "目标文件大小不一致")
+            return task
+        for backup_path in task.backup_paths or ():
+            if os.path.getsize(backup_path) != task.size:
+                task.fail("校验", f"备份文件 {backup_path} 大小不一致")
+                return task
+        if self.write_manifest:
+            # 同设备重命名没有经过复制，需要读取一次目标文件计算摘要
+            if task.digest is None:
+                task.digest = hash_file(task.dest_path, self.COPY_CHUNK_SIZE)
+            # 每个备份目标的文件夹也各有一份清单，可以单独校验
+            for dest_path in [task.dest_path] + (task.backup_paths or []):
+                self.append_manifest(dest_path, task.digest, overwrite=self.duplicate_handling == 2)
+        if self.library_index:
+            # 没有摘要的记录在查重或重建索引时再补算
+            try:
+                self.library_index.add(task.dest_path, task.size, task.date, task.digest, stat.st_mtime)
+            except sqlite3.Error as e:
+                # 文件已经整理到位，索引写入失败（例如重建索引时数据库被锁定）不算任务失败，重建索引时补上
+                self.emit_event("warning", file=task.filename,
+                                message=f"写入库索引失败: {task.filename}: {str(e)}，可稍后重建库索引")
+                return task
+            with self.progress_lock:
+                self.library_added += 1
+        return task
+    
+    def append_manifest(self, dest_path, digest, overwrite=False):
+        """把文件摘要追加到所在目标文件夹的校验清单
+        
+        覆盖模式下目标文件可能已有旧摘要，先照常追加，运行结束时由compact_manifests统一去掉旧行，
+        避免每覆盖一个文件就重写一次整个清单。
+        """
+        folder_path, filename = os.path.split(dest_path)
+        with self.manifest_lock:
+            with open(os.path.join(folder_path, MANIFEST_NAME), 'a', encoding='utf-8') as f:
+                f.write(format_manifest_line(digest, filename))
+            self.manifest_folders.add(folder_path)
+            if overwrite:
+                self.overwritten_manifests.add(folder_path)
+    
+    def compact_manifests(self):
+        """去掉被覆盖文件在清单中的旧摘要，每个文件夹只保留每个文件名的最后一行"""
+        for folder_path in self.overwritten_manifests:
+            try:
+                compact_manifest(os.path.join(folder_path, MANIFEST_NAME))
+            except OSError as e:
+                self.emit_event("warning", message=f"整理校验清单失败: {folder_path}: {str(e)}")
+        self.overwritten_manifests.clear()
+
+# ================ 压缩包导入 ================
+
+ARCHIVE_FILE_FILTER = "压缩包 (*.zip *.tar *.tar.gz *.tgz *.tar.bz2 *.tbz2 *.tar.xz *.txz)"
+
+def is_archive_file(path):
+    """判断路径是否为可直接导入的ZIP或TAR压缩包"""
+    if not os.path.isfile(path):
+        return False
+    try:
+        return zipfile.is_zipfile(path) or tarfile.is_tarfile(path)
+    except OSError:
+        return False
+
+class ArchiveTransferThread(FileTransferThread):
+    """直接从ZIP/TAR压缩包导入，不先解压到磁盘
+    
+    日期取自成员头中的修改时间。ZIP有中央目录，可以随机访问：成员按在压缩包中的偏移排序，
+    由多个线程并行解压；TAR（包括gz/bz2/xz压缩）只能从头顺序读取，按流模式逐个成员处理。
+    每个成员只读取一次，边写入目标临时文件边计算摘要，回读核对后替换为目标文件。
+    压缩包本身不做修改，整理方式设置对压缩包不适用。
+    """
+    def __init__(self, archive_path, dest_folder, file_list, file_type_filter, *args, **kwargs):
+        super().__init__(archive_path, dest_folder, file_list, file_type_filter, *args, **kwargs)
+        self.archive_path = archive_path
+        self.organize_mode = "extract"
+        self.zip_file = None
+        self.zip_members = {}  # 任务源路径 -> ZipInfo
+        self.archive_stream = None  # TAR的原始文件对象，用读取位置估算进度
+        self.archive_size = os.path.getsize(archive_path)
+    
+    def count_files(self):
+        """ZIP读取中央目录得到成员数；TAR要读完整个压缩包才知道，返回0（未知）"""
+        if not zipfile.is_zipfile(self.archive_path):
+            return 0
+        self.zip_file = zipfile.ZipFile(self.archive_path)
+        for info in self.zip_file.infolist():
+            if not info.is_dir() and self.should_process_file(os.path.basename(info.filename)):
+                self.zip_members[os.path.join(self.archive_path, info.filename)] = info
+        return len(self.zip_members)
+    
+    def progress_fraction(self):
+        if self.archive_stream is not None:
+            try:
+                return min(self.archive_stream.tell() / self.archive_size, 1.0) if self.archive_size else 0.0
+            except (OSError, ValueError):
+                return 0.0
+        return super().progress_fraction()
+    
+    def process_files(self, initializer=None):
+        if self.zip_file:
+            try:
+                self.process_zip(initializer)
+            finally:
+                self.zip_file.close()
+        else:
+            self.process_tar()
+        self.summary_lines.append(f"压缩包导入: {'ZIP随机读取' if self.zip_file else 'TAR顺序读取'}")
+    
+    def make_member_task(self, file_path, size, timestamp):
+        """为压缩包成员创建任务，日期取自成员头"""
+        folder, filename = os.path.split(file_path)
+        task = PipelineTask(sys.intern(folder), filename)
+        task.size = size
+        task.date = datetime.fromtimestamp(timestamp).strftime('%Y:%m:%d %H:%M:%S')
+        task.date_source = "header"
+        return task
+    
+    def scan_members(self):
+        """扫描阶段（ZIP）：按成员在压缩包中的偏移顺序生成任务，读取时顺着文件向后推进"""
+        for file_path, info in sorted(self.zip_members.items(), key=lambda item: item[1].header_offset):
+            timestamp = self.zip_timestamp(info)
+            task = self.make_member_task(file_path, info.file_size, timestamp)
+            task.disk_key = info.header_offset
+            yield task
+    
+    def zip_timestamp(self, info):
+        """ZIP成员头中的修改时间，日期无效时使用压缩包的修改时间"""
+        try:
+            return datetime(*info.date_time).timestamp()
+        except ValueError:
+            return os.path.getmtime(self.archive_path)
+    
+    def process_zip(self, initializer=None):
+        pipeline = StagedPipeline(initializer=initializer)
+        pipeline.add_stage("规划", self.plan_destination_batch, self.stage_workers["plan"],
+                           batch_size=self.PLAN_BATCH_SIZE)
+        pipeline.add_stage("解压", self.extract_zip_member, self.stage_workers["transfer_small"])
+        pipeline.add_stage("校验", self.verify_transfer, self.stage_workers["verify"], stoppable=False)
+        self.stage_names = pipeline.stage_names
+        pipeline.run(self.scan_members(), self.on_task_done, should_stop=lambda: self.stopped,
+                     wait_if_paused=self.wait_if_paused, on_error=self.on_task_error)
+    
+    def extract_zip_member(self, task):
+        """解压阶段（ZIP）：随机读取单个成员，读取时zipfile会校验CRC"""
+        info = self.zip_members[task.file_path]
+        self.concurrency.acquire(lambda: self.stopped)
+        try:
+            started = time.perf_counter()
+            with self.zip_file.open(info) as fsrc:
+                result = self.extract_member(task, fsrc, self.zip_timestamp(info))
+            self.concurrency.record(task.size, time.perf_counter() - started)
+            return result
+        finally:
+            self.concurrency.release()
+    
+    def process_tar(self):
+        """TAR只能顺序读取：在当前线程中逐个成员规划、写入和校验"""
+        self.stage_names = ["规划", "解压", "校验"]
+        with open(self.archive_path, 'rb') as raw, tarfile.open(fileobj=raw, mode='r|*') as archive:
+            self.archive_stream = raw
+            for member in archive:
+                if self.stopped:
+                    break
+                self.wait_if_paused()
+                if not member.isfile() or not self.should_process_file(os.path.basename(member.name)):
+                    continue
+                task = self.make_member_task(os.path.join(self.archive_path, member.name),
+                                             member.size, member.mtime)
+                for stage, step in zip(self.stage_names, (
+                        lambda: self.plan_destination_batch([task]),
+                        lambda: self.extract_member(task, archive.extractfile(member), member.mtime),
+                        lambda: self.verify_transfer(task))):
+                    started = time.perf_counter()
+                    try:
+                        result = step()
+                    except Exception as e:
+                        task.fail(stage, e)
+                        result = None
+                    task.add_duration(time.perf_counter() - started)
+                    if not result:
+                        break
+                self.on_task_done(task)
+            self.archive_stream = None
+    
+    def extract_member(self, task, fsrc, timestamp):
+        """把成员数据流写入目标临时文件（有备份目标时同时写入备份）并计算摘要，
+        回读核对、库内查重后替换为目标文件"""
+        dest_paths = [task.dest_path] + (task.backup_paths or [])
+        temp_paths = [os.path.join(os.path.dirname(path), f"{LIBRARY_FILE_PREFIX}{os.path.basename(path)}.part")
+                      for path in dest_paths]
+        self.ops_bucket.consume(1, lambda: self.stopped)
+        try:
+            digest = self.copy_stream(fsrc, *temp_paths)
+            if any(hash_file(temp_path, self.COPY_CHUNK_SIZE) != digest for temp_path in temp_paths):
+                for temp_path in temp_paths:
+                    os.unlink(temp_path)
+                raise OSError("目标文件摘要与解压时不一致")
+        except BaseException:
+            self.dest_layout.release_shard(task.target_folder)
+            raise
+        task.digest = digest
+        if self.skip_library_duplicate(task):
+            for temp_path in temp_paths:
+                os.unlink(temp_path)
+            self.dest_layout.release_shard(task.target_folder)
+            return None
+        for temp_path, dest_path in zip(temp_paths, dest_paths):
+            os.replace(temp_path, dest_path)
+            os.utime(dest_path, (timestamp, timestamp))
+        self.durability.commit_copy(dest_paths)
+        task.mode = "extract"
+        task.outcome = "organized"
+        with self.progress_lock:
+            self.bytes_transferred += task.size
+            self.verified_copies += len(dest_paths)
+            for stats in self.destination_stats.values():
+                stats[0] += 1
+                stats[1] += task.size
+            self.mode_counts["extract"] = self.mode_counts.get("extract", 0) + 1
+        return task
+
+# ================ 文件清单预览 ================
+
+def format_size(size):
+    """将字节数格式化为易读的大小"""
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+class FilePreviewModel(QAbstractTableModel):
+    """扫描结果/整理计划的表格模型
+    
+    数据按行保存为元组，视图只请求可见区域的数据，界面内存和绘制开销不随行数增长。
+    排序和过滤都在模型内通过行号列表完成，不复制行数据。
+    """
+    HEADERS = ["名称", "类型", "大小", "日期", "目标文件夹", "同名状态"]
+    KIND_NAMES = {"images": "图片", "videos": "视频", "lrv": "LRV", "other": "其他"}
+    SIZE_COLUMN = 2
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.rows = []      # (名称, 类型, 大小, 日期, 目标文件夹, 同名状态)
+        self.visible = []   # 过滤、排序后显示的行号
+        self.filter_text = ""
+        self.filter_kind = None
+        self.sort_column = None
+        self.sort_order = Qt.AscendingOrder
+    
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.visible)
+    
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+    
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return None
+    
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row = self.rows[self.visible[index.row()]]
+        column = index.column()
+        if role == Qt.DisplayRole:
+            if column == 1:
+                return self.KIND_NAMES.get(row[1], row[1])
+            if column == self.SIZE_COLUMN:
+                return format_size(row[2])
+            return row[column]
+        if role == Qt.TextAlignmentRole and column == self.SIZE_COLUMN:
+            return int(Qt.AlignRight | Qt.AlignVCenter)
+        return None
+    
+    def matches(self, row):
+        """行是否满足当前过滤条件"""
+        if self.filter_kind and row[1] != self.filter_kind:
+            return False
+        return not self.filter_text or self.filter_text in row[0].lower() or self.filter_text in row[4].lower()
+    
+    def sort_key(self, index):
+        return self.rows[index][self.sort_column]
+    
+    def append_rows(self, rows):
+        """追加一批扫描结果，只对满足过滤条件的行通知视图"""
+        start = len(self.rows)
+        self.rows.extend(rows)
+        new_visible = [i for i in range(start, len(self.rows)) if self.matches(self.rows[i])]
+        if not new_visible:
+            return
+        if self.sort_column is None:
+            first = len(self.visible)
+            self.beginInsertRows(QModelIndex(), first, first + len(new_visible) - 1)
+            self.visible.extend(new_visible)
+            self.endInsertRows()
+        else:
+            # 已排序时合并新行，Timsort对"有序段+新段"的合并接近线性
+            self.layoutAboutToBeChanged.emit()
+            self.visible.extend(new_visible)
+            self.visible.sort(key=self.sort_key, reverse=self.sort_order == Qt.DescendingOrder)
+            self.layoutChanged.emit()
+    
+    def sort(self, column, order=Qt.AscendingOrder):
+        """按列排序（由视图点击表头触发）"""
+        self.layoutAboutToBeChanged.emit()
+        self.sort_column = column
+        self.sort_order = order
+        self.visible.sort(key=self.sort_key, reverse=order == Qt.DescendingOrder)
+        self.layoutChanged.emit()
+    
+    def set_filter(self, text, kind=None):
+        """按名称/目标文件夹关键字和文件类型过滤"""
+        self.beginResetModel()
+        self.filter_text = text.strip().lower()
+        self.filter_kind = kind
+        self.visible = [i for i, row in enumerate(self.rows) if self.matches(row)]
+        if self.sort_column is not None:
+            self.visible.sort(key=self.sort_key, reverse=self.sort_order == Qt.DescendingOrder)
+        self.endResetModel()
+    
+    def clear(self):
+        self.beginResetModel()
+        self.rows = []
+        self.visible = []
+        self.endResetModel()
+
+class PreviewScanThread(QThread):
+    """扫描源文件夹并按当前设置计算整理计划，分批发送结果"""
+    rows_ready = pyqtSignal(list)
+    scan_finished = pyqtSignal(int)
+    
+    BATCH_SIZE = 256
+    DUPLICATE_ACTIONS = {1: "同名(将重命名)", 2: "同名(将覆盖)", 3: "同名(将跳过)"}
+    
+    def __init__(self, source_folder, dest_folder, should_process, dest_layout, duplicate_handling=1):
+        super().__init__()
+        self.source_folder = source_folder
+        self.dest_folder = dest_folder
+        self.should_process = should_process  # 文件类型过滤函数
+        self.dest_layout = dest_layout
+        self.duplicate_handling = duplicate_handling
+        self.stopped = False
+        self.planned_paths = set()
+    
+    def describe_file(self, entry):
+        """读取单个文件的大小和日期，文件无法访问（扫描期间被删除等）时返回None"""
+        info = {}
+        try:
+            stat = entry.stat()
+            date, _ = resolve_file_date(entry.path, info, stat.st_mtime)
+        except OSError:
+            return None
+        return entry, stat.st_size, stat.st_mtime, date, info.get('camera_model')
+    
+    def make_rows(self, results):
+        """计算目标文件夹和同名状态（单线程执行，保证同名检测一致）"""
+        rows = []
+        for result in results:
+            if result is None:
+                continue
+            entry, size, mtime, date, camera_model = result
+            folder = self.dest_layout.folder_for(entry.path, date, camera_model, mtime)
+            dest_path = os.path.join(self.dest_folder, folder, entry.name)
+            if dest_path in self.planned_paths or os.path.exists(dest_path):
+                status = self.DUPLICATE_ACTIONS.get(self.duplicate_handling, "同名")
+            else:
+                status = "无冲突"
+            self.planned_paths.add(dest_path)
+            rows.append((entry.name, get_file_kind(entry.name), size, date or "", folder, status))
+        return rows
     
-    def __init__(self, source_folder, dest_folder, file_list, file_type_filter, 
-                 custom_extensions=None, duplicate_handling=1):
+    def run(self):
+        count = 0
+        batch = []
+        try:
+            with ThreadPoolExecutor(4) as executor, os.scandir(self.source_folder) as entries:
+                for entry in entries:
+                    if self.stopped:
+                        break
+                    if not entry.is_file() or not self.should_process(entry.name):
+                        continue
+                    batch.append(entry)
+                    if len(batch) >= self.BATCH_SIZE:
+                        rows = self.make_rows(executor.map(self.describe_file, batch))
+                        self.rows_ready.emit(rows)
+                        count += len(rows)
+                        batch = []
+                if batch and not self.stopped:
+                    rows = self.make_rows(executor.map(self.describe_file, batch))
+                    self.rows_ready.emit(rows)
+                    count += len(rows)
+        except OSError:
+            pass  # 源文件夹无法读取（设备被移除等），已发送的行保留
+        finally:
+            # 界面等待该信号恢复按钮状态，无论扫描是否完整都要发送
+            self.scan_finished.emit(count)
+    
+    def stop(self):
+        self.stopped = True
+
+class LibraryIndexThread(QThread):
+    """在后台重建目标文件夹的库索引
+    
+    大小和修改时间未变且已有摘要的文件直接沿用原记录，其余文件由线程池并行计算摘要
+    （hashlib计算时释放GIL）；已不存在的文件从索引中删除。
+    """
+    progress_updated = pyqtSignal(int, int)  # 已处理数量, 待处理总数
+    rebuild_finished = pyqtSignal(str)
+    
+    HASH_WORKERS = 4
+    
+    def __init__(self, dest_folder):
         super().__init__()
-        self.source_folder = source_folder
         self.dest_folder = dest_folder
-        self.file_list = file_list
-        self.file_type_filter = file_type_filter  # 过滤的文件类型
-        self.custom_extensions = custom_extensions if custom_extensions else []  # 自定义扩展名
-        self.duplicate_handling = duplicate_handling  # 1:重命名, 2:覆盖, 3:跳过
-        self.running = True
-        self.paused = False
-        self.stopped = False
-        
+    
+    def index_entry(self, item):
+        """计算单个文件的摘要和日期"""
+        file_path, stat = item
+        try:
+            digest = hash_file(file_path)
+        except OSError:
+            return None
+        date, _ = resolve_file_date(file_path, mtime=stat.st_mtime)
+        return file_path, stat, date, digest
+    
     def run(self):
-        total_files = len(self.file_list)
-        processed_files = 0
         start_time = time.time()
-        last_time = start_time
-        last_processed = 0
-        
-        for filename in self.file_list:
-            if self.stopped:
-                self.log_updated.emit("操作已停止！")
-                break
-            if not self.running:
-                while self.paused and not self.stopped:
-                    time.sleep(0.1)
-                if self.stopped:
-                    self.log_updated.emit("操作已停止！")
-                    break
-            
-            try:
-                # 根据选择的文件类型进行过滤
-                if self.should_process_file(filename):
-                    file_path = os.path.join(self.source_folder, filename)
-                    result = self.move_file_to_date_folder(file_path, self.dest_folder)
-                    if result:
-                        self.log_updated.emit(result)
-            
-            except Exception as e:
-                self.log_updated.emit(f"处理 {filename} 时出错: {str(e)}！")
-            
-            processed_files += 1
-            progress = int((processed_files / total_files) * 100)
-            self.progress_updated.emit(progress)
-            self.file_count_updated.emit(processed_files, total_files)
-            
-            # 计算传输速度
-            current_time = time.time()
-            if current_time - last_time >= 1:  # 每秒更新一次速度
-                files_per_sec = (processed_files - last_processed) / (current_time - last_time) if (current_time - last_time) > 0 else 0
-                self.speed_updated.emit(f"{files_per_sec:.1f} 个文件/秒")
-                last_time = current_time
-                last_processed = processed_files
+        try:
+            index = LibraryIndex(self.dest_folder)
+        except sqlite3.Error as e:
+            self.rebuild_finished.emit(f"打开库索引失败: {str(e)}")
+            return
+        known = index.entries()
+        seen = set()
+        pending = []
+        for root, dirs, names in os.walk(self.dest_folder):
+            for name in names:
+                if name.startswith(LIBRARY_FILE_PREFIX):
+                    continue
+                file_path = os.path.join(root, name)
+                try:
+                    stat = os.stat(file_path)
+                except OSError:
+                    continue
+                path = index.relative_path(file_path)
+                seen.add(path)
+                old = known.get(path)
+                if old and old[0] == stat.st_size and old[1] == stat.st_mtime and old[2]:
+                    continue
+                pending.append((file_path, stat))
         
-        self.transfer_complete.emit()
+        removed = set(known) - seen
+        index.remove(removed)
+        updated = 0
+        with ThreadPoolExecutor(self.HASH_WORKERS) as executor:
+            for done, result in enumerate(executor.map(self.index_entry, pending), 1):
+                if result:
+                    file_path, stat, date, digest = result
+                    index.add(file_path, stat.st_size, date, digest, stat.st_mtime)
+                    updated += 1
+                self.progress_updated.emit(done, len(pending))
+        total = index.count()
+        index.close()
+        self.rebuild_finished.emit(
+            f"库索引重建完成: 共 {total} 个文件，更新 {updated} 个，删除 {len(removed)} 个，"
+            f"耗时 {time.time() - start_time:.1f} 秒")
+
+DIAGNOSTICS_LOG_NAME = 'diagnostics.jsonl'
+
+class UiLatencyMonitor(QObject):
+    """界面事件循环延迟监视器
     
-    def should_process_file(self, filename):
-        """根据选择的文件类型判断是否处理该文件"""
-        filename_lower = filename.lower()
-        
-        # 图片文件
-        image_extensions = ('.png', '.jpg', '.jpeg', '.gif', '.bmp', '.tiff', '.webp', '.raw')
-        # 视频文件
-        video_extensions = ('.mp4', '.avi', '.mov', '.mkv', '.flv', '.wmv', '.mpeg', '.mpg', '.3gp')
-        # LRV文件
-        lrv_extension = '.lrv'
-        
-        # 处理自定义格式
-        if self.file_type_filter == "custom" and self.custom_extensions:
-            return any(filename_lower.endswith(ext.lower()) for ext in self.custom_extensions)
-                
-        if self.file_type_filter == "all" or self.file_type_filter == "images":
-            if filename_lower.endswith(image_extensions):
-                return True
-                
-        if self.file_type_filter == "all" or self.file_type_filter == "videos":
-            if filename_lower.endswith(video_extensions):
-                return True
-                
-        if self.file_type_filter == "all" or self.file_type_filter == "lrv":
-            if filename_lower.endswith(lrv_extension):
-                return True
-                
-        return False
+    定时器每interval毫秒触发一次，实际触发时间比预期晚出的部分就是事件循环被阻塞的时长。
+    用ui_timed装饰的槽函数耗时也记录在这里，卡顿超过threshold毫秒时连同期间最慢的槽写入诊断日志。
+    """
+    stats_updated = pyqtSignal(str)  # 每秒发送一次最近的延迟统计
     
-    def pause(self):
-        self.paused = True
-        self.running = False
+    def __init__(self, diagnostics_log=None, interval=50, threshold=200, parent=None):
+        super().__init__(parent)
+        self.diagnostics_log = diagnostics_log
+        self.interval = interval / 1000
+        self.threshold = threshold / 1000
+        self.lags = deque(maxlen=int(60 / self.interval))  # 最近一分钟的延迟样本
+        self.ticks = 0
+        self.last_tick = None
+        self.tick_slowest = None  # 本次间隔内最慢的槽 (名称, 耗时)
+        self.reset()
+        self.timer = QTimer(self)
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.timeout.connect(self.check)
     
-    def resume(self):
-        self.paused = False
-        self.running = True
+    def reset(self):
+        """清空累计统计（每次开始整理时调用）"""
+        self.max_lag = 0.0
+        self.stall_count = 0
+        self.slot_stats = {}  # 槽名称 -> [调用次数, 总耗时, 最大耗时]
+    
+    def start(self):
+        self.last_tick = time.perf_counter()
+        self.timer.start(int(self.interval * 1000))
     
     def stop(self):
-        self.stopped = True
-        self.running = False
-        self.paused = False
+        self.timer.stop()
     
-    def get_file_date(self, file_path):
-        """获取文件的日期信息，支持图片、视频和LRV文件"""
-        try:
-            # 对于图片文件，尝试从EXIF获取日期
-            if file_path.lower().endswith(('.png', '.jpg', '.jpeg', '.gif', '.bmp', '.tiff', '.webp', '.raw')):
-                with Image.open(file_path) as image:
-                    exif_data = image._getexif()
-                    if exif_data:
-                        for tag, value in exif_data.items():
-                            decoded = TAGS.get(tag, tag)
-                            if decoded in ['DateTimeOriginal', 'DateTimeDigitized', 'DateTime']:
-                                return value
-            
-            # 对于其他文件，使用文件修改日期
-            mtime = os.path.getmtime(file_path)
-            return datetime.fromtimestamp(mtime).strftime('%Y:%m:%d %H:%M:%S')
-            
-        except Exception as e:
-            self.log_updated.emit(f"获取 {os.path.basename(file_path)} 日期时出错: {str(e)}！")
-            return None
+    def check(self):
+        now = time.perf_counter()
+        lag = max(now - self.last_tick - self.interval, 0.0)
+        self.last_tick = now
+        self.ticks += 1
+        self.lags.append(lag)
+        self.max_lag = max(self.max_lag, lag)
+        if lag >= self.threshold:
+            self.stall_count += 1
+            if self.diagnostics_log:
+                event = {"time": datetime.now().isoformat(timespec='milliseconds'),
+                         "event": "ui_stall", "lag_ms": round(lag * 1000, 1)}
+                if self.tick_slowest:
+                    event["slot"] = self.tick_slowest[0]
+                    event["slot_ms"] = round(self.tick_slowest[1] * 1000, 1)
+                self.diagnostics_log.write(event)
+        self.tick_slowest = None
+        if self.ticks % max(int(1 / self.interval), 1) == 0:
+            self.stats_updated.emit(self.format_stats())
     
-    def move_file_to_date_folder(self, file_path, destination_folder):
-        """将文件移动到以日期命名的文件夹中，处理同名文件"""
-        date = self.get_file_date(file_path)
-        if date:
-            try:
-                # 处理不同格式的日期字符串
-                if ':' in date:
-                    if date.count(':') >= 2:
-                        year_month = date.split(':')[0] + '-' + date.split(':')[1]
-                    else:
-                        #  fallback 到文件修改时间
-                        mtime = os.path.getmtime(file_path)
-                        date = datetime.fromtimestamp(mtime).strftime('%Y:%m:%d %H:%M:%S')
-                        year_month = date.split(':')[0] + '-' + date.split(':')[1]
-                else:
-                    # 处理其他日期格式
-                    year_month = date[:7]
-                
-                folder_path = os.path.join(destination_folder, year_month)
-                os.makedirs(folder_path, exist_ok=True)
-                
-                dest_path = os.path.join(folder_path, os.path.basename(file_path))
-                
-                # 处理同名文件
-                if os.path.exists(dest_path):
-                    if self.duplicate_handling == 1:  # 重命名
-                        counter = 1
-                        name, ext = os.path.splitext(os.path.basename(file_path))
-                        while os.path.exists(dest_path):
-                            dest_path = os.path.join(folder_path, f"{name}_{counter}{ext}")
-                            counter += 1
-                        action = "重命名并移动"
-                    elif self.duplicate_handling == 2:  # 覆盖
-                        action = "覆盖并移动"
-                    else:  # 跳过
-                        return f"已跳过同名文件: {os.path.basename(file_path)}"
-                else:
-                    action = "已移动~"
-                
-                # 使用shutil.move移动文件，支持跨设备
-                shutil.move(file_path, dest_path)
-                return f"{action}: {os.path.basename(file_path)} -> {year_month}"
-                
-            except Exception as e:
-                return f"移动 {os.path.basename(file_path)} 失败: {str(e)}！"
-        else:
-            # 将无法获取日期的文件移动到"unknown_date"文件夹
-            try:
-                folder_path = os.path.join(destination_folder, "unknown_date")
-                os.makedirs(folder_path, exist_ok=True)
-                dest_path = os.path.join(folder_path, os.path.basename(file_path))
-                
-                # 处理同名文件
-                if os.path.exists(dest_path):
-                    if self.duplicate_handling == 1:  # 重命名
-                        counter = 1
-                        name, ext = os.path.splitext(os.path.basename(file_path))
-                        while os.path.exists(dest_path):
-                            dest_path = os.path.join(folder_path, f"{name}_{counter}{ext}")
-                            counter += 1
-                        action = "重命名并移动"
-                    elif self.duplicate_handling == 2:  # 覆盖
-                        action = "覆盖并移动"
-                    else:  # 跳过
-                        return f"已跳过同名文件: {os.path.basename(file_path)} (unknown_date)"
-                
-                shutil.move(file_path, dest_path)
-                return f"{action if os.path.exists(dest_path) else '已移动'}: {os.path.basename(file_path)} -> unknown_date"
-                
-            except Exception as e:
-                return f"移动 {os.path.basename(file_path)} 失败: {str(e)}"
+    def record_slot(self, name, elapsed, start_ticks):
+        """记录一次槽函数耗时；执行期间定时器触发过说明槽内运行了对话框等嵌套事件循环，不算阻塞"""
+        if self.ticks != start_ticks:
+            return
+        stats = self.slot_stats.setdefault(name, [0, 0.0, 0.0])
+        stats[0] += 1
+        stats[1] += elapsed
+        stats[2] = max(stats[2], elapsed)
+        if self.tick_slowest is None or elapsed > self.tick_slowest[1]:
+            self.tick_slowest = (name, elapsed)
+    
+    def percentile(self, fraction):
+        if not self.lags:
+            return 0.0
+        lags = sorted(self.lags)
+        return lags[min(int(len(lags) * fraction), len(lags) - 1)]
+    
+    def slowest_slots(self, count=3):
+        """按最大耗时排序的槽 [(名称, 调用次数, 平均耗时, 最大耗时)]"""
+        slots = [(name, calls, total / calls, longest)
+                 for name, (calls, total, longest) in self.slot_stats.items()]
+        return sorted(slots, key=lambda slot: slot[3], reverse=True)[:count]
+    
+    def format_stats(self):
+        return (f"延迟 p50 {self.percentile(0.5) * 1000:.0f} ms，p99 {self.percentile(0.99) * 1000:.0f} ms，"
+                f"最大 {self.max_lag * 1000:.0f} ms，卡顿 {self.stall_count} 次")
+    
+    def format_summary(self):
+        """一次整理期间的界面响应统计"""
+        slots = "，".join(f"{name} {longest * 1000:.0f} ms" for name, _, _, longest in self.slowest_slots())
+        return f"界面响应: {self.format_stats()}" + (f"；最慢的处理: {slots}" if slots else "")
+
+def ui_timed(func):
+    """记录界面线程中槽函数的耗时，交给窗口的延迟监视器统计
+    
+    和PyQt一样丢弃多余的信号参数（如clicked的checked），以便继续直接连接到信号。
+    """
+    code = func.__code__
+    max_args = None if code.co_flags & 0x04 else code.co_argcount - 1  # 0x04: 带*args
+    
+    @functools.wraps(func)
+    def wrapper(self, *args):
+        if max_args is not None:
+            args = args[:max_args]
+        monitor = getattr(self, 'ui_monitor', None)
+        if monitor is None:
+            return func(self, *args)
+        start_ticks = monitor.ticks
+        start = time.perf_counter()
+        try:
+            return func(self, *args)
+        finally:
+            monitor.record_slot(func.__name__, time.perf_counter() - start, start_ticks)
+    return wrapper
 
 class MediaOrganizer(QMainWindow):
     """媒体文件整理工具主窗口"""
     def __init__(self):
         super().__init__()
         self.transfer_thread = None
+        self.thumbnail_thread = None
+        self.thumbnail_cache = None
+        self.preview_scan_thread = None
+        self.library_index_thread = None
+        # 所有传输（包括队列中同时运行的任务）共享同一份带宽和文件操作额度
+        self.bandwidth_bucket = TokenBucket()
+        self.ops_bucket = TokenBucket()
+        self.jobs = []  # 任务队列，每个任务是一个设置字典
+        self.job_threads = {}  # 任务id -> 正在运行的传输线程
+        self.queue_running = False
+        # 结构化事件日志在后台线程写入，程序退出前写完剩余事件
+        self.event_log = EventLogWriter(os.path.join(get_app_data_dir('logs'), EVENT_LOG_NAME))
+        QApplication.instance().aboutToQuit.connect(self.event_log.close)
+        # 界面线程卡顿写入单独的诊断日志
+        self.diagnostics_log = EventLogWriter(os.path.join(get_app_data_dir('logs'), DIAGNOSTICS_LOG_NAME))
+        QApplication.instance().aboutToQuit.connect(self.diagnostics_log.close)
+        self.ui_monitor = UiLatencyMonitor(self.diagnostics_log, parent=self)
         self.settings = QSettings("MediaOrganizer", "Settings")
+        self.loading_settings = False  # 加载设置期间为True，此时不保存
         self.base_font_size = 10  # 基础字体大小，用于缩放
         self.scale_factor = 1.0   # 缩放因子
         self.shadow_effects = {}  # 存储阴影效果的字典
@@ -269,6 +3494,7 @@ class MediaOrganizer(QMainWindow):
             self.tray_icon = None
         
         self.init_ui()
+        self.ui_monitor.start()
     
     def create_context_menu(self, actions):
         """创建上下文菜单"""
@@ -336,7 +3562,21 @@ class MediaOrganizer(QMainWindow):
         settings_tab_layout.setContentsMargins(10, 10, 10, 10)
         settings_tab_layout.setSpacing(15)
         
+        # 预览标签页
+        preview_tab = QWidget()
+        preview_tab_layout = QVBoxLayout(preview_tab)
+        preview_tab_layout.setContentsMargins(5, 5, 5, 5)
+        preview_tab_layout.setSpacing(10)
+        
         self.tab_widget.addTab(main_tab, "主功能")
+        # 任务队列标签页
+        queue_tab = QWidget()
+        queue_tab_layout = QVBoxLayout(queue_tab)
+        queue_tab_layout.setContentsMargins(5, 5, 5, 5)
+        queue_tab_layout.setSpacing(10)
+        
+        self.tab_widget.addTab(preview_tab, "预览")
+        self.tab_widget.addTab(queue_tab, "任务队列")
         self.tab_widget.addTab(settings_tab, "设置")
         
         # ================ 主功能标签页内容 ================
@@ -351,10 +3591,14 @@ class MediaOrganizer(QMainWindow):
         self.source_edit = QLineEdit()
         self.source_btn = QPushButton("浏览...")
         self.source_btn.clicked.connect(self.select_source_folder)
+        self.archive_btn = QPushButton("压缩包...")
+        self.archive_btn.setToolTip("直接从ZIP/TAR压缩包导入，无需先解压")
+        self.archive_btn.clicked.connect(self.select_source_archive)
         
         source_layout = QHBoxLayout()
         source_layout.addWidget(self.source_edit, 7)
         source_layout.addWidget(self.source_btn, 1)
+        source_layout.addWidget(self.archive_btn, 1)
         
         # 目标文件夹选择
         self.dest_edit = QLineEdit()
@@ -365,6 +3609,16 @@ class MediaOrganizer(QMainWindow):
         dest_layout.addWidget(self.dest_edit, 7)
         dest_layout.addWidget(self.dest_btn, 1)
         
+        # 备份目标：每个文件只读取一次，同时写入目标文件夹和这些文件夹
+        self.backup_edit = QLineEdit()
+        self.backup_edit.setPlaceholderText("可选，多个文件夹用 ; 分隔，与目标文件夹使用相同的目录结构")
+        self.backup_btn = QPushButton("添加...")
+        self.backup_btn.clicked.connect(self.add_backup_folder)
+        
+        backup_layout = QHBoxLayout()
+        backup_layout.addWidget(self.backup_edit, 7)
+        backup_layout.addWidget(self.backup_btn, 1)
+        
         # 文件类型选择
         self.file_type_combo = QComboBox()
         self.file_type_combo.addItems(["所有支持的文件", "仅图片", "仅视频", "仅LRV文件", "自定义格式"])
@@ -376,6 +3630,25 @@ class MediaOrganizer(QMainWindow):
         self.custom_extensions_edit.setPlaceholderText("例如: .txt,.pdf,.zip (用逗号分隔)")
         self.custom_extensions_edit.setEnabled(False)  # 默认禁用
         
+        # 目标目录结构模板，可直接编辑
+        self.layout_template_combo = QComboBox()
+        self.layout_template_combo.setEditable(True)
+        self.layout_template_combo.addItems([
+            DestinationLayout.DEFAULT_TEMPLATE, "{year}/{month}/{day}",
+            "{year}/{camera_model}/{month}", "{kind}/{year}-{month}"
+        ])
+        self.layout_template_combo.setToolTip("可用字段: " + ", ".join(f"{{{name}}}" for name in DestinationLayout.FIELDS))
+        
+        # 单个目录的条目上限，超过后自动分片
+        self.shard_limit_combo = QComboBox()
+        self.shard_limit_combo.addItems(["不限制", "1000", "2000", "5000", "10000", "20000"])
+        
+        # 整理方式：移动，或保留源文件创建副本/链接
+        self.organize_mode_combo = QComboBox()
+        self.organize_mode_combo.addItems(["移动", "复制", "硬链接（同一分区，不占空间）",
+                                           "符号链接", "克隆（reflink，btrfs/XFS，写时复制）"])
+        self.organize_mode_combo.setToolTip("链接或克隆不可用时自动改为复制")
+        
         # 常用地址下拉框
         self.common_source_combo = QComboBox()
         self.common_dest_combo = QComboBox()
@@ -389,8 +3662,12 @@ class MediaOrganizer(QMainWindow):
         address_layout.addRow("常用源地址:", self.common_source_combo)
         address_layout.addRow("目标文件夹:", dest_layout)
         address_layout.addRow("常用目标地址:", self.common_dest_combo)
+        address_layout.addRow("同时备份到:", backup_layout)
         address_layout.addRow("文件类型:", self.file_type_combo)
         address_layout.addRow("自定义格式:", self.custom_extensions_edit)
+        address_layout.addRow("目录结构:", self.layout_template_combo)
+        address_layout.addRow("单目录上限:", self.shard_limit_combo)
+        address_layout.addRow("整理方式:", self.organize_mode_combo)
         
         self.address_group.setLayout(address_layout)
         main_tab_layout.addWidget(self.address_group)
@@ -476,8 +3753,13 @@ class MediaOrganizer(QMainWindow):
         status_layout.addWidget(self.file_count_label)
         status_layout.addWidget(self.speed_label)
         
+        # 同时写入多个目标时各目标的进度
+        self.destinations_label = QLabel()
+        self.destinations_label.setVisible(False)
+        
         progress_layout.addWidget(self.progress_bar)
         progress_layout.addLayout(status_layout)
+        progress_layout.addWidget(self.destinations_label)
         self.progress_group.setLayout(progress_layout)
         main_tab_layout.addWidget(self.progress_group)
         
@@ -493,6 +3775,120 @@ class MediaOrganizer(QMainWindow):
         
         main_tab_layout.addWidget(self.log_group, 1)
         
+        # ================ 预览标签页内容 ================
+        
+        # 文件清单（整理计划）
+        self.plan_group = QGroupBox("文件清单")
+        plan_layout = QVBoxLayout()
+        
+        plan_btn_layout = QHBoxLayout()
+        self.scan_preview_btn = QPushButton("扫描文件清单")
+        self.scan_preview_btn.clicked.connect(self.scan_preview)
+        self.plan_filter_edit = QLineEdit()
+        self.plan_filter_edit.setPlaceholderText("按名称或目标文件夹筛选")
+        self.plan_filter_edit.textChanged.connect(self.apply_plan_filter)
+        self.plan_kind_combo = QComboBox()
+        self.plan_kind_combo.addItems(["全部类型", "图片", "视频", "LRV", "其他"])
+        self.plan_kind_combo.currentIndexChanged.connect(self.apply_plan_filter)
+        self.plan_status_label = QLabel("文件: 0")
+        plan_btn_layout.addWidget(self.scan_preview_btn)
+        plan_btn_layout.addWidget(self.plan_filter_edit, 1)
+        plan_btn_layout.addWidget(self.plan_kind_combo)
+        plan_btn_layout.addWidget(self.plan_status_label)
+        
+        self.plan_model = FilePreviewModel(self)
+        self.plan_view = QTableView()
+        self.plan_view.setModel(self.plan_model)
+        self.plan_view.setSortingEnabled(True)
+        self.plan_view.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.plan_view.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.plan_view.setWordWrap(False)
+        # 固定行高，视图无需逐行计算高度
+        self.plan_view.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.plan_view.verticalHeader().hide()
+        self.plan_view.horizontalHeader().setSectionResizeMode(QHeaderView.Interactive)
+        self.plan_view.horizontalHeader().setStretchLastSection(True)
+        self.plan_view.setMinimumHeight(300)
+        
+        plan_layout.addLayout(plan_btn_layout)
+        plan_layout.addWidget(self.plan_view)
+        self.plan_group.setLayout(plan_layout)
+        preview_tab_layout.addWidget(self.plan_group, 1)
+        
+        # 缩略图预览
+        self.preview_group = QGroupBox("缩略图预览")
+        preview_layout = QVBoxLayout()
+        
+        preview_btn_layout = QHBoxLayout()
+        self.load_preview_btn = QPushButton("加载预览")
+        self.load_preview_btn.clicked.connect(self.load_preview)
+        self.preview_status_label = QLabel("点击“加载预览”查看源文件夹中的图片")
+        preview_btn_layout.addWidget(self.load_preview_btn)
+        preview_btn_layout.addWidget(self.preview_status_label)
+        preview_btn_layout.addStretch()
+        
+        self.thumbnail_list = QListWidget()
+        self.thumbnail_list.setViewMode(QListWidget.IconMode)
+        self.thumbnail_list.setIconSize(QSize(THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+        self.thumbnail_list.setResizeMode(QListWidget.Adjust)
+        self.thumbnail_list.setMovement(QListWidget.Static)
+        self.thumbnail_list.setUniformItemSizes(True)
+        self.thumbnail_list.setMinimumHeight(400)
+        
+        preview_layout.addLayout(preview_btn_layout)
+        preview_layout.addWidget(self.thumbnail_list)
+        self.preview_group.setLayout(preview_layout)
+        preview_tab_layout.addWidget(self.preview_group, 1)
+        
+        # ================ 任务队列标签页内容 ================
+        
+        self.queue_group = QGroupBox("任务队列")
+        queue_layout = QVBoxLayout()
+        
+        queue_hint = QLabel("“加入队列”会记下主功能页当前的文件夹、文件类型、目录结构和整理方式；"
+                            "队列中的任务共享设置页的带宽限制，重启后队列保留。")
+        queue_hint.setWordWrap(True)
+        
+        queue_btn_layout = QHBoxLayout()
+        self.add_job_btn = QPushButton("加入队列")
+        self.add_job_btn.clicked.connect(self.add_job)
+        self.move_job_up_btn = QPushButton("上移")
+        self.move_job_up_btn.clicked.connect(lambda: self.move_job(-1))
+        self.move_job_down_btn = QPushButton("下移")
+        self.move_job_down_btn.clicked.connect(lambda: self.move_job(1))
+        self.remove_job_btn = QPushButton("移除")
+        self.remove_job_btn.clicked.connect(self.remove_job)
+        queue_btn_layout.addWidget(self.add_job_btn)
+        queue_btn_layout.addWidget(self.move_job_up_btn)
+        queue_btn_layout.addWidget(self.move_job_down_btn)
+        queue_btn_layout.addWidget(self.remove_job_btn)
+        
+        self.job_list = QListWidget()
+        self.job_list.setMinimumHeight(240)
+        
+        queue_run_layout = QHBoxLayout()
+        self.job_concurrency_combo = QComboBox()
+        self.job_concurrency_combo.addItems(["1", "2", "3", "4"])
+        self.job_concurrency_combo.currentIndexChanged.connect(self.save_settings)
+        self.run_queue_btn = QPushButton("运行队列")
+        self.run_queue_btn.clicked.connect(self.run_job_queue)
+        self.stop_queue_btn = QPushButton("停止队列")
+        self.stop_queue_btn.clicked.connect(self.stop_job_queue)
+        self.stop_queue_btn.setEnabled(False)
+        self.queue_status_label = QLabel("队列空闲")
+        queue_run_layout.addWidget(QLabel("同时运行:"))
+        queue_run_layout.addWidget(self.job_concurrency_combo)
+        queue_run_layout.addWidget(self.run_queue_btn)
+        queue_run_layout.addWidget(self.stop_queue_btn)
+        queue_run_layout.addWidget(self.queue_status_label, 1)
+        
+        queue_layout.addWidget(queue_hint)
+        queue_layout.addLayout(queue_btn_layout)
+        queue_layout.addWidget(self.job_list)
+        queue_layout.addLayout(queue_run_layout)
+        self.queue_group.setLayout(queue_layout)
+        queue_tab_layout.addWidget(self.queue_group, 1)
+        
         # ================ 设置标签页内容 ================
         
         # 字体设置
@@ -574,6 +3970,84 @@ class MediaOrganizer(QMainWindow):
         self.appearance_group.setLayout(appearance_layout)
         settings_tab_layout.addWidget(self.appearance_group)
 
+        # 性能设置
+        self.performance_group = QGroupBox("性能设置")
+        performance_layout = QFormLayout()
+        
+        self.metadata_backend_combo = QComboBox()
+        self.metadata_backend_combo.addItems(["多线程", "多进程（多核解析元数据和缩略图）"])
+        self.metadata_backend_combo.currentIndexChanged.connect(self.save_settings)
+        
+        self.transfer_order_combo = QComboBox()
+        self.transfer_order_combo.addItems(["按磁盘物理位置（减少寻道）", "按目录列出顺序"])
+        self.transfer_order_combo.currentIndexChanged.connect(self.save_settings)
+        
+        self.thumbnail_cache_combo = QComboBox()
+        self.thumbnail_cache_combo.addItems(["256 MB", "512 MB", "1024 MB", "2048 MB"])
+        self.thumbnail_cache_combo.setCurrentText("512 MB")
+        self.thumbnail_cache_combo.currentIndexChanged.connect(self.save_settings)
+        
+        self.bandwidth_limit_combo = QComboBox()
+        self.bandwidth_limit_combo.addItems(["不限制", "10 MB/s", "25 MB/s", "50 MB/s", "100 MB/s", "200 MB/s"])
+        self.bandwidth_limit_combo.currentIndexChanged.connect(self.update_throttle)
+        
+        self.ops_limit_combo = QComboBox()
+        self.ops_limit_combo.addItems(["不限制", "10 个/秒", "50 个/秒", "100 个/秒", "500 个/秒"])
+        self.ops_limit_combo.currentIndexChanged.connect(self.update_throttle)
+        
+        self.background_mode_combo = QComboBox()
+        self.background_mode_combo.addItems(["关闭", "开启（降低CPU和I/O优先级）"])
+        self.background_mode_combo.currentIndexChanged.connect(self.save_settings)
+        
+        self.checksum_manifest_combo = QComboBox()
+        self.checksum_manifest_combo.addItems(["关闭", "在每个文件夹写入b2sum校验清单"])
+        self.checksum_manifest_combo.currentIndexChanged.connect(self.save_settings)
+        
+        self.library_index_combo = QComboBox()
+        self.library_index_combo.addItems(["关闭", "记录到库索引", "记录并跳过库中已有的文件"])
+        self.library_index_combo.currentIndexChanged.connect(self.save_settings)
+        self.rebuild_index_btn = QPushButton("重建库索引")
+        self.rebuild_index_btn.clicked.connect(self.rebuild_library_index)
+        library_index_layout = QHBoxLayout()
+        library_index_layout.addWidget(self.library_index_combo, 1)
+        library_index_layout.addWidget(self.rebuild_index_btn)
+        
+        self.incremental_import_combo = QComboBox()
+        self.incremental_import_combo.addItems(["关闭", "跳过上次从同一个源导入过的文件"])
+        self.incremental_import_combo.setToolTip("按存储卡的卷标识记录，只对复制、链接等保留源文件的整理方式有效")
+        self.incremental_import_combo.currentIndexChanged.connect(self.save_settings)
+        self.clear_imports_btn = QPushButton("清除导入记录")
+        self.clear_imports_btn.clicked.connect(self.clear_import_watermark)
+        incremental_import_layout = QHBoxLayout()
+        incremental_import_layout.addWidget(self.incremental_import_combo, 1)
+        incremental_import_layout.addWidget(self.clear_imports_btn)
+        
+        self.durability_combo = QComboBox()
+        self.durability_combo.addItems(["不主动落盘（最快）", "批量落盘（每32个文件同步一次）",
+                                        "逐个落盘（最安全）"])
+        self.durability_combo.setToolTip("落盘后才删除源文件，断电时不会同时丢失源文件和目标文件；"
+                                         "复制的文件为回读校验总会在写完后落盘")
+        self.durability_combo.currentIndexChanged.connect(self.save_settings)
+        
+        performance_layout.addRow("解析与解码:", self.metadata_backend_combo)
+        performance_layout.addRow("传输顺序:", self.transfer_order_combo)
+        performance_layout.addRow("缩略图缓存上限:", self.thumbnail_cache_combo)
+        performance_layout.addRow("带宽限制:", self.bandwidth_limit_combo)
+        performance_layout.addRow("文件操作限制:", self.ops_limit_combo)
+        performance_layout.addRow("后台模式:", self.background_mode_combo)
+        performance_layout.addRow("校验清单:", self.checksum_manifest_combo)
+        performance_layout.addRow("落盘策略:", self.durability_combo)
+        performance_layout.addRow("库索引:", library_index_layout)
+        performance_layout.addRow("增量导入:", incremental_import_layout)
+        
+        # 界面事件循环延迟，由延迟监视器每秒刷新
+        self.ui_latency_label = QLabel("--")
+        self.ui_monitor.stats_updated.connect(self.ui_latency_label.setText)
+        performance_layout.addRow("界面响应:", self.ui_latency_label)
+        
+        self.performance_group.setLayout(performance_layout)
+        settings_tab_layout.addWidget(self.performance_group)
+        
         self.about_group = QGroupBox("关于")
         about_layout = QVBoxLayout()
         
@@ -604,7 +4078,7 @@ class MediaOrganizer(QMainWindow):
         <h3>核心功能</h3>
         <ul>
         <li><strong>智能分类</strong>：根据文件的创建日期（优先读取EXIF信息）或修改日期，自动整理到"年-月"格式的文件夹中</li>
-        <li><strong>多格式</strong>：默认支持（.png/.jpg/.jpeg/.mp4/.avi/.mov）多种格式，同时支持自定义文件格式</li>
+        <li><strong>多格式</strong>：默认支持（.png/.jpg/.jpeg/.heic/.mp4/.avi/.mov）多种格式，同时支持自定义文件格式</li>
         <li><strong>重复处理</strong>：提供三种策略（自动重命名/覆盖/跳过），灵活应对同名文件场景~~</li>
         <li><strong>高效后台</strong>：采用多线程技术，文件传输过程中不阻塞界面操作，实时显示进度与速度~</li>
         <li><strong>个性界面</strong>：支持字体设置、界面缩放、主题切换（含深色主题等20+风格）和边框样式自定义~~~</li>
@@ -649,6 +4123,7 @@ class MediaOrganizer(QMainWindow):
         
         # 加载保存的设置
         self.load_settings()
+        self.load_job_queue()
         # 应用初始样式
         self.apply_font_settings()
         self.change_theme(self.theme_combo.currentIndex())
@@ -658,8 +4133,21 @@ class MediaOrganizer(QMainWindow):
         # 当选择自定义格式时启用输入框，否则禁用
         self.custom_extensions_edit.setEnabled(index == 4)  # 4是"自定义格式"的索引
     
+    @ui_timed
     def load_settings(self):
-        """加载保存的应用设置，修复字体大小类型错误"""
+        """加载保存的应用设置
+        
+        加载时设置控件会触发save_settings，而此时后面的设置还没有读取，保存会用控件的默认值
+        覆盖它们，所以加载期间不保存。
+        """
+        self.loading_settings = True
+        try:
+            self.read_saved_settings()
+        finally:
+            self.loading_settings = False
+    
+    def read_saved_settings(self):
+        """把保存的设置应用到各控件，修复字体大小类型错误"""
         # 加载字体设置
         font_family = self.settings.value("font_family", "SimHei")
         
@@ -727,16 +4215,73 @@ class MediaOrganizer(QMainWindow):
         except Exception as e:
             self.log(f"加载文件处理设置出错: {str(e)}，使用默认设置！")
             self.duplicate_button_group.button(1).setChecked(True)  # 默认重命名
+        
+        # 加载性能设置
+        try:
+            self.metadata_backend_combo.setCurrentIndex(int(self.settings.value("metadata_backend", 0)))
+            self.transfer_order_combo.setCurrentIndex(int(self.settings.value("transfer_order", 0)))
+            self.background_mode_combo.setCurrentIndex(int(self.settings.value("background_mode", 0)))
+            self.checksum_manifest_combo.setCurrentIndex(int(self.settings.value("checksum_manifest", 0)))
+            self.library_index_combo.setCurrentIndex(int(self.settings.value("library_index", 0)))
+            self.durability_combo.setCurrentIndex(int(self.settings.value("durability", 0)))
+            self.incremental_import_combo.setCurrentIndex(int(self.settings.value("incremental_import", 0)))
+        except Exception as e:
+            self.log(f"加载性能设置出错: {str(e)}，使用默认设置！")
+            self.metadata_backend_combo.setCurrentIndex(0)
+            self.transfer_order_combo.setCurrentIndex(0)
+            self.background_mode_combo.setCurrentIndex(0)
+            self.checksum_manifest_combo.setCurrentIndex(0)
+            self.library_index_combo.setCurrentIndex(0)
+            self.durability_combo.setCurrentIndex(0)
+            self.incremental_import_combo.setCurrentIndex(0)
+        
+        self.backup_edit.setText(str(self.settings.value("backup_folders", "")))
+        
+        # 加载目录结构设置
+        self.layout_template_combo.setCurrentText(
+            str(self.settings.value("layout_template", DestinationLayout.DEFAULT_TEMPLATE)))
+        index = self.shard_limit_combo.findText(str(self.settings.value("shard_limit", "不限制")))
+        self.shard_limit_combo.setCurrentIndex(max(index, 0))
+        try:
+            self.organize_mode_combo.setCurrentIndex(int(self.settings.value("organize_mode", 0)))
+        except (TypeError, ValueError):
+            self.organize_mode_combo.setCurrentIndex(0)
+        index = self.thumbnail_cache_combo.findText(str(self.settings.value("thumbnail_cache", "512 MB")))
+        if index >= 0:
+            self.thumbnail_cache_combo.setCurrentIndex(index)
+        for combo, key in [(self.bandwidth_limit_combo, "bandwidth_limit"), (self.ops_limit_combo, "ops_limit")]:
+            combo.setCurrentIndex(max(combo.findText(str(self.settings.value(key, "不限制"))), 0))
+        self.job_concurrency_combo.setCurrentIndex(
+            max(self.job_concurrency_combo.findText(str(self.settings.value("job_concurrency", "1"))), 0))
     
+    @ui_timed
     def save_settings(self):
         """保存应用设置"""
+        if self.loading_settings:
+            return
         self.settings.setValue("font_family", self.font_combo.currentFont().family())
         self.settings.setValue("font_size", self.font_size_combo.currentText())
         self.settings.setValue("scale_factor", self.scale_spin.currentText())
         self.settings.setValue("theme", self.theme_combo.currentText())
         self.settings.setValue("border_style", self.border_style_combo.currentText())
         self.settings.setValue("duplicate_handling", self.duplicate_button_group.checkedId())
+        self.settings.setValue("metadata_backend", self.metadata_backend_combo.currentIndex())
+        self.settings.setValue("transfer_order", self.transfer_order_combo.currentIndex())
+        self.settings.setValue("layout_template", self.layout_template_combo.currentText())
+        self.settings.setValue("backup_folders", self.backup_edit.text())
+        self.settings.setValue("shard_limit", self.shard_limit_combo.currentText())
+        self.settings.setValue("organize_mode", self.organize_mode_combo.currentIndex())
+        self.settings.setValue("thumbnail_cache", self.thumbnail_cache_combo.currentText())
+        self.settings.setValue("bandwidth_limit", self.bandwidth_limit_combo.currentText())
+        self.settings.setValue("ops_limit", self.ops_limit_combo.currentText())
+        self.settings.setValue("background_mode", self.background_mode_combo.currentIndex())
+        self.settings.setValue("checksum_manifest", self.checksum_manifest_combo.currentIndex())
+        self.settings.setValue("library_index", self.library_index_combo.currentIndex())
+        self.settings.setValue("incremental_import", self.incremental_import_combo.currentIndex())
+        self.settings.setValue("durability", self.durability_combo.currentIndex())
+        self.settings.setValue("job_concurrency", self.job_concurrency_combo.currentText())
     
+    @ui_timed
     def apply_scale_settings(self):
         """应用界面缩放设置"""
         scale_text = self.scale_spin.currentText()
@@ -748,6 +4293,7 @@ class MediaOrganizer(QMainWindow):
         # 重新应用边框样式以适应缩放
         self.change_border_style(self.border_style_combo.currentIndex())
     
+    @ui_timed
     def apply_font_settings(self):
         """应用字体设置到全局"""
         font = self.font_combo.currentFont()
@@ -767,20 +4313,31 @@ class MediaOrganizer(QMainWindow):
         # 调整按钮大小
         for btn in [self.start_btn, self.pause_btn, self.resume_btn, 
                    self.stop_btn, self.save_paths_btn, self.apply_font_btn,
-                   self.apply_scale_btn, self.source_btn, self.dest_btn]:
+                   self.apply_scale_btn, self.source_btn, self.archive_btn, self.dest_btn,
+                   self.load_preview_btn, self.scan_preview_btn, self.rebuild_index_btn, self.clear_imports_btn,
+                   self.backup_btn,
+                   self.add_job_btn, self.move_job_up_btn, self.move_job_down_btn, self.remove_job_btn,
+                   self.run_queue_btn, self.stop_queue_btn]:
             btn.setMinimumHeight(button_height)
             btn.setStyleSheet(f"padding: {int(6 * self.scale_factor)}px {int(12 * self.scale_factor)}px;")
         
         # 调整输入框大小和样式，确保字体完全显示
         input_padding = int(8 * self.scale_factor)  # 增加内边距
-        for edit in [self.source_edit, self.dest_edit, self.custom_extensions_edit]:
+        for edit in [self.source_edit, self.dest_edit, self.custom_extensions_edit,
+                     self.plan_filter_edit]:
             edit.setMinimumHeight(edit_height)
             edit.setStyleSheet(f"padding: {input_padding}px;")
         
         # 调整下拉框大小
         for combo in [self.file_type_combo, self.common_source_combo, 
                      self.common_dest_combo, self.theme_combo, self.font_combo,
-                     self.border_style_combo, self.font_size_combo, self.scale_spin]:
+                     self.border_style_combo, self.font_size_combo, self.scale_spin,
+                     self.metadata_backend_combo, self.transfer_order_combo,
+                     self.bandwidth_limit_combo, self.ops_limit_combo, self.background_mode_combo,
+                     self.checksum_manifest_combo, self.library_index_combo, self.durability_combo,
+                     self.incremental_import_combo,
+                     self.layout_template_combo, self.shard_limit_combo, self.organize_mode_combo,
+                     self.thumbnail_cache_combo, self.plan_kind_combo, self.job_concurrency_combo]:
             combo.setMinimumHeight(combo_height)
             combo.setStyleSheet(f"padding: {input_padding}px;")
         
@@ -828,6 +4385,7 @@ class MediaOrganizer(QMainWindow):
             widget.setGraphicsEffect(None)
         self.shadow_effects.clear()
     
+    @ui_timed
     def change_border_style(self, index):
         """更改边框风格并重新应用主题"""
         self.save_settings()
@@ -847,8 +4405,10 @@ class MediaOrganizer(QMainWindow):
             # 为主要分组控件添加阴影
             for widget in [self.address_group, self.duplicate_group, 
                           self.progress_group, self.log_group,
+                          self.plan_group, self.preview_group, self.queue_group,
                           self.font_group, self.scale_group,
-                          self.appearance_group, self.about_group]:
+                          self.appearance_group, self.performance_group,
+                          self.about_group]:
                 self.create_shadow_effect(widget, shadow_color)
         
         self.change_theme(self.theme_combo.currentIndex())  # 重新应用主题以更新边框
@@ -886,6 +4446,7 @@ class MediaOrganizer(QMainWindow):
         r, g, b, a = shadow_rgba[theme_index]
         return QColor(r, g, b, a)
     
+    @ui_timed
     def change_theme(self, index):
         """更改应用主题，优化标签页选中效果"""
         # 计算基于缩放因子的尺寸
@@ -1505,18 +5066,28 @@ class MediaOrganizer(QMainWindow):
         if folder:
             self.source_edit.setText(folder)
     
+    def select_source_archive(self):
+        """选择作为源的压缩包"""
+        file_path, _ = QFileDialog.getOpenFileName(self, "选择压缩包", "", ARCHIVE_FILE_FILTER)
+        if file_path:
+            self.source_edit.setText(file_path)
+    
     def select_dest_folder(self):
         """选择目标文件夹"""
         folder = QFileDialog.getExistingDirectory(self, "选择目标文件夹")
         if folder:
             self.dest_edit.setText(folder)
     
-    def start_organizing(self):
-        """开始整理文件"""
-        source_folder = self.source_edit.text()
-        dest_folder = self.dest_edit.text()
-        
-        # 获取文件类型筛选
+    def add_backup_folder(self):
+        """选择一个备份目标文件夹，追加到备份列表"""
+        folder = QFileDialog.getExistingDirectory(self, "选择备份文件夹")
+        if folder:
+            folders = [part.strip() for part in self.backup_edit.text().split(';') if part.strip()]
+            if folder not in folders:
+                self.backup_edit.setText(";".join(folders + [folder]))
+    
+    def get_file_type_filter(self):
+        """读取文件类型筛选设置，返回(类型, 自定义扩展名)，自定义格式无效时返回None"""
         file_type_index = self.file_type_combo.currentIndex()
         file_type_filter = "all"  # 默认所有类型
         custom_extensions = []
@@ -1534,78 +5105,155 @@ class MediaOrganizer(QMainWindow):
             if not custom_input:
                 self.log("请输入自定义文件格式")
                 QMessageBox.warning(self, "错误", "请输入自定义文件格式，用逗号分隔（例如: .txt,.pdf）")
-                return
+                return None
             # 处理输入，确保每个扩展名以.开头
             custom_extensions = [ext.strip() if ext.strip().startswith('.') else f'.{ext.strip()}' 
                                for ext in custom_input.split(',') if ext.strip()]
             if not custom_extensions:
                 self.log("无效的自定义文件格式")
                 QMessageBox.warning(self, "错误", "无效的自定义文件格式，请检查输入")
-                return
+                return None
+        return file_type_filter, custom_extensions
+    
+    def get_dest_layout(self):
+        """编译目录结构模板，模板无效时提示并返回None"""
+        shard_text = self.shard_limit_combo.currentText()
+        try:
+            return DestinationLayout(self.layout_template_combo.currentText(),
+                                     int(shard_text) if shard_text.isdigit() else 0)
+        except ValueError as e:
+            self.log(f"无效的目录结构: {str(e)}")
+            QMessageBox.warning(self, "错误", f"无效的目录结构: {str(e)}")
+            return None
+    
+    def collect_job(self):
+        """读取主功能页的设置并检查，返回任务设置字典，设置无效时提示并返回None"""
+        source_folder = self.source_edit.text()
+        dest_folder = self.dest_edit.text()
+        
+        # 获取文件类型筛选
+        file_type = self.get_file_type_filter()
+        if file_type is None:
+            return None
+        file_type_filter, custom_extensions = file_type
         
         # 获取同名文件处理方式
         duplicate_handling = self.duplicate_button_group.checkedId()
         if duplicate_handling == -1:  # 没有选择时默认重命名
             duplicate_handling = 1
         
-        if not source_folder or not os.path.isdir(source_folder):
+        # 源可以是文件夹，也可以是ZIP/TAR压缩包
+        if not source_folder or not (os.path.isdir(source_folder) or is_archive_file(source_folder)):
             self.log("请选择有效的源文件夹")
             QMessageBox.warning(self, "错误", "请选择有效的源文件夹")
-            return
+            return None
         
         if not dest_folder or not os.path.isdir(dest_folder):
             self.log("请选择有效的目标文件夹")
             QMessageBox.warning(self, "错误", "请选择有效的目标文件夹")
+            return None
+        
+        backup_folders = self.get_backup_folders()
+        if backup_folders is None:
+            return None
+        
+        # 编译目录结构模板
+        dest_layout = self.get_dest_layout()
+        if dest_layout is None:
+            return None
+        return {
+            "source": source_folder, "dest": dest_folder, "backups": backup_folders,
+            "file_type_filter": file_type_filter, "custom_extensions": custom_extensions,
+            "duplicate_handling": duplicate_handling,
+            "layout_template": dest_layout.template, "shard_limit": dest_layout.shard_limit,
+            "organize_mode": ORGANIZE_MODES[self.organize_mode_combo.currentIndex()],
+        }
+    
+    def create_transfer_thread(self, job, file_list):
+        """按任务设置和设置页的性能选项创建传输线程"""
+        bandwidth_limit, ops_limit = self.get_throttle_limits()
+        self.bandwidth_bucket.set_rate(bandwidth_limit)
+        self.ops_bucket.set_rate(ops_limit)
+        thread_class = ArchiveTransferThread if is_archive_file(job["source"]) else FileTransferThread
+        return thread_class(
+            job["source"], job["dest"], file_list, job["file_type_filter"],
+            job["custom_extensions"], job["duplicate_handling"],
+            metadata_backend="process" if self.metadata_backend_combo.currentIndex() == 1 else "thread",
+            physical_order=self.transfer_order_combo.currentIndex() == 0,
+            dest_layout=DestinationLayout(job["layout_template"], job["shard_limit"]),
+            bandwidth_bucket=self.bandwidth_bucket, ops_bucket=self.ops_bucket,
+            background=self.background_mode_combo.currentIndex() == 1,
+            write_manifest=self.checksum_manifest_combo.currentIndex() == 1,
+            event_log=self.event_log, library_mode=self.library_index_combo.currentIndex(),
+            incremental=self.incremental_import_combo.currentIndex() == 1,
+            backup_folders=job.get("backups", []),
+            organize_mode=job["organize_mode"],
+            durability=DURABILITY_MODES[self.durability_combo.currentIndex()]
+        )
+    
+    def get_backup_folders(self):
+        """解析备份目标文件夹，无效时提示并返回None"""
+        dest_key = os.path.normcase(os.path.abspath(self.dest_edit.text()))
+        backup_folders = []
+        for folder in (part.strip() for part in self.backup_edit.text().split(';')):
+            if not folder:
+                continue
+            if not os.path.isdir(folder):
+                QMessageBox.warning(self, "错误", f"备份文件夹不存在: {folder}")
+                return None
+            if os.path.normcase(os.path.abspath(folder)) == dest_key or folder in backup_folders:
+                QMessageBox.warning(self, "错误", f"备份文件夹与目标文件夹或其他备份文件夹重复: {folder}")
+                return None
+            backup_folders.append(folder)
+        return backup_folders
+    
+    @staticmethod
+    def dest_keys(dest_folder, backup_folders):
+        return {os.path.normcase(os.path.abspath(folder)) for folder in [dest_folder] + list(backup_folders)}
+    
+    def busy_dest_folders(self):
+        """正在写入的目标文件夹（含备份目标）；同一文件夹同时只运行一个任务，避免同名检测互相冲突"""
+        threads = list(self.job_threads.values())
+        if self.transfer_thread and self.transfer_thread.isRunning():
+            threads.append(self.transfer_thread)
+        busy = set()
+        for thread in threads:
+            busy |= self.dest_keys(thread.dest_folder, thread.backup_folders)
+        return busy
+    
+    @ui_timed
+    def start_organizing(self):
+        """开始整理文件"""
+        job = self.collect_job()
+        if job is None:
             return
+        source_folder = job["source"]
+        from_archive = is_archive_file(source_folder)
+        if self.dest_keys(job["dest"], job["backups"]) & self.busy_dest_folders():
+            QMessageBox.warning(self, "错误", "任务队列正在向该目标文件夹写入，请稍后再试")
+            return
+        self.save_settings()
         
         # 获取所有符合条件的文件
         try:
-            # 先获取所有文件
-            all_files = [f for f in os.listdir(source_folder) 
-                        if os.path.isfile(os.path.join(source_folder, f))]
-            
-            # 筛选符合条件的文件
-            file_list = []
-            for filename in all_files:
-                filename_lower = filename.lower()
-                
-                # 图片文件
-                image_extensions = ('.png', '.jpg', '.jpeg', '.gif', '.bmp', '.tiff', '.webp', '.raw')
-                # 视频文件
-                video_extensions = ('.mp4', '.avi', '.mov', '.mkv', '.flv', '.wmv', '.mpeg', '.mpg', '.3gp')
-                # LRV文件
-                lrv_extension = '.lrv'
-                
-                # 检查是否符合筛选条件
-                if file_type_filter == "all" or file_type_filter == "images":
-                    if filename_lower.endswith(image_extensions):
-                        file_list.append(filename)
-                        continue
-                        
-                if file_type_filter == "all" or file_type_filter == "videos":
-                    if filename_lower.endswith(video_extensions):
-                        file_list.append(filename)
-                        continue
-                        
-                if file_type_filter == "all" or file_type_filter == "lrv":
-                    if filename_lower.endswith(lrv_extension):
-                        file_list.append(filename)
-                        continue
-                        
-                if file_type_filter == "custom":
-                    if any(filename_lower.endswith(ext.lower()) for ext in custom_extensions):
-                        file_list.append(filename)
-                        continue
+            # 压缩包的成员在传输线程中读取，这里不列出
+            file_list = [] if from_archive else list_source_files(
+                source_folder, job["file_type_filter"], job["custom_extensions"])
             
-            if not file_list:
+            if from_archive:
+                self.log(f"从压缩包导入: {source_folder}，成员日期取自压缩包中的文件头")
+            elif not file_list:
                 self.log("源文件夹中没有找到符合条件的文件")
                 QMessageBox.information(self, "提示", "源文件夹中没有找到符合条件的文件")
                 return
-            
-            self.log(f"找到 {len(file_list)} 个符合条件的文件，开始整理...")
+            else:
+                self.log(f"找到 {len(file_list)} 个符合条件的文件，开始整理...")
             # 记录同名文件处理方式
+            duplicate_handling = job["duplicate_handling"]
             handling_text = "自动重命名" if duplicate_handling == 1 else "覆盖现有文件" if duplicate_handling == 2 else "跳过同名文件"
             self.log(f"同名文件处理方式: {handling_text}")
+            if job["backups"]:
+                self.log(f"同时备份到: {'; '.join(job['backups'])}，每个文件只读取一次")
             
             # 禁用开始按钮，启用其他控制按钮
             self.start_btn.setEnabled(False)
@@ -1613,24 +5261,32 @@ class MediaOrganizer(QMainWindow):
             self.resume_btn.setEnabled(False)
             self.stop_btn.setEnabled(True)
             self.source_btn.setEnabled(False)
+            self.archive_btn.setEnabled(False)
             self.dest_btn.setEnabled(False)
+            self.backup_edit.setEnabled(False)
+            self.backup_btn.setEnabled(False)
             self.save_paths_btn.setEnabled(False)
             self.file_type_combo.setEnabled(False)
             self.custom_extensions_edit.setEnabled(False)
+            self.layout_template_combo.setEnabled(False)
+            self.shard_limit_combo.setEnabled(False)
+            self.organize_mode_combo.setEnabled(False)
             self.rename_radio.setEnabled(False)
             self.overwrite_radio.setEnabled(False)
             self.skip_radio.setEnabled(False)
+            self.rebuild_index_btn.setEnabled(False)
+            self.ui_monitor.reset()
             
             # 创建并启动传输线程
-            self.transfer_thread = FileTransferThread(
-                source_folder, dest_folder, file_list, file_type_filter, 
-                custom_extensions, duplicate_handling
-            )
+            self.transfer_thread = self.create_transfer_thread(job, file_list)
             self.transfer_thread.progress_updated.connect(self.update_progress)
             self.transfer_thread.log_updated.connect(self.log)
             self.transfer_thread.transfer_complete.connect(self.transfer_finished)
             self.transfer_thread.speed_updated.connect(self.update_speed)
             self.transfer_thread.file_count_updated.connect(self.update_file_count)
+            self.transfer_thread.destinations_updated.connect(self.destinations_label.setText)
+            self.destinations_label.setVisible(bool(job["backups"]))
+            self.destinations_label.setText("")
             self.transfer_thread.start()
             
             self.status_label.setText("正在整理...")
@@ -1639,6 +5295,310 @@ class MediaOrganizer(QMainWindow):
             self.log(f"发生错误: {str(e)}")
             QMessageBox.critical(self, "错误", f"发生错误: {str(e)}")
     
+    # ================ 任务队列 ================
+    
+    def load_job_queue(self):
+        """加载保存的任务队列，上次退出时未完成的任务恢复为等待"""
+        try:
+            self.jobs = json.loads(str(self.settings.value("job_queue", "[]")))
+        except ValueError:
+            self.jobs = []
+        for job in self.jobs:
+            if job.get("status") == "运行中":
+                job["status"] = "等待"
+        self.refresh_job_list()
+    
+    def save_job_queue(self):
+        self.settings.setValue("job_queue", json.dumps(self.jobs, ensure_ascii=False))
+    
+    def job_text(self, job):
+        """任务在列表中的显示文字"""
+        status = job["status"]
+        if status == "运行中":
+            status = f"运行中 {job.get('progress', 0)}%"
+        mode = self.organize_mode_combo.itemText(ORGANIZE_MODES.index(job["organize_mode"])).split("（")[0]
+        dest = " + ".join([job['dest']] + job.get("backups", []))
+        return f"[{status}] {job['source']} → {dest}  ({mode}, {job['layout_template']})"
+    
+    def refresh_job_list(self):
+        """按队列顺序重建列表"""
+        current = self.job_list.currentRow()
+        self.job_list.clear()
+        for job in self.jobs:
+            self.job_list.addItem(self.job_text(job))
+        if 0 <= current < len(self.jobs):
+            self.job_list.setCurrentRow(current)
+    
+    def update_job_item(self, job):
+        """只更新单个任务的显示"""
+        if job in self.jobs:
+            self.job_list.item(self.jobs.index(job)).setText(self.job_text(job))
+    
+    def add_job(self):
+        """把主功能页的当前设置加入队列"""
+        job = self.collect_job()
+        if job is None:
+            return
+        job.update(id=uuid.uuid4().hex, status="等待", progress=0)
+        self.jobs.append(job)
+        self.job_list.addItem(self.job_text(job))
+        self.save_job_queue()
+        self.log(f"已加入任务队列: {job['source']} → {job['dest']}")
+    
+    def move_job(self, offset):
+        """调整选中任务在队列中的位置"""
+        row = self.job_list.currentRow()
+        target = row + offset
+        if row < 0 or not 0 <= target < len(self.jobs):
+            return
+        self.jobs[row], self.jobs[target] = self.jobs[target], self.jobs[row]
+        self.refresh_job_list()
+        self.job_list.setCurrentRow(target)
+        self.save_job_queue()
+    
+    def remove_job(self):
+        """移除选中的任务，正在运行的任务不能移除"""
+        row = self.job_list.currentRow()
+        if row < 0:
+            return
+        if self.jobs[row]["id"] in self.job_threads:
+            QMessageBox.warning(self, "提示", "任务正在运行，请先停止队列")
+            return
+        del self.jobs[row]
+        self.refresh_job_list()
+        self.save_job_queue()
+    
+    def run_job_queue(self):
+        """开始运行队列中等待的任务"""
+        if not any(job["status"] == "等待" for job in self.jobs):
+            QMessageBox.information(self, "提示", "队列中没有等待运行的任务")
+            return
+        self.queue_running = True
+        self.run_queue_btn.setEnabled(False)
+        self.stop_queue_btn.setEnabled(True)
+        self.log("任务队列开始运行")
+        self.schedule_jobs()
+    
+    def stop_job_queue(self):
+        """停止队列：不再启动新任务，正在运行的任务停止"""
+        self.queue_running = False
+        for thread in self.job_threads.values():
+            thread.stop()
+        self.stop_queue_btn.setEnabled(False)
+        self.queue_status_label.setText("正在停止...")
+    
+    def schedule_jobs(self):
+        """在并发上限内按队列顺序启动等待中的任务，跳过目标文件夹正被写入的任务"""
+        concurrency = int(self.job_concurrency_combo.currentText())
+        busy = self.busy_dest_folders()
+        for job in self.jobs:
+            if not self.queue_running or len(self.job_threads) >= concurrency:
+                break
+            dest_keys = self.dest_keys(job["dest"], job.get("backups", []))
+            if job["status"] != "等待" or dest_keys & busy:
+                continue
+            if self.start_job(job):
+                busy |= dest_keys
+        
+        if not self.job_threads:
+            self.queue_running = False
+            self.run_queue_btn.setEnabled(True)
+            self.stop_queue_btn.setEnabled(False)
+            self.queue_status_label.setText("队列空闲")
+        else:
+            self.queue_status_label.setText(f"正在运行 {len(self.job_threads)} 个任务")
+    
+    def start_job(self, job):
+        """启动单个任务，没有可处理的文件或出错时标记状态并返回False"""
+        name = os.path.basename(os.path.normpath(job["source"])) or job["source"]
+        try:
+            if not (os.path.isdir(job["source"]) or is_archive_file(job["source"])):
+                raise OSError(f"源不存在: {job['source']}")
+            file_list = [] if is_archive_file(job["source"]) else list_source_files(
+                job["source"], job["file_type_filter"], job["custom_extensions"])
+            if not file_list and not is_archive_file(job["source"]):
+                job["status"] = "无文件"
+                self.update_job_item(job)
+                self.save_job_queue()
+                return False
+            thread = self.create_transfer_thread(job, file_list)
+        except Exception as e:
+            job["status"] = "出错"
+            self.log(f"[队列:{name}] 启动失败: {str(e)}")
+            self.update_job_item(job)
+            self.save_job_queue()
+            return False
+        
+        job["status"] = "运行中"
+        job["progress"] = 0
+        thread.progress_updated.connect(lambda value, job=job: self.update_job_progress(job, value))
+        thread.log_updated.connect(lambda message, name=name: self.log(f"[队列:{name}] {message}"))
+        # 线程完全结束后再释放，避免QThread在运行中被销毁
+        thread.finished.connect(lambda job=job: self.job_finished(job))
+        self.job_threads[job["id"]] = thread
+        self.update_job_item(job)
+        self.save_job_queue()
+        thread.start()
+        return True
+    
+    @ui_timed
+    def update_job_progress(self, job, value):
+        job["progress"] = value
+        self.update_job_item(job)
+    
+    @ui_timed
+    def job_finished(self, job):
+        """任务结束，记录状态并启动下一个任务"""
+        thread = self.job_threads.pop(job["id"], None)
+        job["status"] = "已停止" if thread is not None and thread.stopped else "完成"
+        self.update_job_item(job)
+        self.save_job_queue()
+        self.schedule_jobs()
+        if not self.job_threads and not self.queue_running:
+            self.log("任务队列已结束")
+    
+    def get_throttle_limits(self):
+        """读取限速设置，返回(字节/秒, 文件/秒)，0表示不限制"""
+        bandwidth_text = self.bandwidth_limit_combo.currentText().split()[0]
+        ops_text = self.ops_limit_combo.currentText().split()[0]
+        bandwidth_limit = int(bandwidth_text) * 1024 * 1024 if bandwidth_text.isdigit() else 0
+        ops_limit = int(ops_text) if ops_text.isdigit() else 0
+        return bandwidth_limit, ops_limit
+    
+    def update_throttle(self):
+        """限速设置变化时保存，并立即应用到所有正在运行的传输（共享同一份额度）"""
+        self.save_settings()
+        bandwidth_limit, ops_limit = self.get_throttle_limits()
+        self.bandwidth_bucket.set_rate(bandwidth_limit)
+        self.ops_bucket.set_rate(ops_limit)
+        if (self.transfer_thread and self.transfer_thread.isRunning()) or self.job_threads:
+            self.log(f"限速已调整: 带宽 {self.bandwidth_limit_combo.currentText()}，"
+                     f"文件操作 {self.ops_limit_combo.currentText()}")
+    
+    def clear_import_watermark(self):
+        """清除当前源文件夹的增量导入记录"""
+        source_folder = self.source_edit.text()
+        if not source_folder or not os.path.isdir(source_folder):
+            QMessageBox.warning(self, "错误", "请选择有效的源文件夹")
+            return
+        try:
+            watermark = ImportWatermark(source_folder)
+            count = len(watermark.known)
+            watermark.clear()
+            watermark.close()
+        except (sqlite3.Error, OSError) as e:
+            self.log(f"清除导入记录失败: {str(e)}")
+            return
+        self.log(f"已清除 {source_folder} 的导入记录（{count} 个文件），下次将重新导入全部文件")
+    
+    def rebuild_library_index(self):
+        """在后台重建目标文件夹的库索引"""
+        dest_folder = self.dest_edit.text()
+        if not dest_folder or not os.path.isdir(dest_folder):
+            QMessageBox.warning(self, "错误", "请选择有效的目标文件夹")
+            return
+        self.rebuild_index_btn.setEnabled(False)
+        self.start_btn.setEnabled(False)
+        self.log(f"开始重建库索引: {dest_folder}")
+        self.library_index_thread = LibraryIndexThread(dest_folder)
+        self.library_index_thread.progress_updated.connect(
+            lambda done, total: self.status_label.setText(f"正在重建库索引 {done}/{total}"))
+        self.library_index_thread.rebuild_finished.connect(self.library_index_rebuilt)
+        self.library_index_thread.start()
+    
+    def library_index_rebuilt(self, message):
+        """库索引重建结束"""
+        self.log(message)
+        self.status_label.setText("就绪")
+        self.rebuild_index_btn.setEnabled(True)
+        self.start_btn.setEnabled(True)
+    
+    @ui_timed
+    def scan_preview(self):
+        """在后台扫描源文件夹，按当前设置生成文件清单"""
+        source_folder = self.source_edit.text()
+        if not source_folder or not os.path.isdir(source_folder):
+            QMessageBox.warning(self, "错误", "请选择有效的源文件夹")
+            return
+        file_type = self.get_file_type_filter()
+        dest_layout = self.get_dest_layout()
+        if file_type is None or dest_layout is None:
+            return
+        file_type_filter, custom_extensions = file_type
+        
+        if self.preview_scan_thread and self.preview_scan_thread.isRunning():
+            self.preview_scan_thread.stop()
+            self.preview_scan_thread.wait()
+        
+        self.plan_model.clear()
+        self.plan_status_label.setText("正在扫描...")
+        self.preview_scan_thread = PreviewScanThread(
+            source_folder, self.dest_edit.text(),
+            lambda filename: should_process_file(filename, file_type_filter, custom_extensions),
+            dest_layout, max(self.duplicate_button_group.checkedId(), 1)
+        )
+        self.preview_scan_thread.rows_ready.connect(self.add_plan_rows)
+        self.preview_scan_thread.scan_finished.connect(
+            lambda count: self.plan_status_label.setText(f"文件: {self.plan_model.rowCount()}/{count}"))
+        self.preview_scan_thread.start()
+    
+    @ui_timed
+    def add_plan_rows(self, rows):
+        """追加一批扫描结果"""
+        self.plan_model.append_rows(rows)
+        self.plan_status_label.setText(f"已扫描 {len(self.plan_model.rows)} 个文件...")
+    
+    @ui_timed
+    def apply_plan_filter(self):
+        """按关键字和类型过滤文件清单"""
+        kinds = [None, "images", "videos", "lrv", "other"]
+        self.plan_model.set_filter(self.plan_filter_edit.text(), kinds[self.plan_kind_combo.currentIndex()])
+        self.plan_status_label.setText(f"文件: {self.plan_model.rowCount()}/{len(self.plan_model.rows)}")
+    
+    @ui_timed
+    def load_preview(self):
+        """在后台加载源文件夹中图片的缩略图"""
+        source_folder = self.source_edit.text()
+        if not source_folder or not os.path.isdir(source_folder):
+            QMessageBox.warning(self, "错误", "请选择有效的源文件夹")
+            return
+        
+        if self.thumbnail_thread and self.thumbnail_thread.isRunning():
+            self.thumbnail_thread.stop()
+            self.thumbnail_thread.wait()
+        
+        max_bytes = int(self.thumbnail_cache_combo.currentText().split()[0]) * 1024 * 1024
+        if self.thumbnail_cache is None:
+            self.thumbnail_cache = ThumbnailCache(get_app_data_dir("thumbnails"), max_bytes)
+        self.thumbnail_cache.max_bytes = max_bytes
+        
+        file_paths = [os.path.join(source_folder, f) for f in sorted(os.listdir(source_folder))
+                      if f.lower().endswith(THUMBNAIL_EXTENSIONS)]
+        self.thumbnail_list.clear()
+        self.preview_status_label.setText(f"正在加载 {len(file_paths)} 张图片的缩略图...")
+        self.preview_start_time = time.time()
+        
+        self.thumbnail_thread = ThumbnailThread(file_paths, self.thumbnail_cache,
+                                                use_processes=self.metadata_backend_combo.currentIndex() == 1)
+        self.thumbnail_thread.thumbnail_ready.connect(self.add_thumbnail)
+        self.thumbnail_thread.finished_loading.connect(self.preview_finished)
+        self.thumbnail_thread.start()
+    
+    @ui_timed
+    def add_thumbnail(self, file_path, data):
+        """添加一张缩略图到预览列表"""
+        pixmap = QPixmap()
+        pixmap.loadFromData(data)
+        item = QListWidgetItem(QIcon(pixmap), os.path.basename(file_path))
+        item.setToolTip(file_path)
+        self.thumbnail_list.addItem(item)
+    
+    def preview_finished(self, total, cache_hits):
+        """缩略图加载完成"""
+        elapsed = time.time() - self.preview_start_time
+        self.preview_status_label.setText(
+            f"已加载 {self.thumbnail_list.count()}/{total} 张缩略图，缓存命中 {cache_hits} 张，耗时 {elapsed:.1f} 秒")
+    
     def pause_organizing(self):
         """暂停整理"""
         if self.transfer_thread and self.transfer_thread.isRunning():
@@ -1669,6 +5629,7 @@ class MediaOrganizer(QMainWindow):
         self.reset_controls()
         self.status_label.setText("整理完成")
         self.speed_label.setText("速度: --")
+        self.log(f"[统计] {self.ui_monitor.format_summary()}")
         self.log("文件整理完成")
         QMessageBox.information(self, "完成", "文件整理已完成")
     
@@ -1679,27 +5640,39 @@ class MediaOrganizer(QMainWindow):
         self.resume_btn.setEnabled(False)
         self.stop_btn.setEnabled(False)
         self.source_btn.setEnabled(True)
+        self.archive_btn.setEnabled(True)
         self.dest_btn.setEnabled(True)
+        self.backup_edit.setEnabled(True)
+        self.backup_btn.setEnabled(True)
         self.save_paths_btn.setEnabled(True)
         self.file_type_combo.setEnabled(True)
+        self.layout_template_combo.setEnabled(True)
+        self.shard_limit_combo.setEnabled(True)
+        self.organize_mode_combo.setEnabled(True)
         self.rename_radio.setEnabled(True)
         self.overwrite_radio.setEnabled(True)
         self.skip_radio.setEnabled(True)
+        self.rebuild_index_btn.setEnabled(True)
         # 根据当前选择决定是否启用自定义格式输入框
         self.custom_extensions_edit.setEnabled(self.file_type_combo.currentIndex() == 4)
     
+    @ui_timed
     def update_progress(self, value):
         """更新进度条"""
         self.progress_bar.setValue(value)
     
+    @ui_timed
     def update_file_count(self, current, total):
         """更新文件计数显示"""
-        self.file_count_label.setText(f"文件: {current}/{total}")
+        # 从TAR压缩包导入时总数未知
+        self.file_count_label.setText(f"文件: {current}/{total}" if total else f"文件: {current}")
     
+    @ui_timed
     def update_speed(self, speed_text):
         """更新速度显示"""
         self.speed_label.setText(f"速度: {speed_text}")
     
+    @ui_timed
     def log(self, message):
         """添加日志信息"""
         timestamp = datetime.now().strftime("%H:%M:%S")
@@ -1750,4 +5723,6 @@ def main():
     sys.exit(app.exec_())
 
 if __name__ == "__main__":
+    # 打包后的程序中，进程池子进程从这里进入并直接执行任务
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
@@ -0,0 +1,43 @@
+"""界面性能测试的公共夹具：离屏加载主程序模块，设置和程序数据写入临时目录"""
+import importlib.util
+import os
+
+import pytest
+
+# 无显示器的Linux上使用离屏平台，必须在创建QApplication之前设置
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+APP_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Camera Assistant-0.2.py")
+
+
+@pytest.fixture(scope="session")
+def ca(tmp_path_factory):
+    """主程序模块（文件名含空格，按路径加载）"""
+    home = tmp_path_factory.mktemp("home")
+    # 日志、缩略图缓存等程序数据写入临时目录，不影响本机数据
+    os.environ["LOCALAPPDATA"] = str(home / "data")
+    spec = importlib.util.spec_from_file_location("camera_assistant", APP_FILE)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    # 保存的设置也写入临时目录，测试不读取也不修改本机的设置
+    module.QSettings.setPath(module.QSettings.IniFormat, module.QSettings.UserScope, str(home / "config"))
+    module.QSettings.setPath(module.QSettings.NativeFormat, module.QSettings.UserScope, str(home / "config"))
+    return module
+
+
+@pytest.fixture(scope="session")
+def qapp(ca):
+    return ca.QApplication.instance() or ca.QApplication([])
+
+
+@pytest.fixture
+def window(ca, qapp):
+    """新建主窗口，测试结束后关闭"""
+    window = ca.MediaOrganizer()
+    yield window
+    window.ui_monitor.stop()
+    if window.tray_icon:
+        window.tray_icon.hide()  # 托盘图标可见时关闭窗口只会隐藏到托盘
+    window.close()
+    window.deleteLater()
+    qapp.processEvents()
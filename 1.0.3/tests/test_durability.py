@@ -0,0 +1,94 @@
+"""落盘策略的行为测试：何时删除源文件，以及同步失败时保留源文件"""
+import os
+
+import pytest
+
+
+def make_pair(tmp_path, name, folder="dst"):
+    """创建一个源文件和一个已写入的目标文件"""
+    (tmp_path / folder).mkdir(exist_ok=True)
+    src = tmp_path / f"{name}.src"
+    dst = tmp_path / folder / name
+    src.write_bytes(b"data")
+    dst.write_bytes(b"data")
+    return str(src), str(dst)
+
+
+def test_folder_sync_failure_keeps_sources(ca, tmp_path, monkeypatch):
+    """目录同步失败时，该目录中文件的源文件不删除，其他目录的源文件照常删除"""
+    real_fsync_path = ca.fsync_path
+    bad_folder = str(tmp_path / "bad")
+
+    def fsync_path(path):
+        if path == bad_folder:
+            raise OSError("I/O error")
+        real_fsync_path(path)
+
+    monkeypatch.setattr(ca, "fsync_path", fsync_path)
+    errors = []
+    policy = ca.DurabilityPolicy("batched", batch_size=10, on_error=errors.append)
+    kept_src, kept_dst = make_pair(tmp_path, "a.jpg", "bad")
+    moved_src, moved_dst = make_pair(tmp_path, "b.jpg", "good")
+    policy.commit(kept_dst, kept_src)
+    policy.commit(moved_dst, moved_src)
+    policy.flush()
+    assert os.path.exists(kept_src)
+    assert not os.path.exists(moved_src)
+    assert len(errors) == 1 and bad_folder in errors[0]
+
+
+def test_multi_target_keeps_source_if_any_folder_fails(ca, tmp_path, monkeypatch):
+    """同时写入多个目标时，任一目标所在目录同步失败都保留源文件"""
+    bad_folder = str(tmp_path / "backup")
+
+    def fsync_path(path):
+        if path == bad_folder:
+            raise OSError("I/O error")
+
+    monkeypatch.setattr(ca, "fsync_path", fsync_path)
+    policy = ca.DurabilityPolicy("strict")
+    src, dst = make_pair(tmp_path, "a.jpg")
+    _, backup = make_pair(tmp_path, "a.jpg", "backup")
+    policy.commit([dst, backup], src)
+    assert os.path.exists(src)
+
+
+@pytest.mark.parametrize("mode", ["none", "batched", "strict"])
+def test_sources_removed_after_flush(ca, tmp_path, mode):
+    policy = ca.DurabilityPolicy(mode, batch_size=3)
+    pairs = [make_pair(tmp_path, f"{index}.jpg") for index in range(5)]
+    for src, dst in pairs:
+        policy.commit(dst, src)
+    policy.flush()
+    assert not any(os.path.exists(src) for src, _ in pairs)
+    assert policy.synced_files == (0 if mode == "none" else 5)
+
+
+def test_file_sync_failure_keeps_source(ca, tmp_path, monkeypatch):
+    """文件数据同步失败时保留源文件并报告，同一批的其他文件照常删除源文件"""
+    def fsync_path(path):
+        if path.endswith("a.jpg"):
+            raise OSError("I/O error")
+
+    monkeypatch.setattr(ca, "fsync_path", fsync_path)
+    errors = []
+    policy = ca.DurabilityPolicy("batched", batch_size=2, on_error=errors.append)
+    kept_src, kept_dst = make_pair(tmp_path, "a.jpg")
+    moved_src, moved_dst = make_pair(tmp_path, "b.jpg")
+    policy.commit(kept_dst, kept_src)
+    assert os.path.exists(kept_src)  # 未满一批，尚未同步
+    policy.commit(moved_dst, moved_src)
+    assert os.path.exists(kept_src) and not os.path.exists(moved_src)
+    assert policy.synced_files == 1
+    assert len(errors) == 1 and "a.jpg" in errors[0]
+
+
+def test_copy_commit_syncs_only_directories(ca, tmp_path, monkeypatch):
+    """复制的数据在回读校验前已经fsync，提交时只同步目录"""
+    synced = []
+    monkeypatch.setattr(ca, "fsync_path", synced.append)
+    policy = ca.DurabilityPolicy("strict")
+    src, dst = make_pair(tmp_path, "a.jpg")
+    policy.commit_copy(dst, src)
+    assert synced == [os.path.dirname(dst)]
+    assert not os.path.exists(src)
@@ -0,0 +1,184 @@
+"""界面性能回归测试，在 QT_QPA_PLATFORM=offscreen 下运行，无需显示器
+
+耗时指标记录为与参考负载（同一进程中运行的固定Qt控件创建和样式表工作）耗时的比值，
+机器快慢、负载高低对两者的影响大致相同，比值比绝对耗时稳定；内存指标记录字节数。
+各项指标与 perf_baseline.json 中的基线比较，超过 基线 × 容差 时失败。
+基线文件缺失、缺少某项指标，或记录基线的环境（Python、Qt版本、平台）与当前不同时跳过比较。
+设置环境变量 CA_UPDATE_PERF_BASELINE=1 运行时不做比较，改为把本次结果写入基线文件。
+
+    cd 1.0.3 && python -m pytest -q tests
+"""
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import pytest
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "perf_baseline.json")
+UPDATE_BASELINE = os.environ.get("CA_UPDATE_PERF_BASELINE") == "1"
+REPEAT = 3  # 计时取多次中最快的一次，减少机器负载带来的波动
+REFERENCE_REPEAT = 5
+REFERENCE_WIDGETS = 300
+LOG_LINES = 100_000
+TASK_COUNT = 100_000
+
+
+def environment():
+    """影响指标的运行环境，与基线记录时不同则不比较"""
+    from PyQt5.QtCore import QT_VERSION_STR
+    return {"python": ".".join(platform.python_version_tuple()[:2]), "qt": QT_VERSION_STR,
+            "platform": sys.platform}
+
+
+@pytest.fixture(scope="module")
+def baseline():
+    try:
+        with open(BASELINE_FILE, encoding="utf-8") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        data = {"metrics": {}, "tolerance": 2.0}
+    current = environment()
+    if not UPDATE_BASELINE and data.get("environment") != current:
+        data["skip"] = f"基线记录环境 {data.get('environment')} 与当前 {current} 不同"
+    yield data
+    if UPDATE_BASELINE:
+        data["environment"] = current
+        with open(BASELINE_FILE, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2, sort_keys=True)
+            f.write("\n")
+
+
+def reference_workload(ca):
+    """参考负载：创建一批带样式表的控件并处理事件，与被测的界面操作消耗同类资源"""
+    container = ca.QWidget()
+    layout = ca.QVBoxLayout(container)
+    for index in range(REFERENCE_WIDGETS):
+        button = ca.QPushButton(f"按钮 {index}")
+        layout.addWidget(button)
+    for color in ("#202020", "#f0f0f0", "#3a6ea5"):
+        container.setStyleSheet(f"QPushButton {{ background: {color}; border: 1px solid #888; padding: 4px; }}")
+        container.adjustSize()
+    ca.QApplication.processEvents()
+    container.deleteLater()
+    ca.QApplication.processEvents()
+
+
+@pytest.fixture
+def reference_time(ca, qapp):
+    """返回测量参考负载耗时（秒）的函数，在被测操作前后各测一次取较短的，贴近被测操作时的机器状态"""
+    before = best_of(lambda: reference_workload(ca), repeat=REFERENCE_REPEAT)
+    return lambda: min(before, best_of(lambda: reference_workload(ca), repeat=REFERENCE_REPEAT))
+
+
+def check(baseline, name, value, unit="ref"):
+    """把指标与基线比较；更新基线时只记录。unit为"ref"时value是与参考负载耗时的比值"""
+    metric = baseline["metrics"].get(name)
+    if UPDATE_BASELINE:
+        baseline["metrics"][name] = {"unit": unit, "value": round(value, 4)}
+        return
+    if "skip" in baseline:
+        pytest.skip(f"{baseline['skip']}，设置 CA_UPDATE_PERF_BASELINE=1 重新记录")
+    if metric is None or metric["unit"] != unit:
+        pytest.skip(f"基线中没有 {name}（{unit}），设置 CA_UPDATE_PERF_BASELINE=1 重新记录")
+    limit = metric["value"] * baseline["tolerance"]
+    assert value <= limit, (f"{name} = {value:.4f} {unit}，超过基线 {metric['value']} × "
+                            f"{baseline['tolerance']} = {limit:.4f}")
+
+
+def check_time(baseline, reference_time, name, elapsed):
+    """耗时指标按与参考负载耗时的比值比较"""
+    check(baseline, name, elapsed / reference_time())
+
+
+def best_of(func, repeat=REPEAT):
+    """多次运行func，返回最短耗时（秒）"""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def test_window_construction(ca, qapp, baseline, reference_time, monkeypatch):
+    """MediaOrganizer.__init__ 整体耗时，以及其中 init_ui 的耗时"""
+    init_ui_times = []
+    original_init_ui = ca.MediaOrganizer.init_ui
+
+    def timed_init_ui(self):
+        started = time.perf_counter()
+        original_init_ui(self)
+        init_ui_times.append(time.perf_counter() - started)
+
+    monkeypatch.setattr(ca.MediaOrganizer, "init_ui", timed_init_ui)
+
+    def construct():
+        window = ca.MediaOrganizer()
+        window.ui_monitor.stop()
+        if window.tray_icon:
+            window.tray_icon.hide()
+        window.close()
+        window.deleteLater()
+
+    elapsed = best_of(construct)
+    qapp.processEvents()
+    check_time(baseline, reference_time, "window_init", elapsed)
+    check_time(baseline, reference_time, "init_ui", min(init_ui_times))
+
+
+def test_switch_all_themes(window, qapp, baseline, reference_time):
+    """依次切换全部主题（每次切换都会重建整个窗口的样式表）"""
+    count = window.theme_combo.count()
+    assert count == 22
+
+    def switch():
+        for index in list(range(1, count)) + [0]:
+            window.theme_combo.setCurrentIndex(index)
+            qapp.processEvents()
+
+    check_time(baseline, reference_time, "switch_all_themes", best_of(switch))
+
+
+def test_switch_all_scales(window, qapp, baseline, reference_time):
+    """依次应用全部缩放比例"""
+    def switch():
+        for index in range(window.scale_spin.count()):
+            window.scale_spin.setCurrentIndex(index)
+            window.apply_scale_settings()
+            qapp.processEvents()
+
+    check_time(baseline, reference_time, "switch_all_scales", best_of(switch))
+
+
+def test_append_log_lines(window, qapp, baseline, reference_time):
+    """向界面日志追加十万行"""
+    def append():
+        window.log_text.clear()
+        for index in range(LOG_LINES):
+            window.log(f"已复制: IMG_{index:06d}.HEIC -> 2024-05")
+        qapp.processEvents()
+
+    check_time(baseline, reference_time, "append_100k_log_lines", best_of(append, repeat=1))
+
+
+def test_task_record_memory(ca, baseline):
+    """每个流水线任务记录占用的内存（字节），百万级文件的任务全部存在内存中"""
+    folder = sys.intern("/media/card/DCIM/100CANON")
+    filenames = [f"IMG_{index:06d}.CR3" for index in range(TASK_COUNT)]
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        tasks = [ca.PipelineTask(folder, filename) for filename in filenames]
+        for task in tasks:
+            task.size = 25 * 1024 * 1024
+            task.mtime = 1716000000.0
+            task.target_folder = "2024-05"
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    allocated = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    check(baseline, "task_bytes", allocated / len(tasks), unit="B")
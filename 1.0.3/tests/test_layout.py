@@ -0,0 +1,69 @@
+"""目标目录结构模板的行为测试"""
+import os
+from datetime import datetime
+
+import pytest
+
+DATE = "2024:05:03 10:00:00"
+
+
+@pytest.mark.parametrize("template", ["../../{year}", "{year}/../x", "./{year}", "/srv/{year}",
+                                      "C:/{year}", "{year}/a:b", "{year}/..", "\\\\server\\{year}"])
+def test_rejects_templates_outside_destination(ca, template):
+    with pytest.raises(ValueError):
+        ca.DestinationLayout(template)
+
+
+@pytest.mark.parametrize("template, expected", [
+    ("{year}-{month}", "2024-05"),
+    ("{year}/{month}/{day}", os.path.join("2024", "05", "03")),
+    ("照片/{year}/{camera_model}", os.path.join("照片", "2024", "Canon EOS R5")),
+    ("{year}/{kind}_{ext}", os.path.join("2024", "images_jpg")),
+    ("..{year}", "..2024"),
+])
+def test_renders_relative_folders(ca, template, expected):
+    layout = ca.DestinationLayout(template)
+    assert layout.folder_for("/card/DCIM/IMG_0001.JPG", DATE, "Canon EOS R5") == expected
+
+
+def test_field_values_cannot_escape(ca):
+    layout = ca.DestinationLayout("{camera_model}/{year}")
+    assert layout.folder_for("/x/a.jpg", DATE, "..") == os.path.join("unknown_camera", "2024")
+    assert layout.folder_for("/x/a.jpg", DATE, "../../etc") == os.path.join("_.._etc", "2024")
+
+
+def test_unknown_field_rejected(ca):
+    with pytest.raises(ValueError):
+        ca.DestinationLayout("{year}/{lens}")
+
+
+def test_missing_date_goes_to_unknown_folder(ca):
+    assert ca.DestinationLayout("{year}/{month}").folder_for("/x/a.jpg", None) == "unknown_date"
+
+
+def test_shards_fill_and_released_entries_are_reused(ca, tmp_path):
+    layout = ca.DestinationLayout("{year}", shard_limit=2)
+    assert [layout.resolve_shard(str(tmp_path), "2024") for _ in range(3)] == ["2024", "2024", "2024_002"]
+    layout.release_shard("2024")  # 第二个文件最终没有写入
+    assert layout.resolve_shard(str(tmp_path), "2024") == "2024"
+    assert layout.resolve_shard(str(tmp_path), "2024") == "2024_002"
+    assert layout.shard_count == 1
+
+
+def test_shard_counts_existing_entries(ca, tmp_path):
+    (tmp_path / "2024").mkdir()
+    for index in range(2):
+        (tmp_path / "2024" / f"{index}.jpg").write_bytes(b"x")
+    layout = ca.DestinationLayout("{year}", shard_limit=2)
+    assert layout.resolve_shard(str(tmp_path), "2024") == "2024_002"
+
+
+def test_folder_for_uses_cached_mtime(ca, monkeypatch):
+    """日期只有时间部分时使用已缓存的修改时间，不再重复stat"""
+    def no_stat(path):
+        raise AssertionError("不应重新读取修改时间")
+
+    monkeypatch.setattr(ca.os.path, "getmtime", no_stat)
+    mtime = datetime(2023, 5, 6, 12, 0).timestamp()
+    layout = ca.DestinationLayout("{year}/{month}")
+    assert layout.folder_for("/x/a.jpg", "12:00", mtime=mtime) == os.path.join("2023", "05")
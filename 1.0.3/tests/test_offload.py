@@ -0,0 +1,63 @@
+"""进程池后端的行为测试（用假的进程池代替，测试中不启动子进程）"""
+import os
+import threading
+import time
+
+
+class FakeExecutor:
+    created = []
+
+    def __init__(self, max_workers, mp_context=None):
+        time.sleep(0.05)  # 放大创建进程池的时间窗口
+        FakeExecutor.created.append(self)
+        self.shut_down = False
+
+    def submit(self, func, items):
+        from concurrent.futures import Future
+        future = Future()
+        future.set_result(func(items))
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.shut_down = True
+
+
+def test_concurrent_first_batches_share_one_pool(ca, monkeypatch):
+    monkeypatch.setattr(ca, "ProcessPoolExecutor", FakeExecutor)
+    FakeExecutor.created = []
+    offload = ca.ProcessOffload(4)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(offload.run_batch(sorted, [3, 1, 2])))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [[1, 2, 3]] * 8
+    assert len(FakeExecutor.created) == 1
+    offload.shutdown()
+    assert FakeExecutor.created[0].shut_down
+    assert offload.executor is None
+
+
+def test_thumbnail_batch_skips_undecodable_files(ca, tmp_path):
+    from PIL import Image
+    good = tmp_path / "good.jpg"
+    Image.new("RGB", (640, 480), (200, 30, 30)).save(good)
+    bad = tmp_path / "bad.jpg"
+    bad.write_bytes(b"not a jpeg")
+    results = ca.make_thumbnail_batch([str(good), str(bad)])
+    assert results[0][:2] == b"\xff\xd8" and results[1] is None
+
+
+def test_metadata_batch_returns_stat_for_caching(ca, tmp_path):
+    """子进程只为没有缓存的文件读取stat，并把结果带回主进程；无法访问的文件返回错误原因"""
+    path = tmp_path / "a.jpg"
+    path.write_bytes(b"x" * 10)
+    st = os.stat(path)
+    cached = (99, st.st_mtime, st.st_ino)
+    results = ca.read_file_metadata_batch([(str(path), None), (str(path), cached),
+                                           (str(tmp_path / "missing.jpg"), None)])
+    assert results[0][0] == (10, st.st_mtime, st.st_ino)
+    assert results[1][0] == cached
+    assert results[2][0] is None and results[2][2]
@@ -0,0 +1,190 @@
+"""内嵌日期解析的行为测试：用手工构造的最小文件覆盖各容器格式，以及截断、损坏文件的回退"""
+import struct
+import uuid
+import zlib
+from datetime import datetime, timezone
+
+import pytest
+
+DATE = "2021:03:04 05:06:07"
+EPOCH = 1600000000  # 2020-09-13 12:26:40 UTC
+
+
+def tiff(date=DATE):
+    """大端TIFF：IFD0只有指向Exif IFD的指针，Exif IFD中只有DateTimeOriginal"""
+    value = (date + "\x00").encode()
+    ifd0 = struct.pack(">H", 1) + struct.pack(">HHII", 0x8769, 4, 1, 26) + struct.pack(">I", 0)
+    exif = struct.pack(">H", 1) + struct.pack(">HHII", 0x9003, 2, len(value), 44) + struct.pack(">I", 0)
+    return b"MM" + struct.pack(">HI", 42, 8) + ifd0 + exif + value
+
+
+def box(kind, payload):
+    return struct.pack(">I", 8 + len(payload)) + kind + payload
+
+
+def heic(version=1):
+    """HEIF：meta中的iloc指向mdat里的Exif项"""
+    exif_payload = struct.pack(">I", 6) + b"Exif\x00\x00" + tiff()
+    ftyp = box(b"ftyp", b"heic" + b"\0" * 4 + b"mif1heic")
+    hdlr = box(b"hdlr", b"\0" * 8 + b"pict" + b"\0" * 13)
+    infe = [box(b"infe", bytes([2, 0, 0, 0]) + struct.pack(">HH", item_id, 0) + kind + b"\0")
+            for item_id, kind in ((1, b"hvc1"), (2, b"Exif"))]
+    iinf = box(b"iinf", b"\0" * 4 + struct.pack(">H", 2) + b"".join(infe))
+
+    def head(mdat_offset):
+        body = bytes([version, 0, 0, 0, 0x44, 0x00]) + struct.pack(">H", 2)
+        for item_id, offset, length in ((1, mdat_offset, 4), (2, mdat_offset + 4, len(exif_payload))):
+            body += struct.pack(">H", item_id)
+            if version in (1, 2):
+                body += struct.pack(">H", 0)
+            body += struct.pack(">HH", 0, 1) + struct.pack(">II", offset, length)
+        return ftyp + box(b"meta", b"\0" * 4 + hdlr + iinf + box(b"iloc", body))
+
+    return head(len(head(0)) + 8) + box(b"mdat", b"HEVC" + exif_payload + b"\0" * 1000)
+
+
+def png_chunk(kind, data):
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+
+def png(*extra, tail=()):
+    header = png_chunk(b"IHDR", struct.pack(">IIBBBBB", 1, 1, 8, 0, 0, 0, 0))
+    data = png_chunk(b"IDAT", zlib.compress(b"\0\0"))
+    return (b"\x89PNG\r\n\x1a\n" + header + b"".join(extra) + data + b"".join(tail)
+            + png_chunk(b"IEND", b""))
+
+
+def riff_chunk(kind, data):
+    return kind + struct.pack("<I", len(data)) + data + (b"\0" if len(data) & 1 else b"")
+
+
+def riff(form, body):
+    return b"RIFF" + struct.pack("<I", len(form + body)) + form + body
+
+
+def webp(with_exif=True):
+    exif = riff_chunk(b"EXIF", b"Exif\x00\x00" + tiff()) if with_exif else b""
+    flags = 0x08 if with_exif else 0
+    return riff(b"WEBP", riff_chunk(b"VP8X", bytes([flags, 0, 0, 0]) + b"\0" * 6)
+                + riff_chunk(b"VP8 ", b"\0" * 11) + exif)
+
+
+def avi(strd=False, idit=False):
+    strl = riff_chunk(b"LIST", b"strl" + riff_chunk(b"strh", b"\0" * 56)
+                      + (riff_chunk(b"strd", b"AVIF" + tiff()) if strd else b""))
+    date = riff_chunk(b"IDIT", b"MON JAN 10 12:34:56 2005\n\0") if idit else b""
+    header = riff_chunk(b"LIST", b"hdrl" + riff_chunk(b"avih", b"\0" * 56) + strl + date)
+    return riff(b"AVI ", header + riff_chunk(b"LIST", b"movi" + b"\0" * 100))
+
+
+def ebml(element_id, data, unknown_size=False):
+    if unknown_size:
+        size = b"\x01\xff\xff\xff\xff\xff\xff\xff"
+    else:
+        size = (0x0100000000000000 | len(data)).to_bytes(8, "big")
+    return element_id.to_bytes((element_id.bit_length() + 7) // 8, "big") + size + data
+
+
+def matroska():
+    """Segment长度未知（直播录制常见），Info中DateUTC为相对2001-01-01的纳秒数"""
+    nanoseconds = (EPOCH - 978307200) * 10 ** 9
+    info = ebml(0x1549A966, ebml(0x2AD7B1, b"\x0f\x42\x40") + ebml(0x4461, struct.pack(">q", nanoseconds)))
+    segment = ebml(0x18538067, ebml(0x114D9B74, b"\0" * 10) + info + ebml(0x1F43B675, b"\0" * 50),
+                   unknown_size=True)
+    return ebml(0x1A45DFA3, ebml(0x4282, b"webm")) + segment
+
+
+def asf():
+    """File Properties对象中的创建时间为相对1601-01-01的100纳秒数，前面放一个无关对象"""
+    filetime = (EPOCH + 11644473600) * 10 ** 7
+    data = b"\0" * 16 + struct.pack("<QQ", 1234, filetime) + b"\0" * 56
+    properties = (uuid.UUID("8CABDCA1-A947-11CF-8EE4-00C00C205365").bytes_le
+                  + struct.pack("<Q", 24 + len(data)) + data)
+    objects = b"\x11" * 16 + struct.pack("<Q", 34) + b"\0" * 10 + properties
+    return (uuid.UUID("75B22630-668E-11CF-A6D9-00AA0062CE6C").bytes_le
+            + struct.pack("<QI", 30 + len(objects), 2) + b"\x01\x02" + objects + b"\0" * 100)
+
+
+def flv():
+    value = b"2019-05-06T07:08:09"
+    data = (b"\x02\x00\x0aonMetaData\x08\x00\x00\x00\x01\x00\x0ccreationdate\x02"
+            + struct.pack(">H", len(value)) + value + b"\0\0\x09")
+    return (b"FLV\x01\x05" + struct.pack(">I", 9) + b"\0" * 4 + bytes([18])
+            + len(data).to_bytes(3, "big") + b"\0" * 7 + data)
+
+
+UTC_DATE = datetime.fromtimestamp(EPOCH, timezone.utc).strftime("%Y:%m:%d %H:%M:%S")
+
+CASES = [
+    ("iloc_v1.heic", heic(), DATE),
+    ("iloc_v0.heic", heic(version=0), DATE),
+    ("exif.png", png(png_chunk(b"eXIf", tiff())), DATE),
+    ("text.png", png(png_chunk(b"tEXt", b"date:create\x002022-07-08T09:10:11+00:00")), "2022:07:08 09:10:11"),
+    ("time_after_idat.png", png(tail=[png_chunk(b"tIME", struct.pack(">HBBBBB", 2018, 1, 2, 3, 4, 5))]),
+     "2018:01:02 03:04:05"),
+    ("plain.png", png(), None),
+    ("exif.webp", webp(), DATE),
+    ("plain.webp", webp(with_exif=False), None),
+    ("strd.avi", avi(strd=True), DATE),
+    ("idit.avi", avi(idit=True), "2005:01:10 12:34:56"),
+    ("live.mkv", matroska(), UTC_DATE),
+    ("clip.wmv", asf(), UTC_DATE),
+    ("stream.flv", flv(), "2019:05:06 07:08:09"),
+]
+
+
+@pytest.mark.parametrize("name, data, expected", CASES, ids=[case[0] for case in CASES])
+def test_reads_embedded_date(ca, tmp_path, name, data, expected):
+    path = tmp_path / name
+    path.write_bytes(data)
+    assert ca.read_media_date(str(path)) == expected
+
+
+@pytest.mark.parametrize("name, data", [
+    ("truncated.heic", heic()[:200]),
+    ("truncated.png", png(png_chunk(b"eXIf", tiff()))[:40]),
+    ("garbage.png", b"\x89PNG\r\n\x1a\n" + b"\xff" * 30),
+    ("bad_size.mkv", b"\x1a\x45\xdf\xa3\xff"),
+    ("bad_size.avi", b"RIFF\xff\xff\xff\xffAVI LIST"),
+    ("empty.wmv", b""),
+])
+def test_damaged_files_fall_back_to_mtime(ca, tmp_path, name, data):
+    """截断或损坏的文件不抛出异常，回退到传入的修改时间"""
+    path = tmp_path / name
+    path.write_bytes(data)
+    info = {}
+    assert ca.read_media_date(str(path)) is None
+    date, warning = ca.resolve_file_date(str(path), info, EPOCH)
+    assert date == datetime.fromtimestamp(EPOCH).strftime("%Y:%m:%d %H:%M:%S")
+    assert info["date_source"] == "mtime"
+
+
+def test_parser_error_becomes_warning(ca, tmp_path, monkeypatch):
+    """解析器抛出异常时使用修改时间，并返回警告信息"""
+    def broken(file_path, info=None):
+        raise struct.error("unpack requires a buffer of 4 bytes")
+
+    monkeypatch.setitem(ca.DATE_READERS, ".heic", broken)
+    path = tmp_path / "IMG_0001.heic"
+    path.write_bytes(heic())
+    date, warning = ca.resolve_file_date(str(path), mtime=EPOCH)
+    assert date == datetime.fromtimestamp(EPOCH).strftime("%Y:%m:%d %H:%M:%S")
+    assert "IMG_0001.heic" in warning and "unpack" in warning
+
+
+def test_missing_file_reports_error(ca, tmp_path):
+    date, warning = ca.resolve_file_date(str(tmp_path / "missing.jpg"))
+    assert date is None and "missing.jpg" in warning
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("2005:01:10 12:34:56\x00", "2005:01:10 12:34:56"),
+    ("2022-07-08T09:10:11", "2022:07:08 09:10:11"),
+    ("Mon, 10 Jan 2005 12:34:56 +0000", "2005:01:10 12:34:56"),
+    ("MON JAN 10 12:34:56 2005", "2005:01:10 12:34:56"),
+    ("2005/01/10 12:34:56", "2005:01:10 12:34:56"),
+    ("0000:00:00 00:00:00", None),
+    ("not a date", None),
+])
+def test_parse_text_date(ca, text, expected):
+    assert ca._parse_text_date(text) == expected
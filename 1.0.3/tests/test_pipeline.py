@@ -0,0 +1,107 @@
+"""分阶段流水线的行为测试：任务流转、出错的任务，以及出错后流水线仍能正常结束"""
+import threading
+
+import pytest
+
+TIMEOUT = 10  # 流水线卡住时测试失败而不是一直等待
+
+
+def run_pipeline(pipeline, tasks, on_done, **kwargs):
+    """在线程中运行流水线，超时视为卡住"""
+    errors = []
+
+    def target():
+        try:
+            pipeline.run(tasks, on_done, **kwargs)
+        except Exception as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(TIMEOUT)
+    assert not thread.is_alive(), "流水线没有结束"
+    return errors
+
+
+def make_tasks(ca, count):
+    return [ca.PipelineTask("/src", f"IMG_{index:04d}.JPG") for index in range(count)]
+
+
+def test_tasks_pass_through_all_stages(ca):
+    pipeline = ca.StagedPipeline(queue_size=4)
+    pipeline.add_stage("一", lambda task: task, workers=2)
+    pipeline.add_stage("批", lambda batch: list(reversed(batch)), batch_size=8)
+    pipeline.add_stage("二", lambda task: task, workers=3)
+    done = []
+    tasks = make_tasks(ca, 200)
+    assert run_pipeline(pipeline, tasks, done.append) == []
+    assert sorted(task.filename for task in done) == sorted(task.filename for task in tasks)
+    assert all(len(task.durations) == 3 for task in done)
+    assert set(done[0].duration_map(pipeline.stage_names)) == {"一", "批", "二"}
+
+
+def test_handler_error_marks_task_failed(ca):
+    def handler(task):
+        if task.filename.endswith("3.JPG"):
+            raise OSError("读取失败")
+        return task
+
+    pipeline = ca.StagedPipeline()
+    pipeline.add_stage("读取", handler, workers=2)
+    pipeline.add_stage("写入", lambda task: task)
+    done = []
+    run_pipeline(pipeline, make_tasks(ca, 20), done.append)
+    failed = [task for task in done if task.outcome == "error"]
+    assert len(done) == 20
+    assert sorted(task.filename for task in failed) == ["IMG_0003.JPG", "IMG_0013.JPG"]
+    assert all(task.error_stage == "读取" and task.error == "读取失败" for task in failed)
+
+
+@pytest.mark.parametrize("failing_stage", ["过滤", "最后"])
+def test_on_done_error_does_not_hang(ca, failing_stage):
+    """结束任务的回调出错（例如写入增量导入记录失败）时，其余任务照常完成，流水线正常结束"""
+    def on_done(task):
+        if task.filename == "IMG_0005.JPG":
+            raise RuntimeError("database is locked")
+        done.append(task)
+
+    # 过滤阶段丢弃的任务在该阶段结束，其余任务在最后一个阶段结束
+    keep = (lambda task: None) if failing_stage == "过滤" else (lambda task: task)
+    pipeline = ca.StagedPipeline(queue_size=2)
+    pipeline.add_stage("过滤", keep)
+    pipeline.add_stage("最后", lambda task: task)
+    done, reported = [], []
+    errors = run_pipeline(pipeline, make_tasks(ca, 30), on_done,
+                          on_error=lambda task, error: reported.append((task.filename, str(error))))
+    assert errors == []
+    assert len(done) == 29
+    assert reported == [("IMG_0005.JPG", "database is locked")]
+
+
+def test_route_error_ends_task(ca):
+    """任务无法交给下一阶段时在本阶段以失败结束"""
+    def route(task):
+        if task.filename == "IMG_0002.JPG":
+            raise KeyError("lane")
+        return "a"
+
+    pipeline = ca.StagedPipeline()
+    pipeline.add_stage("前", lambda task: task)
+    pipeline.add_stage("后", lambda task: task, lanes={"a": (2, 4)}, route=route)
+    done = []
+    run_pipeline(pipeline, make_tasks(ca, 6), done.append)
+    assert len(done) == 6
+    assert [task.error_stage for task in done if task.outcome == "error"] == ["前"]
+
+
+def test_scan_error_still_finishes_started_tasks(ca):
+    def scan():
+        yield from make_tasks(ca, 5)
+        raise OSError("设备已移除")
+
+    pipeline = ca.StagedPipeline()
+    pipeline.add_stage("处理", lambda task: task, workers=2)
+    done = []
+    errors = run_pipeline(pipeline, scan(), done.append)
+    assert [str(error) for error in errors] == ["设备已移除"]
+    assert len(done) == 5
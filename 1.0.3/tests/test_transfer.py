@@ -0,0 +1,114 @@
+"""传输线程各阶段的行为测试（直接调用阶段处理函数，不启动线程）"""
+import os
+import sqlite3
+
+import pytest
+
+
+@pytest.fixture
+def make_thread(ca, qapp, tmp_path):
+    """创建源文件夹和目标文件夹，返回创建传输线程的函数"""
+    source = tmp_path / "src"
+    dest = tmp_path / "dst"
+    source.mkdir()
+    dest.mkdir()
+
+    def make(**kwargs):
+        thread = ca.FileTransferThread(str(source), str(dest), [], "all", **kwargs)
+        thread.concurrency = ca.AdaptiveConcurrency(1)
+        return thread
+    return make
+
+
+def make_task(ca, folder, filename, data):
+    path = os.path.join(folder, filename)
+    with open(path, "wb") as f:
+        f.write(data)
+    task = ca.PipelineTask(folder, filename)
+    task.size = len(data)
+    return task
+
+
+def test_index_write_error_keeps_task_organized(ca, make_thread):
+    class LockedIndex:
+        def add(self, *args):
+            raise sqlite3.OperationalError("database is locked")
+
+    thread = make_thread(library_mode=1)
+    thread.library_index = LockedIndex()
+    warnings = []
+    thread.log_updated.connect(warnings.append)
+    task = make_task(ca, thread.dest_folder, "IMG_0001.JPG", b"jpeg data")
+    task.dest_path = task.file_path
+    task.outcome = "organized"
+    assert thread.verify_transfer(task) is task
+    assert task.outcome == "organized"
+    assert thread.library_added == 0
+    assert any("database is locked" in line for line in warnings)
+
+
+def test_verify_reads_back_synced_data(ca, make_thread, monkeypatch, tmp_path):
+    """回读校验前目标文件已经fsync并丢弃页缓存，校验的是写入存储介质的数据"""
+    calls = []
+    real_fsync, real_hash_file = ca.os.fsync, ca.hash_file
+    monkeypatch.setattr(ca.os, "fsync", lambda fd: calls.append("fsync") or real_fsync(fd))
+    monkeypatch.setattr(ca, "fadvise", lambda fd, offset, length, advice: calls.append(
+        "drop" if advice == getattr(ca.os, "POSIX_FADV_DONTNEED", None) and length == 0 else "hint"))
+    monkeypatch.setattr(ca, "hash_file", lambda *args: calls.append("readback") or real_hash_file(*args))
+    thread = make_thread(organize_mode="copy")
+    task = make_task(ca, thread.source_folder, "IMG_0001.JPG", b"jpeg data" * 100)
+    dst = str(tmp_path / "copy.jpg")
+    assert thread.copy_verified(task.file_path, dst) == real_hash_file(task.file_path)
+    assert "fsync" in calls and calls.index("fsync") < calls.index("readback")
+    if hasattr(ca.os, "POSIX_FADV_DONTNEED"):
+        assert calls.index("fsync") < calls.index("drop") < calls.index("readback")
+    assert thread.verified_copies == 1
+
+
+def test_verify_mismatch_removes_copies(ca, make_thread, monkeypatch, tmp_path):
+    monkeypatch.setattr(ca, "hash_file", lambda *args: "0" * 128)
+    thread = make_thread(organize_mode="copy")
+    task = make_task(ca, thread.source_folder, "IMG_0001.JPG", b"jpeg data")
+    dst = str(tmp_path / "copy.jpg")
+    with pytest.raises(OSError):
+        thread.copy_verified(task.file_path, dst)
+    assert not os.path.exists(dst)
+    assert os.path.exists(task.file_path)
+    assert thread.verified_copies == 0
+
+
+def make_move_task(ca, thread, tmp_path):
+    task = make_task(ca, thread.source_folder, "IMG_0001.JPG", b"jpeg data")
+    backup = tmp_path / "backup"
+    backup.mkdir()
+    task.dest_path = os.path.join(thread.dest_folder, task.filename)
+    task.backup_paths = [str(backup / task.filename)]
+    return task
+
+
+def test_move_with_backup(ca, make_thread, tmp_path):
+    thread = make_thread()
+    task = make_move_task(ca, thread, tmp_path)
+    source = task.file_path
+    assert thread.transfer_task(task) is task
+    assert task.mode == "move" and task.outcome == "organized"
+    assert not os.path.exists(source)
+    for path in [task.dest_path] + task.backup_paths:
+        with open(path, "rb") as f:
+            assert f.read() == b"jpeg data"
+
+
+def test_move_backup_failure_keeps_source(ca, make_thread, monkeypatch, tmp_path):
+    """备份写入失败时源文件仍在原处，主目标没有创建，任务失败后可以重试"""
+    thread = make_thread()
+    task = make_move_task(ca, thread, tmp_path)
+    source = task.file_path
+
+    def write_copies(src, dsts):
+        raise OSError("No space left on device")
+
+    monkeypatch.setattr(thread, "write_copies", write_copies)
+    assert thread.transfer_task(task) is None
+    assert task.outcome == "error" and task.error_stage == "传输"
+    assert os.path.exists(source)
+    assert not os.path.exists(task.dest_path)
@@ -0,0 +1,90 @@
+"""增量导入记录的行为测试：记录在重新打开后仍然有效，不同的源互不影响，清除后重新导入"""
+import sqlite3
+
+import pytest
+
+
+@pytest.fixture
+def open_watermark(ca, tmp_path):
+    """返回打开某个源文件夹的增量导入记录的函数，记录保存在临时数据库中"""
+    db_path = str(tmp_path / "imports.db")
+
+    def open_source(folder):
+        (tmp_path / folder).mkdir(exist_ok=True)
+        return ca.ImportWatermark(str(tmp_path / folder), db_path)
+    return open_source
+
+
+def test_recorded_files_are_known_after_reopen(open_watermark):
+    watermark = open_watermark("card")
+    assert watermark.previous_highest is None
+    watermark.record("IMG_0001.JPG", 100, 1000.0)
+    watermark.record("IMG_0002.JPG", 200, 2000.0)
+    watermark.close()
+
+    watermark = open_watermark("card")
+    assert watermark.is_imported("IMG_0001.JPG", 100, 1000.0)
+    assert watermark.previous_highest == 2000.0
+    # 同名文件大小或修改时间变化时视为新文件
+    assert not watermark.is_imported("IMG_0001.JPG", 101, 1000.0)
+    assert not watermark.is_imported("IMG_0001.JPG", 100, 1000.5)
+    watermark.close()
+
+
+def test_sources_are_separate(open_watermark):
+    watermark = open_watermark("card_a")
+    watermark.record("IMG_0001.JPG", 100, 1000.0)
+    watermark.close()
+    other = open_watermark("card_b")
+    assert not other.is_imported("IMG_0001.JPG", 100, 1000.0)
+    assert other.previous_highest is None
+    other.close()
+
+
+def test_commits_in_batches(ca, open_watermark, monkeypatch):
+    """未满一批的记录在close时提交，中途出错不会丢失已提交的批次"""
+    monkeypatch.setattr(ca.ImportWatermark, "COMMIT_EVERY", 2)
+    watermark = open_watermark("card")
+    for index in range(3):
+        watermark.record(f"IMG_{index:04d}.JPG", 100, 1000.0 + index)
+    watermark.conn.rollback()  # 模拟没有正常关闭：只丢失未提交的第三条
+    watermark.conn.close()
+    reopened = open_watermark("card")
+    assert len(reopened.known) == 2
+    reopened.close()
+
+
+def test_clear_forgets_source(open_watermark):
+    watermark = open_watermark("card")
+    watermark.record("IMG_0001.JPG", 100, 1000.0)
+    watermark.close()
+    watermark = open_watermark("card")
+    watermark.clear()
+    assert not watermark.is_imported("IMG_0001.JPG", 100, 1000.0)
+    watermark.close()
+    reopened = open_watermark("card")
+    assert reopened.known == set() and reopened.previous_highest is None
+    reopened.close()
+
+
+def test_close_without_records_keeps_previous_highest(open_watermark):
+    watermark = open_watermark("card")
+    watermark.record("IMG_0001.JPG", 100, 1000.0)
+    watermark.close()
+    open_watermark("card").close()  # 本次没有导入任何文件
+    reopened = open_watermark("card")
+    assert reopened.previous_highest == 1000.0
+    reopened.close()
+
+
+def test_locked_database_raises_sqlite_error(ca, open_watermark, tmp_path):
+    """数据库被其他程序锁定时抛出sqlite3.Error，由传输线程记录警告"""
+    watermark = open_watermark("card")
+    blocker = sqlite3.connect(str(tmp_path / "imports.db"), timeout=0)
+    blocker.execute("BEGIN EXCLUSIVE")
+    watermark.conn.execute("PRAGMA busy_timeout = 0")
+    with pytest.raises(sqlite3.Error):
+        watermark.record("IMG_0001.JPG", 100, 1000.0)
+    blocker.rollback()
+    blocker.close()
+    watermark.close()